@@ -2,7 +2,6 @@ import argparse
 import glob
 import os
 import datetime
-import subprocess
 from eaijiraapiabstraction.JiraConnection import JiraConnection
 from eaireporter.CucumberJson import CucumberCleaner
 import logging
@@ -35,7 +34,13 @@ def main():
     parser.add_argument("password", help="Jira password")
     parser.add_argument("test_plan", help="Jira test plan issue key")
     parser.add_argument("-b", "--binary", type=str,
-                        help="The CURL binary path", default="curl")
+                        help="Deprecated, the results are not sent with CURL anymore",
+                        default="curl")
+    parser.add_argument("-u", "--url", type=str,
+                        help="The Jira url", default="https://jira.neopost-id.com/jira")
+    parser.add_argument("-a", "--all", action="store_true",
+                        help="Import all the cucumber reports e.g. from parallel runs instead of "
+                             "the latest one")
     parser.add_argument("-s", "--summary", type=str,
                         help="Specifies the system used during the tests (browser, os..)",
                         default="")
@@ -44,12 +49,17 @@ def main():
     try:
         log.info("Create a clean report from last execution")
         list_of_files = glob.glob('cucumber_json/*json')
-        if list_of_files:
-            latest_file = max(list_of_files, key=os.path.getctime)
-        else:
+        if not list_of_files:
             log.error("No cucumber report in the cucumber output folder")
+        if not args.all:
+            list_of_files = [max(list_of_files, key=os.path.getctime)]
 
-        CucumberCleaner.cleaner(latest_file, "clean_report.json")
+        clean_reports = []
+        for index, report in enumerate(list_of_files):
+            clean_report = "clean_report.json" if index == 0 else "clean_report-{}.json".format(
+                index)
+            CucumberCleaner.cleaner(report, clean_report)
+            clean_reports.append(clean_report)
 
         log.info("Create a test execution for the project")
 
@@ -70,28 +80,22 @@ def main():
         with open("test_execution.json", "w") as execution_file:
             json.dump(test_execution, execution_file)
 
-        command = [args.binary,
-                   "-u",
-                   "{}:{}".format(args.username, args.password),
-                   "-F",
-                   "info=@test_execution.json",
-                   "-F", "result=@clean_report.json",
-                   "https://jira.neopost-id.com/jira/rest/raven/1.0/import/execution/cucumber/multipart"]  # noqa
-        output = subprocess.run(command,
-                                capture_output=True)
-
-        log.info("Output:'{}'\nError: '{}'".format(output.stdout, output.stderr))
-        response = json.loads(output.stdout)
-        log.debug("Get response".format(response))
-        test_execution_key = response["testExecIssue"]["key"]
-
         my_jira = JiraConnection(username=args.username,
                                  password=args.password,
-                                 url="https://jira.neopost-id.com/jira")
+                                 url=args.url)
         my_jira.set_project_id(project_key="PFWES")
 
-        my_jira.test_execution_load_attachments(execution_key=test_execution_key,
-                                                evidence_files="evidences.json")
+        responses = my_jira.import_cucumber_reports(cucumber_report_paths=clean_reports,
+                                                    info=test_execution)
+        for response in responses:
+            log.info("Output:'{}'".format(response.text))
+            test_execution_key = response.json()["testExecIssue"]["key"]
+
+            # The evidences file lists the tests of all the executions
+            my_jira.test_execution_load_attachments(execution_key=test_execution_key,
+                                                    evidence_files="evidences.json",
+                                                    journal_file="evidences.journal",
+                                                    executed_only=True)
 
     except json.decoder.JSONDecodeError as json_error:
         log.error("Json decoder send: '{}'\n line '{}' column '{}'".format(
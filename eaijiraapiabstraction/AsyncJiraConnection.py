@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from eaijiraapiabstraction.JiraAttachments import JiraAttachments
+from eaijiraapiabstraction.JiraConnection import JiraConnection
+from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraSession import JiraSession
+from eaijiraapiabstraction.XRayIssues import XRayIssues
+
+log = logging.getLogger(__name__)
+
+
+class AsyncJiraConnection:
+    """Asynchronous counterpart of JiraConnection.
+
+        Each operation is a coroutine so that many requests can be awaited together, e.g. with
+        asyncio.gather. The blocking requests are run in a thread pool sharing the pooled session
+        of a JiraConnection and the number of requests in flight is bounded by a semaphore.
+
+        The responses are the same as the JiraConnection ones.
+    """
+    DEFAULT_CONCURRENCY = 10
+
+    def __init__(self, url: str = None, username: str = None, password: str = None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = JiraSession.DEFAULT_MAX_RETRIES,
+                 timeout: float = JiraSession.DEFAULT_TIMEOUT):
+        assert isinstance(concurrency, int) and concurrency > 0, \
+            "concurrency must be a positive integer"
+
+        self.connection = JiraConnection(url=url, username=username, password=password,
+                                         pool_size=concurrency, max_retries=max_retries,
+                                         timeout=timeout)
+        self.concurrency = concurrency
+        self.__executor = ThreadPoolExecutor(max_workers=concurrency)
+        # One semaphore per event loop as a semaphore is bound to the loop it first waits in
+        self.__semaphores = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release the worker threads and the pooled connections.
+        :return: None
+        """
+        self.__executor.shutdown(wait=True)
+        self.connection.session.close()
+
+    @property
+    def project_id(self):
+        return self.connection.project_id
+
+    def set_project_id(self, project_id=None, project_name=None, project_key=None):
+        return self.connection.set_project_id(project_id=project_id, project_name=project_name,
+                                              project_key=project_key)
+
+    async def __call(self, function, **kwargs):
+        """
+        Run a JiraIssue, JiraAttachments or XRayIssues static method in the thread pool.
+        :param function: the static method
+        :param kwargs: the method parameters except url, headers and session
+        :return: the method return
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self.__semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.__semaphores.setdefault(loop, asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            return await loop.run_in_executor(
+                self.__executor,
+                functools.partial(function, url=self.connection.url,
+                                  headers=self.connection.header(),
+                                  session=self.connection.session, **kwargs))
+
+    #########################################
+    # ISSUES
+    #########################################
+
+    async def get_issue(self, issue_key: str = None, fields: list = None, expand: list = None):
+        assert isinstance(issue_key, str), "issue_key must be a string"
+
+        return await self.__call(JiraIssue.get_issue, issue_key=issue_key,
+                                 cache=self.connection.issue_cache, fields=fields, expand=expand)
+
+    async def get_issues(self, issue_keys: list = None, fields: list = None):
+        assert isinstance(issue_keys, list), "issue_keys must be a list"
+        assert isinstance(fields, list), "fields must be a list"
+
+        return await self.__call(JiraIssue.get_issues, issue_keys=issue_keys, fields=fields)
+
+    async def get_issue_status(self, issue_key: str = None):
+        assert isinstance(issue_key, str), "issue_key must be a string"
+
+        return await self.__call(JiraIssue.get_issue_status, issue_key=issue_key,
+                                 cache=self.connection.issue_cache)
+
+    async def create_issue(self, issue_data: dict = None):
+        return await self.__call(JiraIssue.create_issue, issue_data=issue_data)
+
+    async def update_issue(self, issue_key: str = None, issue_data: dict = None):
+        self.connection.invalidate_issues(issue_key=issue_key)
+        return await self.__call(JiraIssue.update_issue, issue_key=issue_key,
+                                 issue_data=issue_data)
+
+    async def create_link(self, from_key=None, to_key=None, link_type=None):
+        self.connection.invalidate_issues(issue_key=from_key)
+        self.connection.invalidate_issues(issue_key=to_key)
+        return await self.__call(JiraIssue.create_link, from_key=from_key, to_key=to_key,
+                                 link_type=link_type)
+
+    async def search(self, jql_query: str = None, field_list: list = None,
+                     paginated: bool = True):
+        """
+        Search the issues matching the jql query.
+        :param jql_query: the jql query
+        :param field_list: the fields to retrieve
+        :param paginated: True returns only the first page, False returns all the issues
+        :return: a requests response when paginated otherwise a dictionary with the "issues" key
+        """
+        assert isinstance(jql_query, str), "jql_query must be a string"
+        assert isinstance(field_list, list), "field_list must be a list"
+
+        search_request = {'jql': jql_query, 'fields': field_list}
+        if paginated:
+            return await self.__call(JiraIssue.search, search_request=search_request)
+        return await self.__call(JiraIssue.search_issues, search_request=search_request)
+
+    #########################################
+    # Attachments
+    #########################################
+
+    async def get_issue_attachments_id(self, issue_key=None):
+        assert isinstance(issue_key, str), "issue_key must be a string"
+
+        return await self.__call(JiraIssue.get_issue_attachments_id, issue_key=issue_key,
+                                 cache=self.connection.issue_cache)
+
+    async def retrieve_attachments(self, issue_key=None, attachment_id=None, folder=None):
+        assert isinstance(issue_key, str), "issue_key must be a string"
+
+        return await self.__call(JiraAttachments.retrieve_attachments, issue_key=issue_key,
+                                 attachment_id=attachment_id, folder=folder,
+                                 cache=self.connection.issue_cache)
+
+    async def add_attachments_to_issue(self, issue_key=None, file_name=None):
+        assert isinstance(issue_key, str), "issue_key must be a string"
+
+        self.connection.invalidate_issues(issue_key=issue_key)
+        return await self.__call(JiraIssue.add_attachments_to_issue, issue_key=issue_key,
+                                 file_name=file_name)
+
+    async def delete_attachments(self, issue_key=None, attachment_id=None):
+        self.connection.invalidate_issues(issue_key=issue_key)
+        return await self.__call(JiraAttachments.delete_attachments, issue_key=issue_key,
+                                 attachment_id=attachment_id, cache=self.connection.issue_cache)
+
+    #########################################
+    # XRay
+    #########################################
+
+    async def get_tests_in_test_plan(self, test_plan_key=None):
+        return await self.__call(XRayIssues.get_tests_in_test_plan, test_plan_key=test_plan_key)
+
+    async def get_tests_execution_of_test_plan(self, test_plan_key=None):
+        return await self.__call(XRayIssues.get_tests_execution_of_test_plan,
+                                 test_plan_key=test_plan_key)
+
+    async def get_tests_in_execution(self, test_execution_key=None):
+        return await self.__call(XRayIssues.get_tests_in_execution,
+                                 test_execution_key=test_execution_key)
+
+    async def download_execution_evidences(self, test_execution_key=None, folder=None):
+        return await self.__call(XRayIssues.download_evidence,
+                                 test_execution_key=test_execution_key, folder=folder)
+
+    async def import_execution(self, cucumber_report_path=None):
+        return await self.__call(XRayIssues.create_test_execution,
+                                 result_file=cucumber_report_path)
+
+    async def test_execution_load_attachments(self, execution_key=None, evidence_files=None):
+        return await self.__call(XRayIssues.load_attachments, execution_key=execution_key,
+                                 evidence_files=evidence_files)
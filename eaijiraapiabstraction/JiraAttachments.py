@@ -1,48 +1,66 @@
 import requests
 import logging
 from os.path import join
+from eaijiraapiabstraction.JiraDownloader import JiraDownloader
+from eaijiraapiabstraction.JiraIssueCache import JiraIssueCache
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraSession import JiraSession
 
 
 class JiraAttachments:
     @staticmethod
-    def delete_attachments(url=None, headers=None, issue_key=None, attachment_id=None):
+    def delete_attachments(url=None, headers=None, issue_key=None, attachment_id=None,
+                           session: requests.Session = None, cache: JiraIssueCache = None):
         """"
         Delete all issue attachments or only one attachment depending on the input
         """
         if issue_key is not None and attachment_id is None:
             attachments_id_list = JiraIssue.get_issue_attachments_id(url=url, headers=headers,
-                                                                     issue_key=issue_key)
+                                                                     issue_key=issue_key,
+                                                                     session=session, cache=cache)
             for attachment_id in attachments_id_list:
                 JiraAttachments.delete_attachments(url=url, headers=headers,
-                                                   attachment_id=attachment_id)
+                                                   attachment_id=attachment_id, session=session)
+            if cache is not None:
+                cache.invalidate(issue_key=issue_key)
         elif issue_key is None and attachment_id is not None:
-            return requests.delete("{}/rest/api/2/attachment/{}".format(url, attachment_id),
-                                   headers=headers)
+            return JiraSession.resolve(session).delete(
+                "{}/rest/api/2/attachment/{}".format(url, attachment_id), headers=headers)
         else:
             print("Error")
 
     @staticmethod
     def retrieve_attachments(url=None, headers=None, issue_key=None,
-                             attachment_id=None, folder=None):
+                             attachment_id=None, folder=None, session: requests.Session = None,
+                             cache: JiraIssueCache = None, max_workers: int = 1):
+        """
+        Download the issue attachments or only one attachment into the folder.
+        The attachments already present with the same size are not downloaded again.
+        :param max_workers: the maximum number of files downloaded at the same time
+        :return: the JiraDownloader results
+        """
         logging.info("Retrieve attachment with issue_key='{}',"
                      " attachment_id='{}' and folder='{}'".format(issue_key,
                                                                   attachment_id,
                                                                   folder))
         attachments = JiraIssue.get_issue_attachments_links(url=url, headers=headers,
-                                                            issue_key=issue_key)
+                                                            issue_key=issue_key, session=session,
+                                                            cache=cache)
         logging.info("attachments are '{}'".format(repr(attachments)))
         if attachment_id is not None and attachment_id in attachments.keys():
-            JiraAttachments.download_file(url=attachments[attachment_id]["url"], headers=headers,
-                                          file_absolute_path=join(folder,attachments[attachment_id]["filename"]))  # noqa
-        else:
-            for key in attachments.keys():
-                JiraAttachments.download_file(url=attachments[key]["url"], headers=headers,
-                                              file_absolute_path=join(folder, attachments[key]["filename"]))  # noqa
+            attachments = {attachment_id: attachments[attachment_id]}
+        downloader = JiraDownloader(headers=headers, session=session, max_workers=max_workers)
+        return downloader.download_files([{"url": attachment["url"],
+                                           "path": join(folder, attachment["filename"]),
+                                           "size": attachment.get("size")}
+                                          for attachment in attachments.values()])
 
     @staticmethod
-    def download_file(url=None, headers=None, file_absolute_path=None):
-        attachment = requests.get(url=url, headers=headers, stream=True)
-        with open(file_absolute_path, "wb") as download_file:
-            download_file.write(attachment.content)
-        download_file.close()
+    def download_file(url=None, headers=None, file_absolute_path=None,
+                      session: requests.Session = None):
+        """
+        Stream a file to the disk.
+        :return: the JiraDownloader result
+        """
+        return JiraDownloader(headers=headers, session=session).download_file(
+            url=url, file_absolute_path=file_absolute_path)
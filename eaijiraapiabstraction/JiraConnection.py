@@ -2,12 +2,13 @@
 import base64
 import logging
 
-import requests
-
 from eaijiraapiabstraction.JiraAttachments import JiraAttachments
 from eaijiraapiabstraction.JiraEpics import JiraEpics
+from eaijiraapiabstraction.JiraIssueCache import JiraIssueCache
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraMetadataCache import JiraMetadataCache
 from eaijiraapiabstraction.JiraReporter import JiraReporter
+from eaijiraapiabstraction.JiraSession import JiraSession
 from eaijiraapiabstraction.JiraStories import JiraStories
 from eaijiraapiabstraction.JiraTests import JiraTests
 from eaijiraapiabstraction.XRayIssues import XRayIssues
@@ -25,12 +26,22 @@ class JiraConnection:
 
         All requests response will be encapsulated in a dictionary providing the status_code and
         the content.
+
+        All the requests are sent through a single keep-alive session so that the connections to
+        Jira are pooled and reused.
     """
     IMPROVEMENT = "Improvement"
     TEST_EXECUTION = "Test Execution"
     IMPROVEMENT_FIELD_KEY = "customfield_10506"
 
-    def __init__(self, url: str = None, username: str = None, password: str = None):
+    def __init__(self, url: str = None, username: str = None, password: str = None,
+                 pool_size: int = JiraSession.DEFAULT_POOL_SIZE,
+                 max_retries: int = JiraSession.DEFAULT_MAX_RETRIES,
+                 timeout: float = JiraSession.DEFAULT_TIMEOUT,
+                 metadata_ttl: float = JiraMetadataCache.DEFAULT_TTL,
+                 metadata_file: str = None, max_in_flight: int = None,
+                 rate_limit: float = None, issue_cache_size: int = JiraIssueCache.DEFAULT_SIZE,
+                 issue_cache_folder: str = None):
         assert url is not None, "The jira endpoint is mandatory"
         assert username is not None, "The username is mandatory"
         assert password is not None, "The password is mandatory"
@@ -38,11 +49,20 @@ class JiraConnection:
         self.url = url.rstrip(" /.")
         self.token = base64.b64encode(str.encode("{}:{}".format(username, password))).decode()
         self.project_id = None
+        self.session = JiraSession(pool_size=pool_size, max_retries=max_retries, timeout=timeout,
+                                   max_in_flight=max_in_flight, rate_limit=rate_limit)
+        self.metadata_cache = JiraMetadataCache(ttl=metadata_ttl, file_name=metadata_file,
+                                                url=self.url)
+        self.issue_cache = JiraIssueCache(size=issue_cache_size, folder=issue_cache_folder,
+                                          url=self.url)
 
     def __del__(self):
         self.url = None
         self.token = None
         self.project_id = None
+        if getattr(self, "session", None) is not None:
+            self.session.close()
+            self.session = None
 
     def header(self):
         """
@@ -51,6 +71,14 @@ class JiraConnection:
         """
         return {'Authorization': "Basic {}".format(self.token), 'content-type': 'application/json'}
 
+    def request_statistics(self):
+        """
+        The requests counters of the session: requests, retries, throttled, backoff_time and
+        rate_limit_time.
+        :return: a dictionary
+        """
+        return self.session.statistics
+
     ###############################
     # PROJECT
     ###############################
@@ -60,7 +88,8 @@ class JiraConnection:
         :raise Exception: Response status code is not 200 ok
         :return: a Request response.
         """
-        response = requests.get("{}/rest/api/2/project".format(self.url), headers=self.header())
+        response = self.session.get("{}/rest/api/2/project".format(self.url),
+                                    headers=self.header())
         if response.status_code != 200:
             log.error("Getting project cast an error {}".format(response.text))
             raise Exception("Getting project cast an error {}".format(response.text))
@@ -125,18 +154,43 @@ class JiraConnection:
         Get the issues' project meta data
         :return:
         """
-        return JiraIssue.get_issue_meta(url=self.url, headers=self.header(),
+        return JiraIssue.get_issue_meta(url=self.url, headers=self.header(), session=self.session,
                                         project_id=self.project_id)
 
-    def get_issue(self, issue_key: str = None):
+    def get_issue(self, issue_key: str = None, fields: list = None, expand: list = None):
         """
         Retrieve a Jira issue by its key.
         :param issue_key: a string as a Jira Key
+        :param fields: the fields to retrieve, None for all fields
+        :param expand: the entities to expand, None for none
         :return: a requests response
         """
         assert isinstance(issue_key, str), "issue_key must be a string"
+        assert fields is None or isinstance(fields, list), "fields must be a list"
+        assert expand is None or isinstance(expand, list), "expand must be a list"
+
+        return JiraIssue.get_issue(url=self.url, headers=self.header(),
+                                   session=self.session, cache=self.issue_cache,
+                                   issue_key=issue_key, fields=fields, expand=expand)
+
+    def get_issues(self, issue_keys: list = None, fields: list = None,
+                   max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Retrieve many issues with a few searches.
+        :param issue_keys: a list of Jira keys
+        :param fields: the fields to retrieve
+        :param max_workers: the number of searches sent concurrently, bounded by the session
+         pool size
+        :return: a dictionary of issues dictionaries by key
+        """
+        assert isinstance(issue_keys, list), "issue_keys must be a list"
+        assert all([isinstance(issue_key, str) for issue_key in issue_keys]), \
+            "all keys in issue_keys must be a string"
+        assert isinstance(fields, list), "fields must be a list"
 
-        return JiraIssue.get_issue(url=self.url, headers=self.header(), issue_key=issue_key)
+        return JiraIssue.get_issues(url=self.url, headers=self.header(), session=self.session,
+                                    issue_keys=issue_keys, fields=fields,
+                                    max_workers=min(max_workers, self.session.pool_size))
 
     def get_issue_identifier(self, issue_type: str = None):
         """
@@ -148,7 +202,37 @@ class JiraConnection:
         assert isinstance(issue_type, str), "issue_type must be a string"
 
         return JiraIssue.get_issue_identifier(url=self.url, headers=self.header(),
-                                              issue_type=issue_type)
+                                              session=self.session, cache=self.metadata_cache,
+                                              issue_type=issue_type, project_id=self.project_id)
+
+    def get_field_identifier(self, field_name: str = None):
+        """
+        Retrieve the field id of a field from its name.
+
+        :param field_name: the field name as displayed in Jira
+        :return: a string as a Jira field id
+        """
+        assert isinstance(field_name, str), "field_name must be a string"
+
+        return JiraIssue.get_field_identifier(url=self.url, headers=self.header(),
+                                              session=self.session, cache=self.metadata_cache,
+                                              field_name=field_name)
+
+    def invalidate_metadata(self, key: str = None):
+        """
+        Forget the cached metadata so that they are requested again.
+        :param key: the cache entry to remove, None to remove all entries
+        :return: None
+        """
+        self.metadata_cache.invalidate(key=key)
+
+    def invalidate_issues(self, issue_key: str = None):
+        """
+        Forget the cached issues so that they are requested again.
+        :param issue_key: the issue to forget, None to forget all issues
+        :return: None
+        """
+        self.issue_cache.invalidate(issue_key=issue_key)
 
     def update_issue_description(self, issue_key: str = None, description: str = None):
         """
@@ -160,7 +244,9 @@ class JiraConnection:
         assert isinstance(issue_key, str), "issue_key must be a string"
         assert isinstance(description, str), "description must be a string"
 
+        self.issue_cache.invalidate(issue_key=issue_key)
         return JiraIssue.update_issue_description(url=self.url, headers=self.header(),
+                                                  session=self.session,
                                                   issue_key=issue_key, description=description)
 
     def get_issue_status(self, issue_key: str = None):
@@ -171,7 +257,24 @@ class JiraConnection:
         """
         assert isinstance(issue_key, str), "issue_key must be a string"
 
-        return JiraIssue.get_issue_status(url=self.url, headers=self.header(), issue_key=issue_key)
+        return JiraIssue.get_issue_status(url=self.url, headers=self.header(),
+                                          session=self.session, cache=self.issue_cache,
+                                          issue_key=issue_key)
+
+    def get_issues_status(self, issue_keys: list = None,
+                          max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Retrieve the status of many issues
+        :param issue_keys: a list of jira issue keys
+        :param max_workers: the number of searches sent concurrently, bounded by the session
+         pool size
+        :return: a dictionary of status names by issue key
+        """
+        assert isinstance(issue_keys, list), "issue_keys must be a list"
+
+        return JiraIssue.get_issues_status(url=self.url, headers=self.header(),
+                                           session=self.session, issue_keys=issue_keys,
+                                           max_workers=min(max_workers, self.session.pool_size))
 
     def create_issue(self, issue_data: dict = None):
         """
@@ -179,7 +282,8 @@ class JiraConnection:
         :param issue_data:
         :return: a request response
         """
-        return JiraIssue.create_issue(url=self.url, headers=self.header(), issue_data=issue_data)
+        return JiraIssue.create_issue(url=self.url, headers=self.header(),
+                                      session=self.session, issue_data=issue_data)
 
     def update_issue(self, issue_key: str = None, issue_data: dict = None):
         """
@@ -188,28 +292,62 @@ class JiraConnection:
         :param issue_data: the issue update
         :return: a request Response
         """
+        self.issue_cache.invalidate(issue_key=issue_key)
         return JiraIssue.update_issue(url=self.url,
-                                      headers=self.header(),
+                                      headers=self.header(), session=self.session,
                                       issue_key=issue_key,
                                       issue_data=issue_data)
 
     def create_link(self, from_key=None, to_key=None, link_type=None):
-        return JiraIssue.create_link(url=self.url, headers=self.header(), from_key=from_key,
+        self.issue_cache.invalidate(issue_key=from_key)
+        self.issue_cache.invalidate(issue_key=to_key)
+        return JiraIssue.create_link(url=self.url, headers=self.header(),
+                                     session=self.session, from_key=from_key,
                                      to_key=to_key, link_type=link_type)
 
-    def search(self, jql_query: str = None, field_list: list = None, paginated: bool = True):
+    def search(self, jql_query: str = None, field_list: list = None, paginated: bool = True,
+               max_workers: int = 1):
+        """
+        Search the issues matching the jql query.
+        :param jql_query: the jql query
+        :param field_list: the fields to retrieve
+        :param paginated: True returns only the first page, False returns all the issues
+        :param max_workers: the number of pages requested concurrently when not paginated. It is
+         bounded by the session pool size.
+        :return: a requests response when paginated otherwise a dictionary with the "issues" key
+        """
         assert isinstance(jql_query, str), "jql_query must be a string"
         assert isinstance(field_list, list), "field_list must be a list"
         assert all([isinstance(field, str) for field in field_list]), \
             "all fields in the field_list must be a string"
         assert isinstance(paginated, bool), "paginated is a boolean True or False"
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
 
         if paginated:
-            return JiraIssue.search(url=self.url, headers=self.header(),
+            return JiraIssue.search(url=self.url, headers=self.header(), session=self.session,
                                     search_request={'jql': jql_query, 'fields': field_list})
         else:
             return JiraIssue.search_issues(url=self.url, headers=self.header(),
-                                           search_request={'jql': jql_query, 'fields': field_list})
+                                           session=self.session,
+                                           search_request={'jql': jql_query, 'fields': field_list},
+                                           max_workers=min(max_workers, self.session.pool_size))
+
+    def iter_issues(self, jql_query: str = None, field_list: list = None, prefetch: bool = True):
+        """
+        Iterate over all the issues matching the jql query without holding all of them in memory.
+        :param jql_query: the jql query
+        :param field_list: the fields to retrieve
+        :param prefetch: request the next page while the current one is consumed
+        :return: a generator of issues as dictionaries
+        """
+        assert isinstance(jql_query, str), "jql_query must be a string"
+        assert isinstance(field_list, list), "field_list must be a list"
+        assert all([isinstance(field, str) for field in field_list]), \
+            "all fields in the field_list must be a string"
+
+        return JiraIssue.iter_issues(url=self.url, headers=self.header(), session=self.session,
+                                     jql=jql_query, fields=field_list, prefetch=prefetch)
 
     #########################################
     # Attachments
@@ -219,14 +357,19 @@ class JiraConnection:
         assert isinstance(issue_key, str), "issue_key must be a string"
 
         return JiraIssue.get_issue_attachments_id(url=self.url, headers=self.header(),
+                                                  session=self.session, cache=self.issue_cache,
                                                   issue_key=issue_key)
 
-    def retrieve_attachments(self, issue_key=None, attachment_id=None, folder=None):
+    def retrieve_attachments(self, issue_key=None, attachment_id=None, folder=None,
+                             max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
         assert isinstance(issue_key, str), "issue_key must be a string"
 
         return JiraAttachments.retrieve_attachments(url=self.url, headers=self.header(),
+                                                    session=self.session, cache=self.issue_cache,
                                                     issue_key=issue_key,
-                                                    attachment_id=attachment_id, folder=folder)
+                                                    attachment_id=attachment_id, folder=folder,
+                                                    max_workers=min(max_workers,
+                                                                    self.session.pool_size))
 
     def add_attachments_to_issue(self, issue_key=None, file_name=None):
         """
@@ -237,13 +380,17 @@ class JiraConnection:
         """
         assert isinstance(issue_key, str), "issue_key must be a string"
 
+        self.issue_cache.invalidate(issue_key=issue_key)
         return JiraIssue.add_attachments_to_issue(url=self.url, headers=self.header(),
+                                                  session=self.session,
                                                   issue_key=issue_key, file_name=file_name)
 
     def delete_attachments(self, issue_key=None, attachment_id=None):
         assert isinstance(issue_key, str), "issue_key must be a string"
 
+        self.issue_cache.invalidate(issue_key=issue_key)
         return JiraAttachments.delete_attachments(url=self.url, headers=self.header(),
+                                                  session=self.session, cache=self.issue_cache,
                                                   issue_key=issue_key, attachment_id=attachment_id)
 
     ############################################
@@ -252,14 +399,34 @@ class JiraConnection:
 
     def create_story(self, title=None, description=None, epic_key=None, actor=None, action=None,
                      benefit=None):
-        return JiraStories.create_story(url=self.url, headers=self.header(),
+        return JiraStories.create_story(url=self.url, headers=self.header(), session=self.session,
+                                        cache=self.metadata_cache,
                                         project_id=self.project_id, title=title,
                                         description=description, epic_key=epic_key, actor=actor,
                                         action=action, benefit=benefit)
 
+    def create_stories(self, stories: list = None):
+        """
+        Create many stories in a few bulk requests.
+        :param stories: a list of dictionaries with the create_story parameters
+        :return: a list of dictionaries in the stories order with the "key", "id" and "error" keys
+        """
+        assert isinstance(stories, list), "stories must be a list"
+
+        results = JiraStories.create_stories(url=self.url, headers=self.header(),
+                                             session=self.session, cache=self.metadata_cache,
+                                             project_id=self.project_id, stories=stories)
+        # The epics get new linked issues
+        for epic_key in set(story.get("epic_key") for story in stories):
+            if epic_key is not None:
+                self.issue_cache.invalidate(issue_key=epic_key)
+        return results
+
     def update_story(self, issue_key=None, title=None, description=None, epic_key=None, actor=None,
                      action=None, benefit=None):
-        return JiraStories.update_story(url=self.url, headers=self.header(), title=title,
+        self.issue_cache.invalidate(issue_key=issue_key)
+        return JiraStories.update_story(url=self.url, headers=self.header(),
+                                        session=self.session, title=title,
                                         description=description, epic_key=epic_key, actor=actor,
                                         action=action, benefit=benefit, issue_key=issue_key)
 
@@ -272,10 +439,13 @@ class JiraConnection:
         Get all epics related to a project
         :return: a list of key-epic name sets
         """
-        return JiraEpics.get_epics(url=self.url, headers=self.header(), project_id=self.project_id)
+        return JiraEpics.get_epics(url=self.url, headers=self.header(),
+                                   session=self.session, project_id=self.project_id)
 
     def add_epic(self, epic_name=None, epic_summary=None):
-        return JiraEpics.add_epic(url=self.url, headers=self.header(), project_id=self.project_id,
+        return JiraEpics.add_epic(url=self.url, headers=self.header(),
+                                  session=self.session, cache=self.metadata_cache,
+                                  project_id=self.project_id,
                                   epic_name=epic_name, epic_summary=epic_summary)
 
     ###########################################
@@ -305,6 +475,27 @@ class JiraConnection:
         response = self.create_link(from_key=key, to_key=story_key, link_type="Tests")
         return response, key
 
+    def add_tests(self, tests: list = None, max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Create many tests in a few bulk requests and link them concurrently to their story.
+        :param tests: a list of dictionaries with the add_test parameters i.e. the "story_key",
+         "test_description", "test_name" and "test_type" keys
+        :param max_workers: the number of links created concurrently, bounded by the session
+         pool size
+        :return: a list of dictionaries in the tests order with the "key", "link" and "error" keys
+        """
+        assert isinstance(tests, list), "tests must be a list"
+
+        results = JiraTests.add_tests(url=self.url, headers=self.header(), session=self.session,
+                                      cache=self.metadata_cache, project_id=self.project_id,
+                                      tests=tests,
+                                      max_workers=min(max_workers, self.session.pool_size))
+        # The stories get new "Tests" links
+        for story_key in set(test.get("story_key") for test in tests):
+            if story_key is not None:
+                self.issue_cache.invalidate(issue_key=story_key)
+        return results
+
     def update_test(self, test_key=None, test_description=None, test_name=None, test_type=None):
         data = {"fields": {
             "summary": test_name,
@@ -317,26 +508,103 @@ class JiraConnection:
         return self.update_issue(issue_key=test_key, issue_data=data)
 
     def get_link_type(self):
-        return requests.get("{}/rest/api/2/issueLinkType".format(self.url), headers=self.header())
+        return self.session.get("{}/rest/api/2/issueLinkType".format(self.url),
+                                headers=self.header())
+
+    def get_link_types(self):
+        """
+        Get the issue link types, from the metadata cache when still valid.
+        :return: a list of dictionaries with the id, name, inward and outward keys
+        """
+        return JiraIssue.get_link_types(url=self.url, headers=self.header(), session=self.session,
+                                        cache=self.metadata_cache)
+
+    def iter_tests_in_test_plan(self, test_plan_key: str = None,
+                                max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Iterate over all the tests of a test plan.
+        :param test_plan_key: the test plan key
+        :param max_workers: the number of pages requested concurrently, bounded by the session
+         pool size
+        :return: a generator of tests dictionaries
+        """
+        assert isinstance(test_plan_key, str), "test_plan_key must be a string"
 
-    def download_execution_evidences(self, test_execution_key=None, folder=None):
+        return XRayIssues.iter_tests_in_test_plan(url=self.url, headers=self.header(),
+                                                  session=self.session,
+                                                  test_plan_key=test_plan_key,
+                                                  max_workers=min(max_workers,
+                                                                  self.session.pool_size))
+
+    def iter_tests_in_execution(self, test_execution_key: str = None,
+                                max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Iterate over all the detailed tests of a test execution.
+        :param test_execution_key: the test execution key
+        :param max_workers: the number of pages requested concurrently, bounded by the session
+         pool size
+        :return: a generator of tests dictionaries
+        """
+        assert isinstance(test_execution_key, str), "test_execution_key must be a string"
+
+        return XRayIssues.iter_tests_in_execution(url=self.url, headers=self.header(),
+                                                  session=self.session,
+                                                  test_execution_key=test_execution_key,
+                                                  max_workers=min(max_workers,
+                                                                  self.session.pool_size))
+
+    def download_execution_evidences(self, test_execution_key=None, folder=None,
+                                     max_workers: int = JiraSession.DEFAULT_POOL_SIZE,
+                                     progress=None, mirror: bool = False):
         return XRayIssues.download_evidence(url=self.url, headers=self.header(),
+                                            session=self.session,
                                             test_execution_key=test_execution_key,
-                                            folder=folder)
-
-    def download_plan_evidences(self, test_plan_key=None, folder=None):
+                                            folder=folder,
+                                            max_workers=min(max_workers,
+                                                            self.session.pool_size),
+                                            progress=progress,
+                                            mirror=mirror)
+
+    def download_plan_evidences(self, test_plan_key=None, folder=None,
+                                max_workers: int = JiraSession.DEFAULT_POOL_SIZE,
+                                progress=None, mirror: bool = False):
         return XRayIssues.download_test_plan_evidences(url=self.url, headers=self.header(),
+                                                       session=self.session,
                                                        test_plan_key=test_plan_key,
-                                                       folder=folder)
-
-    def download_release_evidences(self, release_name=None, folder=None):
+                                                       folder=folder,
+                                                       max_workers=min(max_workers,
+                                                                       self.session.pool_size),
+                                                       progress=progress,
+                                                       mirror=mirror)
+
+    def download_release_evidences(self, release_name=None, folder=None,
+                                   max_workers: int = JiraSession.DEFAULT_POOL_SIZE,
+                                   progress=None, mirror: bool = False):
+        """
+        Download the evidences of all the test plans of a release.
+        :param release_name: the fix version of the test plans
+        :param folder: the destination folder
+        :param max_workers: the number of requests sent concurrently, bounded by the session
+         pool size
+        :param progress: a callable receiving each download result with the number of finished
+         and total downloads
+        :param mirror: only download the new or changed evidences since the previous mirror of
+         the folder and remove the evidences which no longer exist
+        :return: a list of download results
+        """
         return XRayIssues.download_release_evidence(url=self.url, headers=self.header(),
+                                                    session=self.session,
                                                     release_name=release_name,
-                                                    folder=folder)
+                                                    folder=folder,
+                                                    max_workers=min(max_workers,
+                                                                    self.session.pool_size),
+                                                    progress=progress,
+                                                    mirror=mirror)
 
     def import_execution_to_test_plan(self, test_plan_key=None,
                                       cucumber_report_path=None, summary=None):
         response = XRayIssues.create_test_execution(url=self.url, headers=self.header(),
+                                                    session=self.session,
                                                     result_file=cucumber_report_path)
         if response.ok:
             test_execution_key = response.json()["testExecIssue"]["key"]
@@ -347,18 +615,80 @@ class JiraConnection:
                     }}
             return self.update_issue(issue_key=test_execution_key, issue_data=data)
 
-    def test_execution_load_attachments(self, execution_key=None, evidence_files=None):
+    def import_cucumber_reports(self, cucumber_report_paths: list = None, info: dict = None,
+                                max_size: int = XRayIssues.MAX_IMPORT_SIZE,
+                                max_workers: int = JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Import cucumber json reports as new test executions.
+        The reports are merged or split so that each import stays under max_size bytes, each
+         import creating one test execution.
+        :param cucumber_report_paths: the cucumber json reports
+        :param info: the test execution fields e.g. {"fields": {"summary": ...}}, None for the XRay
+         defaults
+        :param max_size: the maximum size of an import in bytes
+        :param max_workers: the number of imports sent concurrently, bounded by the session pool
+         size
+        :return: the requests responses, one per import
+        """
+        assert isinstance(cucumber_report_paths, list), "cucumber_report_paths must be a list"
+
+        return XRayIssues.import_cucumber_results(url=self.url, headers=self.header(),
+                                                  session=self.session,
+                                                  result_files=cucumber_report_paths, info=info,
+                                                  max_size=max_size,
+                                                  max_workers=min(max_workers,
+                                                                  self.session.pool_size))
+
+    def test_execution_load_attachments(self, execution_key=None, evidence_files=None,
+                                        journal_file: str = None,
+                                        max_workers: int = JiraSession.DEFAULT_POOL_SIZE,
+                                        executed_only: bool = False):
+        """
+        Attach the evidences listed by test key in the evidence_files json to the test runs of
+         the execution.
+        :param execution_key: the test execution key
+        :param evidence_files: the json file listing the evidences
+        :param journal_file: the file recording the uploaded evidences so that the call can be
+         resumed, None for no journal
+        :param max_workers: the number of test runs processed concurrently, bounded by the
+         session pool size
+        :param executed_only: only attach the evidences of the tests of the execution, for an
+         evidence file shared by several executions
+        :return: a list of dictionaries with the "test", "file", "status" and "error" keys
+        """
         return XRayIssues.load_attachments(url=self.url,
-                                           headers=self.header(),
+                                           headers=self.header(), session=self.session,
                                            execution_key=execution_key,
-                                           evidence_files=evidence_files)
+                                           evidence_files=evidence_files,
+                                           journal_file=journal_file,
+                                           executed_only=executed_only,
+                                           max_workers=min(max_workers, self.session.pool_size))
 
     #########################################
     # Reports
     #########################################
 
     def release_report(self, release_name: str = None, destination_folder: str = None,
-                       test_plan_key: str = None, test_execution_key: str = None):
+                       test_plan_key: str = None, test_execution_key: str = None,
+                       max_workers: int = JiraSession.DEFAULT_POOL_SIZE,
+                       constant_memory: bool = False, single_workbook: bool = False,
+                       incremental: bool = False):
+        """
+        Create the xlsx reports of a release, a test plan or test executions and download their
+         evidences.
+        :param release_name: the release name
+        :param destination_folder: the reports folder, relative paths are in the home folder
+        :param test_plan_key: the test plan key
+        :param test_execution_key: the test execution key or comma separated keys
+        :param max_workers: the number of executions, tests and evidences fetched concurrently,
+         bounded by the session pool size
+        :param constant_memory: stream the sheets rows to disk instead of keeping them in memory
+         until the workbook is closed, for the very large releases
+        :param single_workbook: write the test plans of a release in one workbook with a release
+         summary sheet instead of one workbook per test plan
+        :param incremental: keep the previous reports of the folder and only fetch the executions
+         updated since then, instead of clearing the folder
+        """
 
         assert isinstance(release_name, str) or isinstance(test_plan_key, str) or \
                isinstance(test_execution_key,
@@ -366,7 +696,8 @@ class JiraConnection:
         assert isinstance(destination_folder, str), "destination_folder must be a string"
 
         # check folder and prepare it
-        destination_folder = JiraReporter.check_folder(folder=destination_folder)
+        destination_folder = JiraReporter.check_folder(folder=destination_folder,
+                                                       incremental=incremental)
 
         # catch many values for test_executions
         if (test_execution_key is not None) and (',' in test_execution_key):
@@ -375,17 +706,30 @@ class JiraConnection:
             for test_exec in test_execution_list:
                 log.info("test execution: {}".format(test_exec))
                 result = JiraReporter.create_release_report(url=self.url, headers=self.header(),
+                                                            session=self.session,
                                                             release_name=release_name,
                                                             test_plan_key=test_plan_key,
                                                             test_execution_key=test_exec,
-                                                            folder=destination_folder)
+                                                            folder=destination_folder,
+                                                            max_workers=min(
+                                                                max_workers,
+                                                                self.session.pool_size),
+                                                            constant_memory=constant_memory,
+                                                            single_workbook=single_workbook,
+                                                            incremental=incremental)
                 log.debug("result: {}".format(result))
                 if result:
                     log.warning("Error for report {}".format(test_exec))
 
         else:
             return JiraReporter.create_release_report(url=self.url, headers=self.header(),
+                                                      session=self.session,
                                                       release_name=release_name,
                                                       test_plan_key=test_plan_key,
                                                       test_execution_key=test_execution_key,
-                                                      folder=destination_folder)
+                                                      folder=destination_folder,
+                                                      max_workers=min(max_workers,
+                                                                      self.session.pool_size),
+                                                      constant_memory=constant_memory,
+                                                      single_workbook=single_workbook,
+                                                      incremental=incremental)
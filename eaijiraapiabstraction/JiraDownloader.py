@@ -0,0 +1,162 @@
+import logging
+import os
+import os.path
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from eaijiraapiabstraction.JiraSession import JiraSession
+
+log = logging.getLogger(__name__)
+
+
+class JiraDownloader:
+    """Download manager for the Jira attachments and the XRay evidences.
+
+        The files are streamed by chunks into a temporary file which is renamed once complete, so
+        that an interrupted download never leaves a truncated file behind. The files sharing a
+        destination are downloaded one after the other.
+        A file already present with the expected size (given by the caller or else by the
+        Content-Length header) is not downloaded again, unless the download is forced.
+        Several files are downloaded at the same time over the session connections and the
+        manager keeps the aggregated counters (see statistics).
+    """
+    CHUNK_SIZE = 1024 * 1024
+    DOWNLOADED = "downloaded"
+    SKIPPED = "skipped"
+    COPIED = "copied"
+    FAILED = "failed"
+
+    def __init__(self, headers: dict = None, session: requests.Session = None,
+                 max_workers: int = 1, chunk_size: int = CHUNK_SIZE):
+        """
+        :param headers: the request headers
+        :param session: the session to send the requests with, None for one-shot connections
+        :param max_workers: the maximum number of files downloaded at the same time
+        :param chunk_size: the number of bytes read at once
+        """
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+        self.headers = headers
+        self.session = session
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.__lock = threading.Lock()
+        self.__statistics = {"downloaded": 0, "skipped": 0, "failed": 0, "bytes": 0,
+                             "seconds": 0.0}
+
+    @property
+    def statistics(self):
+        """
+        The downloads counters: downloaded, skipped and failed files, downloaded bytes, elapsed
+         seconds and throughput in bytes per second.
+        :return: a dictionary
+        """
+        with self.__lock:
+            statistics = dict(self.__statistics)
+        statistics["throughput"] = statistics["bytes"] / statistics["seconds"] \
+            if statistics["seconds"] else 0.0
+        return statistics
+
+    def __count(self, **increments):
+        with self.__lock:
+            for key, value in increments.items():
+                self.__statistics[key] += value
+
+    def download_file(self, url: str = None, file_absolute_path: str = None, size: int = None,
+                      force: bool = False):
+        """
+        Download one file.
+        :param url: the file url
+        :param file_absolute_path: the destination file
+        :param size: the expected size in bytes if known, it avoids requesting a present file
+        :param force: download the file even if a file of the same size is present, e.g. when
+         the remote file has been replaced
+        :return: a dictionary with the "path", "status", "bytes" and "error" keys
+        """
+        result = {"path": file_absolute_path, "status": JiraDownloader.SKIPPED, "bytes": 0,
+                  "error": None}
+        if not force and size is not None and os.path.isfile(file_absolute_path) \
+                and os.path.getsize(file_absolute_path) == int(size):
+            self.__count(skipped=1)
+            return result
+
+        temporary_path = None
+        try:
+            with JiraSession.resolve(self.session).get(url=url, headers=self.headers,
+                                                       stream=True) as response:
+                if response.status_code != 200:
+                    raise Exception("Download return\n response code: '{}'".format(
+                        response.status_code))
+                length = response.headers.get("Content-Length")
+                if not force and length is not None and os.path.isfile(file_absolute_path) \
+                        and os.path.getsize(file_absolute_path) == int(length):
+                    # The body is not read so the transfer stops here
+                    self.__count(skipped=1)
+                    return result
+                # A unique temporary file, another download may target the same destination
+                descriptor, temporary_path = tempfile.mkstemp(
+                    dir=os.path.dirname(file_absolute_path) or None,
+                    prefix="{}.".format(os.path.basename(file_absolute_path)), suffix=".part")
+                with os.fdopen(descriptor, "wb") as download_file:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        download_file.write(chunk)
+                        result["bytes"] += len(chunk)
+            os.replace(temporary_path, file_absolute_path)
+        except Exception as exception:
+            log.error("Download of '{}' into '{}' failed: {}".format(url, file_absolute_path,
+                                                                     repr(exception)))
+            if temporary_path is not None and os.path.isfile(temporary_path):
+                os.remove(temporary_path)
+            result["status"] = JiraDownloader.FAILED
+            result["error"] = repr(exception)
+            self.__count(failed=1, bytes=result["bytes"])
+            return result
+        result["status"] = JiraDownloader.DOWNLOADED
+        self.__count(downloaded=1, bytes=result["bytes"])
+        return result
+
+    def download_files(self, files: list = None, progress=None):
+        """
+        Download many files concurrently.
+        :param files: a list of dictionaries with the "url", "path" and optional "size" and
+         "force" keys
+        :param progress: a callable receiving each result with the number of finished files and
+         the number of files, as soon as a file is finished
+        :return: the download_file results in the files order
+        """
+        assert isinstance(files, list), "files must be a list"
+
+        # The files of a destination are downloaded one after the other in the same task
+        paths = {}
+        for index, file in enumerate(files):
+            paths.setdefault(file["path"], []).append(index)
+
+        def download_path(indexes):
+            return [(index, self.download_file(url=files[index]["url"],
+                                               file_absolute_path=files[index]["path"],
+                                               size=files[index].get("size"),
+                                               force=files[index].get("force", False)))
+                    for index in indexes]
+
+        start = time.monotonic()
+        results = [None] * len(files)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(download_path, indexes) for indexes in paths.values()]
+            for future in as_completed(futures):
+                for index, result in future.result():
+                    results[index] = result
+                    done += 1
+                    log.debug("{}/{} {}".format(done, len(files), result["path"]))
+                    if progress is not None:
+                        progress(result, done, len(files))
+        self.__count(seconds=time.monotonic() - start)
+        statistics = self.statistics
+        log.info("{} file(s) downloaded, {} skipped, {} failed: {} bytes at {:.0f} bytes/s".format(
+            statistics["downloaded"], statistics["skipped"], statistics["failed"],
+            statistics["bytes"], statistics["throughput"]))
+        return results
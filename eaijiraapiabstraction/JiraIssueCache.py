@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger(__name__)
+
+
+class JiraIssueCache:
+    """Cache of the issues responses keyed by issue key and requested fields.
+
+        The entries are kept in an in-process LRU so that an issue read twice in a run is
+        requested only once. When a folder is given the entries are also stored on disk, one json
+        file per entry, and revalidated on the next run: with the ETag when the server sent one,
+        otherwise by comparing the issue "updated" field. The file names hold a hash of the server
+        url so that the connections to several servers can share a folder.
+        The writes through the JiraConnection invalidate the issue entries.
+    """
+    DEFAULT_SIZE = 256
+
+    def __init__(self, size: int = DEFAULT_SIZE, folder: str = None, url: str = None):
+        """
+        :param size: the maximum number of entries kept in memory
+        :param folder: the folder where the entries are persisted, None to keep them in memory
+         only
+        :param url: the Jira server url
+        """
+        assert isinstance(size, int) and size > 0, "size must be a positive integer"
+        self.size = size
+        self.folder = folder
+        self.url = url
+        self.__server = hashlib.sha1(str(url).encode()).hexdigest()[:12]
+        self.__entries = OrderedDict()
+        self.__lock = threading.RLock()
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def key(issue_key: str = None, fields: list = None, expand: list = None):
+        """
+        Build the entry key.
+        :param issue_key: the issue key
+        :param fields: the requested fields, None for all fields
+        :param expand: the requested expansions, None for no expansion
+        :return: a string
+        """
+        return "{}|{}|{}".format(issue_key, ",".join(sorted(fields)) if fields else "*all",
+                                 ",".join(sorted(expand)) if expand else "")
+
+    def __file_name(self, key):
+        # The issue key and server prefix allows to invalidate all the entries of an issue
+        return os.path.join(self.folder, "{}_{}_{}.json".format(
+            key.split("|")[0], self.__server, hashlib.sha1(key.encode()).hexdigest()))
+
+    def get(self, key: str = None):
+        """
+        Get an entry from the memory.
+        :param key: the entry key
+        :return: the entry dictionary or None
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    def get_stored(self, key: str = None):
+        """
+        Get an entry from the disk. The entry must be revalidated before being used.
+        :param key: the entry key
+        :return: the entry dictionary or None
+        """
+        if self.folder is None:
+            return None
+        try:
+            with open(self.__file_name(key)) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("key") == key else None
+
+    def set(self, key: str = None, response: requests.Response = None):
+        """
+        Store a successful response.
+        :param key: the entry key
+        :param response: the issue response
+        :return: the entry dictionary
+        """
+        try:
+            updated = response.json().get("fields", {}).get("updated")
+        except (ValueError, AttributeError):
+            updated = None
+        # Only the headers needed to revalidate and rebuild the response are kept, the others may
+        # hold session credentials (Set-Cookie)
+        entry = {"key": key, "status_code": response.status_code, "url": response.url,
+                 "etag": response.headers.get("ETag"),
+                 "content_type": response.headers.get("Content-Type"),
+                 "updated": updated, "content": response.text}
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last=False)
+        if self.folder is not None:
+            file_name = self.__file_name(key)
+            temporary_name = "{}.{}.tmp".format(file_name, threading.get_ident())
+            try:
+                with open(temporary_name, "w") as entry_file:
+                    json.dump(entry, entry_file)
+                os.replace(temporary_name, file_name)
+            except OSError as exception:
+                log.warning("Issue cache entry '{}' not saved: {}".format(key, repr(exception)))
+        return entry
+
+    def keep(self, entry: dict = None):
+        """
+        Put back in memory a revalidated disk entry.
+        :param entry: the entry dictionary
+        :return: None
+        """
+        with self.__lock:
+            self.__entries[entry["key"]] = entry
+            self.__entries.move_to_end(entry["key"])
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, issue_key: str = None):
+        """
+        Remove the entries of an issue or all entries.
+        :param issue_key: the issue key, None to clear the cache
+        :return: None
+        """
+        with self.__lock:
+            keys = [key for key in self.__entries
+                    if issue_key is None or key.split("|")[0] == issue_key]
+            for key in keys:
+                del self.__entries[key]
+        if self.folder is None:
+            return
+        for file_name in os.listdir(self.folder):
+            parts = file_name.rsplit("_", 2)
+            # Only the entries of this server are removed
+            if not file_name.endswith(".json") or len(parts) != 3 or parts[1] != self.__server or \
+                    (issue_key is not None and parts[0] != issue_key):
+                continue
+            try:
+                os.remove(os.path.join(self.folder, file_name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def to_response(entry: dict = None):
+        """
+        Rebuild a requests response from an entry.
+        :param entry: the entry dictionary
+        :return: a requests response
+        """
+        response = requests.Response()
+        response.status_code = entry["status_code"]
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict({name: value for name, value in (
+            ("ETag", entry.get("etag")), ("Content-Type", entry.get("content_type")))
+            if value is not None})
+        response.encoding = "utf-8"
+        response._content = entry["content"].encode("utf-8")
+        return response
@@ -1,114 +1,335 @@
 import requests
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 
+from eaijiraapiabstraction.JiraIssueCache import JiraIssueCache
+from eaijiraapiabstraction.JiraMetadataCache import JiraMetadataCache
+from eaijiraapiabstraction.JiraSession import JiraSession
+
 
 # TODO: update exception handling and raising
 # TODO: implement a paranoid development
 class JiraIssue:
+    # Default value of the jira.bulk.create.max.issues.per.request server property
+    BULK_CREATE_MAX_ISSUES = 50
+    # Keep the search jql far below the url and jql length limits
+    ISSUE_KEYS_PER_SEARCH = 100
+    JQL_MAX_LENGTH = 2000
+
     @staticmethod
-    def get_issue_meta(url: str = None, headers: dict = None, project_id: str = None):
+    def get_issue_meta(url: str = None, headers: dict = None, project_id: str = None,
+                       session: requests.Session = None):
         """
         Get the issues' project meta data
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param project_id: the project identifier as a string
         :type project_id str
         :return: a requests response.
         """
-        return requests.get("{}/rest/api/2/issue/createmeta".format(url), headers=headers,
-                            params={'projectIds': str(project_id)})
+        return JiraSession.resolve(session).get("{}/rest/api/2/issue/createmeta".format(url),
+                                                headers=headers,
+                                                params={'projectIds': str(project_id)})
 
     @staticmethod
-    def get_issue(url: str = None, headers: dict = None, issue_key: str = None):
+    def get_issue(url: str = None, headers: dict = None, issue_key: str = None,
+                  session: requests.Session = None, cache: JiraIssueCache = None,
+                  fields: list = None, expand: list = None):
         """
         Retrieve a Jira issue by its key.
+        With a cache, an issue already read in the run is not requested again and an issue stored
+        on disk is only downloaded when it has changed.
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key: a string as a Jira Key
         :type issue_key str
+        :param cache: the issues cache, None to always request the server
+        :type cache JiraIssueCache
+        :param fields: the fields to retrieve, None for all fields
+        :type fields list
+        :param expand: the entities to expand e.g. renderedFields or changelog, None for none
+        :type expand list
         :return: a requests response
         """
-        return requests.get("{}/rest/api/2/issue/{}".format(url, issue_key),
-                            headers=headers)
+        http = JiraSession.resolve(session)
+        issue_url = "{}/rest/api/2/issue/{}".format(url, issue_key)
+        params = {}
+        if fields:
+            # The updated field allows to revalidate the cached issue
+            params["fields"] = ",".join(fields if cache is None or "updated" in fields
+                                        else list(fields) + ["updated"])
+        if expand:
+            params["expand"] = ",".join(expand)
+        if cache is None:
+            return http.get(issue_url, headers=headers, params=params or None)
+
+        key = JiraIssueCache.key(issue_key=issue_key, fields=fields, expand=expand)
+        entry = cache.get(key)
+        if entry is not None:
+            return JiraIssueCache.to_response(entry)
+        entry = cache.get_stored(key)
+        if entry is not None and entry["etag"] is not None:
+            response = http.get(issue_url, params=params or None,
+                                headers=dict(headers or {}, **{"If-None-Match": entry["etag"]}))
+            if response.status_code == 304:
+                cache.keep(entry)
+                return JiraIssueCache.to_response(entry)
+        else:
+            if entry is not None and entry["updated"] is not None:
+                # Without ETag, compare the last update date which is a small payload
+                check = http.get(issue_url, headers=headers, params={"fields": "updated"})
+                if check.status_code == 200 and \
+                        check.json().get("fields", {}).get("updated") == entry["updated"]:
+                    cache.keep(entry)
+                    return JiraIssueCache.to_response(entry)
+            response = http.get(issue_url, headers=headers, params=params or None)
+        if response.status_code == 200:
+            cache.set(key, response)
+        return response
+
+    @staticmethod
+    def get_issues(url: str = None, headers: dict = None, issue_keys: list = None,
+                   fields: list = None, session: requests.Session = None,
+                   chunk_size: int = ISSUE_KEYS_PER_SEARCH, max_workers: int = 1,
+                   max_jql_length: int = JQL_MAX_LENGTH):
+        """
+        Retrieve many issues with a few "issuekey in (...)" searches instead of one request per
+         issue.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param issue_keys: the issues keys
+        :type issue_keys list
+        :param fields: the fields to retrieve
+        :type fields list
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param chunk_size: the maximum number of keys per search
+        :type chunk_size int
+        :param max_workers: the maximum number of searches sent at the same time
+        :type max_workers int
+        :param max_jql_length: the maximum length of a search jql
+        :type max_jql_length int
+        :return: a dictionary of issues dictionaries by key. The unknown keys are missing.
+        """
+        assert isinstance(issue_keys, list), "issue_keys must be a list"
+        assert isinstance(fields, list), "fields must be a list"
+        assert isinstance(chunk_size, int) and chunk_size > 0, \
+            "chunk_size must be a positive integer"
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+
+        # Keep the first occurrence order and drop the duplicates
+        keys = list(dict.fromkeys(issue_keys))
+        # A chunk is closed when it is full or when one more key would exceed the jql length
+        chunks = []
+        length = 0
+        for key in keys:
+            if not chunks or len(chunks[-1]) == chunk_size or \
+                    length + len(key) + 1 > max_jql_length:
+                chunks.append([])
+                length = len("issuekey in ()")
+            chunks[-1].append(key)
+            length += len(key) + 1
+
+        def search_chunk(chunk):
+            # Without the query validation an unknown key is a warning instead of an error
+            search_request = {"jql": "issuekey in ({})".format(",".join(chunk)),
+                              "fields": fields, "validateQuery": False}
+            return JiraIssue.search_issues(url=url, headers=headers,
+                                           search_request=search_request,
+                                           session=session)["issues"]
+
+        issues = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk_issues in executor.map(search_chunk, chunks):
+                for issue in chunk_issues:
+                    issues[issue["key"]] = issue
+        missing = [key for key in keys if key not in issues]
+        if missing:
+            logging.warning("Issues not found: {}".format(", ".join(missing)))
+        return issues
 
     @staticmethod
-    def get_issue_identifier(url: str = None, headers: dict = None, issue_type: str = None):
+    def get_issue_identifier(url: str = None, headers: dict = None, issue_type: str = None,
+                             project_id: str = None, session: requests.Session = None,
+                             cache: JiraMetadataCache = None):
         """
         Retrieve the issue id of a specific issue type.
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_type: the issue name
+        :param project_id: the project identifier as a string
+        :type project_id str
+        :param cache: the metadata cache holding the project issue types, None to always request
+         the createmeta endpoint
+        :type cache JiraMetadataCache
         :return: a string as a Jira id
         """
         assert issue_type is not None, "Issue type is mandatory"
         assert isinstance(issue_type, str), "Issue type is a string"
 
-        response = JiraIssue.get_issue_meta(url=url, headers=headers)
-        # Response JSON is projects/<list>/issuetypes
-        for response_issue_type in response.json()["projects"][0]["issuetypes"]:
+        def load_issue_types():
+            response = JiraIssue.get_issue_meta(url=url, headers=headers, project_id=project_id,
+                                                session=session)
+            # Response JSON is projects/<list>/issuetypes
+            return [{"id": str(response_issue_type["id"]), "name": response_issue_type["name"]}
+                    for response_issue_type in response.json()["projects"][0]["issuetypes"]]
+
+        if cache is None:
+            issue_types = load_issue_types()
+        else:
+            issue_types = cache.get_or_load(JiraMetadataCache.ISSUE_TYPES.format(project_id),
+                                            load_issue_types)
+        for response_issue_type in issue_types:
             if response_issue_type['name'].casefold() == issue_type.casefold():
                 return str(response_issue_type["id"])
 
         logging.error("Issue {} not found".format(issue_type))
         raise Exception("Issue {} not found".format(issue_type))
 
+    @staticmethod
+    def get_field_identifier(url: str = None, headers: dict = None, field_name: str = None,
+                             session: requests.Session = None, cache: JiraMetadataCache = None):
+        """
+        Retrieve the field id (e.g. customfield_10204) of a field from its name.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param field_name: the field name as displayed in Jira
+        :type field_name str
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param cache: the metadata cache holding the fields, None to always request the server
+        :type cache JiraMetadataCache
+        :return: a string as the field id
+        """
+        assert isinstance(field_name, str), "field_name must be a string"
+
+        def load_fields():
+            response = JiraSession.resolve(session).get("{}/rest/api/2/field".format(url),
+                                                        headers=headers)
+            if response.status_code != 200:
+                raise Exception("Get fields return\n response code: '{}'\n response text: '{}'"
+                                .format(response.status_code, response.text))
+            return [{"id": field["id"], "name": field["name"]} for field in response.json()]
+
+        if cache is None:
+            fields = load_fields()
+        else:
+            fields = cache.get_or_load(JiraMetadataCache.FIELDS, load_fields)
+        for field in fields:
+            if field["name"].casefold() == field_name.casefold():
+                return field["id"]
+
+        logging.error("Field {} not found".format(field_name))
+        raise Exception("Field {} not found".format(field_name))
+
+    @staticmethod
+    def get_link_types(url: str = None, headers: dict = None, session: requests.Session = None,
+                       cache: JiraMetadataCache = None):
+        """
+        Retrieve the issue link types of the Jira instance.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param cache: the metadata cache holding the link types, None to always request the server
+        :type cache JiraMetadataCache
+        :return: a list of dictionaries with the id, name, inward and outward keys
+        """
+        def load_link_types():
+            response = JiraSession.resolve(session).get(
+                "{}/rest/api/2/issueLinkType".format(url), headers=headers)
+            if response.status_code != 200:
+                raise Exception("Get link types return\n response code: '{}'\n response text: "
+                                "'{}'".format(response.status_code, response.text))
+            return response.json()["issueLinkTypes"]
+
+        if cache is None:
+            return load_link_types()
+        return cache.get_or_load(JiraMetadataCache.LINK_TYPES, load_link_types)
+
     @staticmethod
     def update_issue_description(url: str = None, headers: dict = None, issue_key: str = None,
-                                 description: str = None):
+                                 description: str = None, session: requests.Session = None):
         """
         Update the issue's description with the new description
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key: the issue key to update
         :type issue_key str
         :param description: the new description
         :return: a requests response
         """
         data = {"update": {"description": [{'set': description}]}}
-        return requests.put("{}/rest/api/2/issue/{}".format(url, issue_key),
-                            data=json.dumps(data),
-                            headers=headers)
+        return JiraSession.resolve(session).put("{}/rest/api/2/issue/{}".format(url, issue_key),
+                                                data=json.dumps(data),
+                                                headers=headers)
 
     @staticmethod
-    def get_issue_attachments_id(url: str = None, headers: dict = None, issue_key: str = None):
+    def get_issue_attachments_id(url: str = None, headers: dict = None, issue_key: str = None,
+                                 session: requests.Session = None, cache: JiraIssueCache = None):
         """
 
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key:
+        :param cache: the issues cache, None to always request the server
+        :type cache JiraIssueCache
         :return:
         """
-        response = JiraIssue.get_issue(url=url, headers=headers, issue_key=issue_key)
+        response = JiraIssue.get_issue(url=url, headers=headers, issue_key=issue_key,
+                                       session=session, cache=cache, fields=["attachment"])
         assert response.status_code == 200, "Can't get the issue {}".format(issue_key)
 
         attachments = response.json()["fields"]["attachment"]
         return [attachment["id"] for attachment in attachments]
 
     @staticmethod
-    def get_issue_status(url: str = None, headers: dict = None, issue_key=None):
+    def get_issue_status(url: str = None, headers: dict = None, issue_key=None,
+                         session: requests.Session = None, cache: JiraIssueCache = None):
         """
 
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key:
+        :param cache: the issues cache, None to always request the server
+        :type cache JiraIssueCache
         :return: a string as the status
         """
-        response = requests.get("{}/rest/api/2/issue/{}".format(url, issue_key),
-                                headers=headers)
+        response = JiraIssue.get_issue(url=url, headers=headers, issue_key=issue_key,
+                                       session=session, cache=cache, fields=["status"])
         if response.status_code == 200:
             return response.json()['fields']['status']['name']
         else:
@@ -116,13 +337,38 @@ class JiraIssue:
                 "Get issue status return\n response code: '{}'\n response text: '{}'".format(response.status_code, response.text))  # noqa
 
     @staticmethod
-    def create_issue(url: str = None, headers: dict = None, issue_data: dict = None):
+    def get_issues_status(url: str = None, headers: dict = None, issue_keys: list = None,
+                          session: requests.Session = None, max_workers: int = 1):
+        """
+        Retrieve the status of many issues with a few searches.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param issue_keys: the issues keys
+        :type issue_keys list
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param max_workers: the maximum number of searches sent at the same time
+        :type max_workers int
+        :return: a dictionary of status names by issue key. The unknown keys are missing.
+        """
+        issues = JiraIssue.get_issues(url=url, headers=headers, issue_keys=issue_keys,
+                                      fields=["status"], session=session,
+                                      max_workers=max_workers)
+        return {key: issue["fields"]["status"]["name"] for key, issue in issues.items()}
+
+    @staticmethod
+    def create_issue(url: str = None, headers: dict = None, issue_data: dict = None,
+                     session: requests.Session = None):
         """
         Create an issue with the given payload
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_data:
         :type issue_data dict
         :return: a request Response
@@ -130,18 +376,81 @@ class JiraIssue:
         assert isinstance(issue_data, dict), "The payload must be a dictionary"
         assert issue_data != {}, "The payload can't be empty"
 
-        return requests.post("{}/rest/api/2/issue".format(url), data=json.dumps(issue_data),
-                             headers=headers)
+        return JiraSession.resolve(session).post("{}/rest/api/2/issue".format(url),
+                                                 data=json.dumps(issue_data),
+                                                 headers=headers)
+
+    @staticmethod
+    def create_issues(url: str = None, headers: dict = None, issues_data: list = None,
+                      session: requests.Session = None,
+                      chunk_size: int = BULK_CREATE_MAX_ISSUES):
+        """
+        Create many issues with the bulk endpoint, chunk_size issues per request.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param issues_data: the issues payloads as for create_issue
+        :type issues_data list
+        :param chunk_size: the maximum number of issues per request
+        :type chunk_size int
+        :return: a list of dictionaries in the issues_data order with the "key", "id" and "error"
+         keys. "error" is None for the created issues, "key" and "id" are None for the others.
+        """
+        assert isinstance(issues_data, list), "The payloads must be a list"
+        assert all([isinstance(issue_data, dict) and issue_data != {}
+                    for issue_data in issues_data]), "The payloads must be non empty dictionaries"
+        assert isinstance(chunk_size, int) and chunk_size > 0, \
+            "chunk_size must be a positive integer"
+
+        results = []
+        http = JiraSession.resolve(session)
+        for start in range(0, len(issues_data), chunk_size):
+            chunk = issues_data[start:start + chunk_size]
+            response = http.post("{}/rest/api/2/issue/bulk".format(url),
+                                 data=json.dumps({"issueUpdates": chunk}),
+                                 headers=headers)
+            try:
+                content = response.json()
+            except ValueError:
+                content = {}
+            if not isinstance(content, dict):
+                content = {}
+            # The created issues are listed in the request order, the failed ones are only
+            # referenced by their position in the errors
+            errors = {error.get("failedElementNumber"): error
+                      for error in content.get("errors", [])}
+            created = iter(content.get("issues", []))
+            for index in range(len(chunk)):
+                if index in errors:
+                    results.append({"key": None, "id": None, "error": errors[index]})
+                    continue
+                issue = next(created, None)
+                if issue is None:
+                    results.append({"key": None, "id": None,
+                                    "error": {"status": response.status_code,
+                                              "text": response.text}})
+                else:
+                    results.append({"key": issue["key"], "id": issue["id"], "error": None})
+            if errors or response.status_code != 201:
+                logging.warning("Bulk creation of {} issues returned {} with {} "
+                                "error(s)".format(len(chunk), response.status_code,
+                                                  len(errors)))
+        return results
 
     @staticmethod
     def update_issue(url: str = None, headers: dict = None, issue_key: str = None,
-                     issue_data: dict = None):
+                     issue_data: dict = None, session: requests.Session = None):
         """
 
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key:
         :param issue_data:
         :return: a request Response
@@ -150,19 +459,21 @@ class JiraIssue:
         assert isinstance(issue_data, dict), "The payload must be a dictionary"
         assert "update" in issue_data, "The payload must contains the 'update' key"
 
-        return requests.put("{}/rest/api/2/issue/{}".format(url, issue_key),
-                            data=json.dumps(issue_data),
-                            headers=headers)
+        return JiraSession.resolve(session).put("{}/rest/api/2/issue/{}".format(url, issue_key),
+                                                data=json.dumps(issue_data),
+                                                headers=headers)
 
     @staticmethod
     def create_link(url: str = None, headers: dict = None, from_key=None, to_key=None,
-                    link_type=None):
+                    link_type=None, session: requests.Session = None):
         """
 
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param from_key:
         :param to_key:
         :param link_type:
@@ -179,17 +490,20 @@ class JiraIssue:
                 "key": str(to_key)
             }
         }
-        return requests.post("{}/rest/api/2/issueLink".format(url), data=json.dumps(data),
-                             headers=headers)
+        return JiraSession.resolve(session).post("{}/rest/api/2/issueLink".format(url),
+                                                 data=json.dumps(data),
+                                                 headers=headers)
 
     @staticmethod
     def add_attachments_to_issue(url: str = None, headers: dict = None, issue_key=None,
-                                 file_name=None):
+                                 file_name=None, session: requests.Session = None):
         """
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key:
         :param file_name:
         :return:
@@ -198,61 +512,160 @@ class JiraIssue:
         temp_header["X-Atlassian-Token"] = "no-check"
 
         with open(file_name, "rb") as file:
-            return requests.post("{}/rest/api/2/issue/{}/attachments".format(url, issue_key),
-                                 files={'file': file},
-                                 headers=temp_header)
+            return JiraSession.resolve(session).post(
+                "{}/rest/api/2/issue/{}/attachments".format(url, issue_key),
+                files={'file': file},
+                headers=temp_header)
 
     @staticmethod
-    def get_issue_attachments_links(url: str = None, headers: dict = None, issue_key=None):
+    def get_issue_attachments_links(url: str = None, headers: dict = None, issue_key=None,
+                                    session: requests.Session = None,
+                                    cache: JiraIssueCache = None):
         """
         Provide the list of issue's attachments.
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param issue_key: the jira issue key
+        :param cache: the issues cache, None to always request the server
+        :type cache JiraIssueCache
         :return: a dictionary of dictionaries.
         """
-        response = JiraIssue.get_issue(url=url, headers=headers, issue_key=issue_key)
+        response = JiraIssue.get_issue(url=url, headers=headers, issue_key=issue_key,
+                                       session=session, cache=cache, fields=["attachment"])
         assert response.status_code == 200, "Can't get the issue {}".format(issue_key)
 
         attachments = response.json()["fields"]["attachment"]
         result = {}
         for attachment in attachments:
             result[attachment["id"]] = {"url": attachment["content"],
-                                        "filename": attachment["filename"]}
+                                        "filename": attachment["filename"],
+                                        "size": attachment.get("size")}
         return result
 
     @staticmethod
-    def search_issues(url: str = None, headers: dict = None, search_request=None):
+    def search_issues(url: str = None, headers: dict = None, search_request=None,
+                      session: requests.Session = None, max_workers: int = 1):
         """
         Search all issues recursively i.e. try to get all issues matching the request without
          pagination
+        With more than one worker, the first page gives the total number of issues and the
+         remaining pages are requested concurrently. The issues keep the search order.
         :param url: the jira server url without endpoint
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param search_request:
+        :param max_workers: the maximum number of pages requested at the same time
+        :type max_workers int
         :return: a dictionary with "issues" key and value a list of requested fields as a dictionary
         """
-        new_search = deepcopy(search_request)
-        new_search["startAt"] = 0
-        end_point = "{}/rest/api/2/search".format(url)
-        post = requests.post
-        dump = json.dumps
-        response = post(url=end_point, headers=headers, data=dump(new_search))
-        max_results = response.json()["maxResults"]
-        search_return = {"issues": []}
-        while max_results == len(response.json()["issues"]):
-            search_return["issues"].extend(response.json()["issues"])
-            new_search["startAt"] = new_search["startAt"] + response.json()["maxResults"]
-            response = post(url=end_point, headers=headers, data=dump(new_search))
-
-        search_return["issues"].extend(response.json()["issues"])
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+
+        page = JiraIssue.__search_page(url=url, headers=headers, search_request=search_request,
+                                       start_at=0, session=session)
+        max_results = page["maxResults"]
+        search_return = {"issues": page["issues"]}
+        start_at = 0
+        if max_workers > 1 and max_results and max_results == len(page["issues"]):
+            start_list = list(range(max_results, page.get("total", 0), max_results))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # map keeps the submission order so the pages are merged in order
+                for page in executor.map(
+                        lambda start: JiraIssue.__search_page(url=url, headers=headers,
+                                                              search_request=search_request,
+                                                              start_at=start, session=session),
+                        start_list):
+                    search_return["issues"].extend(page["issues"])
+            if start_list:
+                start_at = start_list[-1]
+        # Sequential walk, also catches the issues added after the total has been read
+        while max_results and max_results == len(page["issues"]):
+            start_at = start_at + max_results
+            page = JiraIssue.__search_page(url=url, headers=headers,
+                                           search_request=search_request, start_at=start_at,
+                                           session=session)
+            search_return["issues"].extend(page["issues"])
         return search_return
 
     @staticmethod
-    def search(url: str = None, headers: dict = None, search_request=None):
+    def iter_issues(url: str = None, headers: dict = None, jql: str = None, fields: list = None,
+                    session: requests.Session = None, prefetch: bool = False,
+                    page_size: int = None):
+        """
+        Yield all the issues matching the jql query, page by page, so that only one page (two
+         with the prefetch) is held in memory.
+        :param url: the jira server url without endpoint
+        :type url str
+        :param headers: the request headers
+        :type headers dict
+        :param jql: the jql query
+        :type jql str
+        :param fields: the fields to retrieve
+        :type fields list
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
+        :param prefetch: request the next page while the current one is consumed
+        :type prefetch bool
+        :param page_size: the maxResults requested, None for the server default
+        :type page_size int
+        :return: a generator of issues as dictionaries
+        """
+        assert isinstance(jql, str), "jql must be a string"
+        assert isinstance(fields, list), "fields must be a list"
+
+        search_request = {"jql": jql, "fields": fields}
+        if page_size is not None:
+            search_request["maxResults"] = page_size
+
+        def fetch(start_at):
+            return JiraIssue.__search_page(url=url, headers=headers,
+                                           search_request=search_request, start_at=start_at,
+                                           session=session)
+
+        start_at = 0
+        if not prefetch:
+            while True:
+                page = fetch(start_at)
+                yield from page["issues"]
+                if not page["maxResults"] or len(page["issues"]) < page["maxResults"]:
+                    return
+                start_at = start_at + page["maxResults"]
+        else:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                next_page = executor.submit(fetch, start_at)
+                while True:
+                    page = next_page.result()
+                    is_last = not page["maxResults"] or len(page["issues"]) < page["maxResults"]
+                    if not is_last:
+                        start_at = start_at + page["maxResults"]
+                        next_page = executor.submit(fetch, start_at)
+                    yield from page["issues"]
+                    if is_last:
+                        return
+
+    @staticmethod
+    def __search_page(url: str = None, headers: dict = None, search_request=None,
+                      start_at: int = 0, session: requests.Session = None):
+        """
+        Request one page of a search
+        :return: the decoded search response
+        """
+        new_search = deepcopy(search_request)
+        new_search["startAt"] = start_at
+        return JiraSession.resolve(session).post(url="{}/rest/api/2/search".format(url),
+                                                 headers=headers,
+                                                 data=json.dumps(new_search)).json()
+
+    @staticmethod
+    def search(url: str = None, headers: dict = None, search_request=None,
+               session: requests.Session = None):
         """
         Search issues bound to the search request. If there is a pagination the response will
          be limited to
@@ -262,11 +675,14 @@ class JiraIssue:
         :type url str
         :param headers: the request headers
         :type headers dict
+        :param session: the session to send the request with, None for a one-shot connection
+        :type session requests.Session
         :param search_request:
         :return:
         """
-        return requests.post(url="{}/rest/api/2/search".format(url), headers=headers,
-                             data=json.dumps(search_request))
+        return JiraSession.resolve(session).post(url="{}/rest/api/2/search".format(url),
+                                                 headers=headers,
+                                                 data=json.dumps(search_request))
 
     @staticmethod
     def sanitize(content: bytes = None):
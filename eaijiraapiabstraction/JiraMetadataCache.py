@@ -0,0 +1,122 @@
+import json
+import logging
+import os.path
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class JiraMetadataCache:
+    """Cache of the Jira metadata which rarely change (issue types, fields, link types).
+
+        Each entry expires after the time to live. When a file name is given the entries are
+        persisted in it as json so that a new process starts with the previous values. The file
+        keeps the entries of each Jira server apart, so it can be shared between servers.
+    """
+    DEFAULT_TTL = 3600
+    ISSUE_TYPES = "issuetypes/{}"
+    FIELDS = "fields"
+    LINK_TYPES = "linktypes"
+
+    def __init__(self, ttl: float = DEFAULT_TTL, file_name: str = None, url: str = None):
+        """
+        :param ttl: the entries time to live in seconds, None means no expiration
+        :param file_name: the json file where the entries are persisted, None to keep them in
+         memory only
+        :param url: the jira server url the entries belong to
+        """
+        assert ttl is None or ttl >= 0, "ttl must be a positive number or None"
+        self.ttl = ttl
+        self.file_name = file_name
+        self.url = url
+        self.__entries = {}
+        # The entries of the other servers found in the file, written back unchanged
+        self.__servers = {}
+        self.__lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """
+        Load the entries from the cache file if any. A corrupted file is ignored.
+        :return: None
+        """
+        if self.file_name is None or not os.path.isfile(self.file_name):
+            return
+        try:
+            with open(self.file_name) as cache_file:
+                servers = json.load(cache_file)["servers"]
+        except (OSError, ValueError, KeyError, TypeError) as exception:
+            # A file without servers has been written without the server url: not trusted
+            log.warning("Metadata cache '{}' not loaded: {}".format(self.file_name,
+                                                                   repr(exception)))
+            return
+        with self.__lock:
+            self.__servers = servers
+            self.__entries.update(servers.get(str(self.url), {}))
+
+    def save(self):
+        """
+        Persist the entries into the cache file if any.
+        :return: None
+        """
+        if self.file_name is None:
+            return
+        with self.__lock:
+            temporary_name = "{}.tmp".format(self.file_name)
+            with open(temporary_name, "w") as cache_file:
+                json.dump({"servers": dict(self.__servers, **{str(self.url): self.__entries})},
+                          cache_file)
+            os.replace(temporary_name, self.file_name)
+
+    def get(self, key: str = None):
+        """
+        Get a valid entry.
+        :param key: the entry key
+        :return: the value or None if the entry is missing or expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry["time"] >= self.ttl:
+                del self.__entries[key]
+                return None
+            return entry["value"]
+
+    def set(self, key: str = None, value=None):
+        """
+        Store an entry. The value must be json serializable.
+        :param key: the entry key
+        :param value: the entry value
+        :return: None
+        """
+        with self.__lock:
+            self.__entries[key] = {"time": time.time(), "value": value}
+            self.save()
+
+    def get_or_load(self, key: str = None, loader=None):
+        """
+        Get a valid entry or compute it with the loader and store it.
+        :param key: the entry key
+        :param loader: a callable without argument returning the value
+        :return: the value
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: str = None):
+        """
+        Remove an entry or all entries.
+        :param key: the entry key, None to clear the cache
+        :return: None
+        """
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+            self.save()
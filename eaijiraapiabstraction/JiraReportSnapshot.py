@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import os.path
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class JiraReportSnapshot:
+    """Snapshot of the executions written in a reports folder.
+
+        For each execution folder the snapshot keeps the execution "updated" timestamp and the
+        data gathered by the report fetch phase: tests statuses, steps and evidences ids.
+        On the next report in the same folder an execution whose "updated" timestamp is
+        unchanged is reused without any request, and an evidence whose id is unchanged is not
+        downloaded again.
+    """
+    FILE_NAME = ".report-snapshot.json"
+
+    def __init__(self, folder: str = None):
+        """
+        :param folder: the reports folder
+        """
+        assert isinstance(folder, str), "folder must be a string"
+        self.file_name = os.path.join(folder, JiraReportSnapshot.FILE_NAME)
+        self.__previous = {}
+        self.__executions = {}
+        # The evidences ids of the previous report by path
+        self.__downloaded = {}
+        self.__lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        Load the snapshot file if any. A corrupted file is ignored.
+        :return: None
+        """
+        if not os.path.isfile(self.file_name):
+            return
+        try:
+            with open(self.file_name) as snapshot_file:
+                executions = json.load(snapshot_file)
+        except (OSError, ValueError) as exception:
+            log.warning("Report snapshot '{}' not loaded: {}".format(self.file_name,
+                                                                    repr(exception)))
+            return
+        with self.__lock:
+            self.__previous = executions
+            self.__executions = dict(executions)
+            self.__downloaded = {evidence["path"]: evidence.get("id")
+                                 for execution in executions.values()
+                                 for evidence in JiraReportSnapshot.__evidences(execution)}
+
+    def save(self):
+        """
+        Persist the snapshot into the reports folder.
+        :return: None
+        """
+        with self.__lock:
+            temporary_name = "{}.tmp".format(self.file_name)
+            with open(temporary_name, "w") as snapshot_file:
+                json.dump(self.__executions, snapshot_file)
+            os.replace(temporary_name, self.file_name)
+
+    @staticmethod
+    def __evidences(execution):
+        return [evidence for test in execution["tests"] for evidence in test["evidences"]]
+
+    def get(self, relative_folder: str = None, updated: str = None):
+        """
+        Get an execution of the previous report if it is still up to date.
+        :param relative_folder: the execution folder relative to the reports folder
+        :param updated: the current "updated" timestamp of the execution
+        :return: the execution dictionary or None if it must be fetched again
+        """
+        with self.__lock:
+            execution = self.__previous.get(relative_folder)
+        if execution is None or updated is None or execution["updated"] != updated:
+            return None
+        if not all(os.path.isfile(evidence["path"])
+                   for evidence in JiraReportSnapshot.__evidences(execution)):
+            # The previous downloads have been interrupted or the files removed
+            return None
+        return execution
+
+    def set(self, execution: dict = None):
+        """
+        Record a fetched execution. The evidences files of the previous report which are no
+        longer listed are removed.
+        :param execution: the execution dictionary with the "relative_folder" key
+        :return: None
+        """
+        with self.__lock:
+            previous = self.__previous.get(execution["relative_folder"])
+            self.__executions[execution["relative_folder"]] = execution
+        if previous is None:
+            return
+        paths = {evidence["path"] for evidence in JiraReportSnapshot.__evidences(execution)}
+        for evidence in JiraReportSnapshot.__evidences(previous):
+            if evidence["path"] not in paths and os.path.isfile(evidence["path"]):
+                log.debug("Remove the former evidence '{}'".format(evidence["path"]))
+                os.remove(evidence["path"])
+
+    def is_replaced(self, evidence: dict = None):
+        """
+        Check if an evidence replaces a file downloaded by the previous report under the same
+        path, e.g. an evidence uploaded again. The present file may have the same size.
+        :param evidence: the evidence dictionary with the "path" and "id" keys
+        :return: True if the previous report downloaded another evidence id at this path
+        """
+        with self.__lock:
+            if evidence["path"] not in self.__downloaded:
+                return False
+            return self.__downloaded[evidence["path"]] != evidence.get("id")
+
+    def is_downloaded(self, evidence: dict = None):
+        """
+        Check if an evidence has been downloaded by the previous report.
+        :param evidence: the evidence dictionary with the "path" and "id" keys
+        :return: True if the file is present with the same evidence id
+        """
+        if evidence.get("id") is None:
+            return False
+        with self.__lock:
+            if self.__downloaded.get(evidence["path"]) != evidence["id"]:
+                return False
+        return os.path.isfile(evidence["path"])
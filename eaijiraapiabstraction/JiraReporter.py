@@ -1,12 +1,15 @@
 import logging
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from shutil import rmtree
 
+import requests
 import xlsxwriter
 
-from eaijiraapiabstraction.JiraAttachments import JiraAttachments
+from eaijiraapiabstraction.JiraDownloader import JiraDownloader
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraReportSnapshot import JiraReportSnapshot
 from eaijiraapiabstraction.JiraTests import JiraTests
 from eaijiraapiabstraction.XRayIssues import XRayIssues
 
@@ -14,30 +17,60 @@ log = logging.getLogger(__name__)
 
 
 class JiraReporter:
+    """Xlsx reports of the XRay test plans and executions.
+
+        A report is built in two phases: the fetch phase gathers the executions, tests, steps and
+        evidences concurrently into dictionaries and downloads the evidences, then the write phase
+        fills the workbook from these dictionaries without any request.
+        The sheets are written row after row so that, in constant memory mode, the workbook
+        memory stays flat whatever the number of tests.
+        The test plans of a release are fetched concurrently and can be written in a single
+        workbook whose summary sheet counts the results of each plan and execution.
+        In incremental mode the reports folder keeps a snapshot of the fetched executions so that
+        only the executions updated since the previous report are fetched again.
+    """
+    # The steps (cucumber or manual), the summary and the linked story of a test
+    TEST_FIELDS = ["key", "customfield_10204", "customfield_10206", "summary", "issuelinks"]
 
     @staticmethod
     def create_release_report(url=None, headers=None, release_name=None, folder=None,
-                              test_plan_key=None, test_execution_key=None):
+                              test_plan_key=None, test_execution_key=None,
+                              session: requests.Session = None, max_workers: int = 1,
+                              constant_memory: bool = False, single_workbook: bool = False,
+                              incremental: bool = False):
         tested_folder = folder
+        snapshot = JiraReportSnapshot(folder=tested_folder) if incremental else None
         if release_name is not None:
-            JiraReporter.__from_release_report(url=url, headers=headers, release_name=release_name,
-                                               folder=tested_folder)
+            JiraReporter.__from_release_report(url=url, headers=headers, session=session,
+                                               release_name=release_name,
+                                               folder=tested_folder, max_workers=max_workers,
+                                               constant_memory=constant_memory,
+                                               single_workbook=single_workbook,
+                                               snapshot=snapshot)
         elif test_plan_key is not None:
             JiraReporter.__from_test_plan_report(url=url,
-                                                 headers=headers,
-                                                 test_plan_key=test_plan_key, folder=tested_folder)
+                                                 headers=headers, session=session,
+                                                 test_plan_key=test_plan_key, folder=tested_folder,
+                                                 max_workers=max_workers,
+                                                 constant_memory=constant_memory,
+                                                 snapshot=snapshot)
         elif test_execution_key is not None:
-            JiraReporter.__from_test_execution_report(url=url, headers=headers,
+            JiraReporter.__from_test_execution_report(url=url, headers=headers, session=session,
                                                       test_execution_key=test_execution_key,
                                                       folder=tested_folder,
-                                                      relative_folder='{}/'.format(test_execution_key))  # noqa
+                                                      relative_folder='{}/'.format(test_execution_key),  # noqa
+                                                      max_workers=max_workers,
+                                                      constant_memory=constant_memory,
+                                                      snapshot=snapshot)
         else:
             logging.error("Can't process report")
             return 1
+        if snapshot is not None:
+            snapshot.save()
 
     @staticmethod
-    def check_folder(folder=None):
-        # check if folder exists or is empty
+    def check_folder(folder=None, incremental=False):
+        # check if folder exists or is empty, an incremental report keeps the previous one
         tested_folder = folder
         if not os.path.isabs(tested_folder):
             logging.debug("'{}' is not an absolute path.".format(tested_folder))
@@ -47,15 +80,17 @@ class JiraReporter:
         if not os.path.exists(tested_folder):
             logging.debug("'{}' doesn't exist. Create it.".format(tested_folder))
             os.makedirs(tested_folder)
-        else:
+        elif not incremental:
             logging.debug("'{}' exists. Clear it.".format(tested_folder))
             rmtree(tested_folder)
             os.makedirs(tested_folder)
         return tested_folder
 
     @staticmethod
-    def __create_xlsx_file(folder=None, name=None):
-        report = xlsxwriter.Workbook(os.path.join(folder, "{}-report.xlsx".format(name)))
+    def __create_xlsx_file(folder=None, name=None, constant_memory=False):
+        # In constant memory mode each row is flushed to disk as soon as a next row is written
+        report = xlsxwriter.Workbook(os.path.join(folder, "{}-report.xlsx".format(name)),
+                                     {"constant_memory": constant_memory})
         main_title_format = report.add_format({'bg_color': '0DA917', 'font_size': 18, 'bold': True})
         header_format = report.add_format({'bg_color': '0DA917', 'bold': True})
         fail_format = report.add_format({'bg_color': 'red'})
@@ -91,211 +126,417 @@ class JiraReporter:
         report["sheets"][sheet_key].write_string('H4', "Evidence", report["format"]["header"])
 
     @staticmethod
-    def __from_release_report(url=None, headers=None, release_name=None, folder=None):
-        test_plans = JiraTests.get_test_plan_in_release(url=url, headers=headers,
-                                                        release_name=release_name)
+    def __from_release_report(url=None, headers=None, release_name=None, folder=None,
+                              session=None, max_workers=1, constant_memory=False,
+                              single_workbook=False, snapshot=None):
+        test_plans = JiraTests.iter_test_plan_in_release(url=url, headers=headers, session=session,
+                                                         release_name=release_name)
+
+        # Fetch phase: the test plans are fetched concurrently
+        def fetch(test_plan_dict):
+            return JiraReporter.__fetch_test_plan(url=url, headers=headers, session=session,
+                                                  test_plan_key=test_plan_dict["key"],
+                                                  folder=folder, max_workers=max_workers,
+                                                  snapshot=snapshot)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map keeps the test plans order
+            test_plans = list(executor.map(fetch, test_plans))
+        # A single pool for the whole release, the evidences shared by the plans are copied
+        JiraReporter.__download_evidences(headers=headers, session=session,
+                                          executions=[execution for test_plan in test_plans
+                                                      for execution in test_plan["executions"]],
+                                          max_workers=max_workers, snapshot=snapshot)
+
+        # Write phase
+        if not single_workbook:
+            for test_plan in test_plans:
+                JiraReporter.__write_test_plan_report(url=url, folder=folder, test_plan=test_plan,
+                                                      constant_memory=constant_memory)
+            return
+
+        report = JiraReporter.__create_xlsx_file(folder=folder, name=release_name,
+                                                 constant_memory=constant_memory)
+        JiraReporter.__write_release_summary_sheet(url=url, report=report,
+                                                   release_name=release_name,
+                                                   test_plans=test_plans)
+        for test_plan in test_plans:
+            for execution in test_plan["executions"]:
+                if execution["key"] in report["sheets"]:
+                    # The execution belongs to several plans, its evidences are the same
+                    continue
+                report["sheets"][execution["key"]] = report["workbook"].add_worksheet(execution["key"])  # noqa
+                JiraReporter.__write_execution_sheet(url=url, report=report,
+                                                     sheet_key=execution["key"],
+                                                     execution=execution)
+        report["workbook"].close()
 
-        for test_plan_dict in test_plans["issues"]:
-            JiraReporter.__from_test_plan_report(url=url,
-                                                 headers=headers,
-                                                 test_plan_key=test_plan_dict["key"], folder=folder)
+    @staticmethod
+    def __from_test_plan_report(url=None, headers=None, test_plan_key=None, folder=None,
+                                session=None, max_workers=1, constant_memory=False,
+                                snapshot=None):
+        # Fetch phase: all the Jira requests and downloads
+        test_plan = JiraReporter.__fetch_test_plan(url=url, headers=headers, session=session,
+                                                   test_plan_key=test_plan_key, folder=folder,
+                                                   max_workers=max_workers, snapshot=snapshot)
+        JiraReporter.__download_evidences(headers=headers, session=session,
+                                          executions=test_plan["executions"],
+                                          max_workers=max_workers, snapshot=snapshot)
+
+        # Write phase: the workbook is filled from the gathered data only
+        JiraReporter.__write_test_plan_report(url=url, folder=folder, test_plan=test_plan,
+                                              constant_memory=constant_memory)
 
     @staticmethod
-    def __from_test_plan_report(url=None, headers=None, test_plan_key=None, folder=None):
-        # Retrieve the summary and description
-        test_plan = JiraIssue.search(url=url, headers=headers,
-                                     search_request={"jql": 'issuekey="{}"'.format(test_plan_key),
-                                                     "fields": ["key", "summary", "description"]})
+    def __from_test_execution_report(url=None, headers=None, test_execution_key=None,
+                                     folder=None, relative_folder=None, session=None,
+                                     max_workers=1, constant_memory=False, snapshot=None):
+        log.debug("Only one test execution")
+        updated = JiraReporter.__get_updated(url=url, headers=headers, session=session,
+                                             issue_keys=[test_execution_key]) \
+            if snapshot is not None else {}
+        execution = JiraReporter.__fetch_execution(url=url, headers=headers, session=session,
+                                                   test_execution_key=test_execution_key,
+                                                   folder=os.path.join(folder,
+                                                                       test_execution_key),
+                                                   relative_folder=relative_folder,
+                                                   max_workers=max_workers,
+                                                   updated=updated.get(test_execution_key),
+                                                   snapshot=snapshot)
+        JiraReporter.__download_evidences(headers=headers, session=session,
+                                          executions=[execution], max_workers=max_workers,
+                                          snapshot=snapshot)
+
+        report = JiraReporter.__create_xlsx_file(folder=folder, name=test_execution_key,
+                                                 constant_memory=constant_memory)
+        report["sheets"][test_execution_key] = report["workbook"].add_worksheet(test_execution_key)  # noqa
+        JiraReporter.__write_execution_sheet(url=url, report=report,
+                                             sheet_key=test_execution_key, execution=execution)
+        report["workbook"].close()
 
-        #  Create a xlsx file per test plan
-        report = JiraReporter.__create_xlsx_file(folder=folder, name=test_plan_key)
+    #########################################
+    # Fetch phase
+    #########################################
+
+    @staticmethod
+    def __get_summary(url=None, headers=None, issue_key=None, session=None):
+        issue = JiraIssue.search(url=url, headers=headers, session=session,
+                                 search_request={"jql": 'issuekey="{}"'.format(issue_key),
+                                                 "fields": ["key", "summary", "description"]})
+        return issue.json()["issues"][0]["fields"]["summary"]
+
+    @staticmethod
+    def __get_updated(url=None, headers=None, issue_keys=None, session=None, max_workers=1):
+        """
+        Read the last update of issues.
+        :return: a dictionary of "updated" timestamps by issue key
+        """
+        issues = JiraIssue.get_issues(url=url, headers=headers, session=session,
+                                      issue_keys=issue_keys, fields=["updated"],
+                                      max_workers=max_workers)
+        return {key: issue["fields"]["updated"] for key, issue in issues.items()}
+
+    @staticmethod
+    def __fetch_test_plan(url=None, headers=None, test_plan_key=None, folder=None,
+                          session=None, max_workers=1, snapshot=None):
+        """
+        Gather the test plan executions. The executions are fetched concurrently.
+        With a snapshot, the executions which have not been updated since the previous report
+         are taken from the snapshot.
+        :return: a dictionary with the "key", "summary" and "executions" keys
+        """
+        summary = JiraReporter.__get_summary(url=url, headers=headers, session=session,
+                                             issue_key=test_plan_key)
+        test_executions = XRayIssues.get_tests_execution_of_test_plan(url=url,
+                                                                      headers=headers,
+                                                                      session=session,
+                                                                      test_plan_key=test_plan_key)
+        log.info("test_plan_key: {}".format(test_plan_key))
+        test_executions = test_executions.json()
+        updated = JiraReporter.__get_updated(url=url, headers=headers, session=session,
+                                             issue_keys=[test_execution["key"]
+                                                         for test_execution in test_executions],
+                                             max_workers=max_workers) \
+            if snapshot is not None else {}
+
+        def fetch(test_execution):
+            return JiraReporter.__fetch_execution(
+                url=url, headers=headers, session=session,
+                test_execution_key=test_execution["key"], summary=test_execution["summary"],
+                folder=os.path.join(folder, test_plan_key, test_execution["key"]),
+                relative_folder='{}/{}/'.format(test_plan_key, test_execution["key"]),
+                max_workers=max_workers, updated=updated.get(test_execution["key"]),
+                snapshot=snapshot)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map keeps the executions order
+            executions = list(executor.map(fetch, test_executions))
+        return {"key": test_plan_key, "summary": summary, "executions": executions}
+
+    @staticmethod
+    def __fetch_execution(url=None, headers=None, test_execution_key=None, summary=None,
+                          folder=None, relative_folder=None, session=None, max_workers=1,
+                          updated=None, snapshot=None):
+        """
+        Gather the tests of an execution with their steps, linked story and evidences.
+        :param summary: the execution summary if already known
+        :param folder: the folder where the evidences are downloaded
+        :param relative_folder: the evidences folder relative to the report
+        :param updated: the execution "updated" timestamp, compared with the snapshot one
+        :param snapshot: the JiraReportSnapshot of the reports folder, None to always fetch
+        :return: a dictionary with the "key", "summary", "relative_folder", "updated" and
+         "tests" keys
+        """
+        if snapshot is not None:
+            execution = snapshot.get(relative_folder=relative_folder, updated=updated)
+            if execution is not None:
+                log.info("{} not updated, taken from the snapshot".format(test_execution_key))
+                return execution
+        if summary is None:
+            summary = JiraReporter.__get_summary(url=url, headers=headers, session=session,
+                                                 issue_key=test_execution_key)
+        tests = list(XRayIssues.iter_tests_in_execution(url=url, headers=headers,
+                                                        session=session,
+                                                        test_execution_key=test_execution_key))
+        log.debug("{} data: \n{}".format(test_execution_key, tests))
+
+        #  Get steps or scenarios and the linked story of all the tests at once
+        issues = JiraIssue.get_issues(url=url, headers=headers, session=session,
+                                      issue_keys=[test["key"] for test in tests],
+                                      fields=JiraReporter.TEST_FIELDS, max_workers=max_workers)
+        tests = [JiraReporter.__test_model(test=test, issue=issues.get(test["key"], {}),
+                                           folder=folder, relative_folder=relative_folder)
+                 for test in tests]
+        execution = {"key": test_execution_key, "summary": summary,
+                     "relative_folder": relative_folder, "updated": updated, "tests": tests}
+        if snapshot is not None:
+            snapshot.set(execution=execution)
+        return execution
+
+    @staticmethod
+    def __test_model(test=None, issue=None, folder=None, relative_folder=None):
+        """
+        Build the report data of a test from its test run and its issue.
+        :param test: the detailed test i.e. test run of the execution
+        :param issue: the test issue with the TEST_FIELDS, empty if it could not be read
+        :return: a dictionary with the "key", "status", "summary", "story_key", "story_name",
+         "steps", "evidences" and "defects" keys
+        """
+        story_key, story_name = JiraReporter.__linked_story(test_key=test["key"], issue=issue)
+
+        fields = issue.get("fields", {})
+        if fields.get("customfield_10204") is not None:
+            steps_list = [fields["customfield_10204"]]
+        elif fields.get("customfield_10206") is not None:
+            steps_list = [item["step"] for item in fields["customfield_10206"]["steps"]]
+        else:
+            # The issue could not be read
+            steps_list = []
+
+        return {"key": test["key"], "status": test["status"],
+                "summary": fields.get("summary", ""),
+                "story_key": story_key, "story_name": story_name, "steps": steps_list,
+                "evidences": [{"file_name": evidence["fileName"], "url": evidence["fileURL"],
+                               "id": evidence.get("id"),
+                               "path": os.path.join(folder, test["key"], evidence["fileName"]),
+                               "link": os.path.join(relative_folder, test["key"],
+                                                    evidence["fileName"])}
+                              for evidence in test["evidences"]],
+                "defects": test["defects"]}
+
+    @staticmethod
+    def __linked_story(test_key=None, issue=None):
+        # try to catch story attached to the test
+        try:
+            # these fields doesn't exist for Release level, only for test plan / exec level
+            short_link = issue["fields"]["issuelinks"][0]  # to ease readability
+            return short_link["inwardIssue"]["key"], short_link["inwardIssue"]["fields"]["summary"]
+        except (KeyError, IndexError):
+            try:
+                # on old version, field use outward instead of inward
+                short_link = issue["fields"]["issuelinks"][0]  # ease readability
+
+                log.debug("step {} data:\n{}".format(test_key,
+                                                     short_link["outwardIssue"]["key"]))
+                return short_link["outwardIssue"]["key"], \
+                    short_link["outwardIssue"]["fields"]["summary"]
+            except (KeyError, IndexError):
+                log.warning("There is no story / improvement attached to"
+                            " test {}".format(test_key))
+        return '', ''
+
+    @staticmethod
+    def __download_evidences(headers=None, executions=None, session=None, max_workers=1,
+                             snapshot=None):
+        """
+        Download the evidences of the executions with a single pool of downloads.
+        The evidences already downloaded by the previous report of the snapshot are skipped and
+        the ones which replace a previous evidence are downloaded whatever the file size.
+        :return: the download results
+        """
+        files = []
+        for execution in executions:
+            for test in execution["tests"]:
+                if test["evidences"]:
+                    #  Create the download folder
+                    os.makedirs(os.path.dirname(test["evidences"][0]["path"]), exist_ok=True)
+                files.extend({"url": evidence["url"], "path": evidence["path"],
+                              "force": snapshot is not None and snapshot.is_replaced(evidence)}
+                             for evidence in test["evidences"]
+                             if snapshot is None or not snapshot.is_downloaded(evidence))
+        results = XRayIssues.download_evidence_files(headers=headers, files=files,
+                                                     session=session, max_workers=max_workers)
+        for result in results:
+            if result["status"] == JiraDownloader.FAILED:
+                log.warning("Evidence '{}' not downloaded: {}".format(result["path"],
+                                                                      result["error"]))
+        return results
+
+    #########################################
+    # Write phase
+    #########################################
+
+    @staticmethod
+    def __write_test_plan_report(url=None, folder=None, test_plan=None, constant_memory=False):
+        report = JiraReporter.__create_xlsx_file(folder=folder, name=test_plan["key"],
+                                                 constant_memory=constant_memory)
+        JiraReporter.__write_summary_sheet(report=report, test_plan=test_plan)
+        for execution in test_plan["executions"]:
+            #  Creating the sheet for the execution
+            report["sheets"][execution["key"]] = report["workbook"].add_worksheet(execution["key"])  # noqa
+            JiraReporter.__write_execution_sheet(url=url, report=report,
+                                                 sheet_key=execution["key"], execution=execution)
+        report["workbook"].close()
 
+    @staticmethod
+    def count_statuses(executions=None):
+        """
+        Count the tests results of executions.
+        :param executions: the executions dictionaries of the fetch phase
+        :return: a dictionary with the "tests", "PASS", "FAIL" and "other" keys
+        """
+        counters = {"tests": 0, "PASS": 0, "FAIL": 0, "other": 0}
+        for execution in executions:
+            for test in execution["tests"]:
+                counters["tests"] += 1
+                counters[test["status"] if test["status"] in ("PASS", "FAIL") else "other"] += 1
+        return counters
+
+    @staticmethod
+    def __write_release_summary_sheet(url=None, report=None, release_name=None,
+                                      test_plans=None):
+        # The sheet is named Summary so that the "To summary" links of the executions sheets work
+        sheet = report["sheets"]["summary"] = report["workbook"].add_worksheet("Summary")
+        sheet.write_string('A1', "This page is a summary of the test plan(s) of the"
+                                 " release {}".format(release_name))
+        sheet.merge_range(1, 1, 1, 8, release_name, report["format"]["main_title"])
+        sheet.set_column(1, 2, 15)
+        sheet.set_column(3, 3, 50)
+        sheet.set_column(4, 7, 10)
+        sheet.conditional_format('H5:H{}'.format(5 + sum(len(test_plan["executions"]) + 1
+                                                         for test_plan in test_plans)),
+                                 {'type': 'cell', 'criteria': '>', 'value': 0,
+                                  'format': report["format"]["fail"]})
+        for column, title in enumerate(["Test plan", "Execution", "Summary", "Tests", "PASS",
+                                        "Other", "FAIL"], start=1):
+            sheet.write_string(3, column, title, report["format"]["header"])
+
+        row = 4
+        for test_plan in test_plans:
+            # One line per plan with the plan counters then one line per execution
+            counters = JiraReporter.count_statuses(executions=test_plan["executions"])
+            sheet.write_url(row, 1, "{}/browse/{}".format(url, test_plan["key"]),
+                            string=test_plan["key"])
+            sheet.write_string(row, 3, test_plan["summary"], report["format"]["header"])
+            JiraReporter.__write_counters(sheet=sheet, row=row, counters=counters)
+            row += 1
+            for execution in test_plan["executions"]:
+                counters = JiraReporter.count_statuses(executions=[execution])
+                sheet.write_url(row, 2, "internal:'{}'!A1".format(execution["key"]),
+                                string=execution["key"])
+                sheet.write_string(row, 3, execution["summary"], report["format"]["wrap"])
+                JiraReporter.__write_counters(sheet=sheet, row=row, counters=counters)
+                row += 1
+
+    @staticmethod
+    def __write_counters(sheet=None, row=None, counters=None):
+        sheet.write_number(row, 4, counters["tests"])
+        sheet.write_number(row, 5, counters["PASS"])
+        sheet.write_number(row, 6, counters["other"])
+        sheet.write_number(row, 7, counters["FAIL"])
+
+    @staticmethod
+    def __write_summary_sheet(report=None, test_plan=None):
         #  Prepare the summary page and fill with Test plan data
         report["sheets"]["summary"] = report["workbook"].add_worksheet("Summary")
         report["sheets"]["summary"].write_string('A1', "This page is a summary of the test"
                                                        " execution(s) for test"
-                                                       " plan {}".format(test_plan_key))
+                                                       " plan {}".format(test_plan["key"]))
         report["sheets"]["summary"].set_column(3, 5, 15)
-        report["sheets"]["summary"].merge_range(1, 1, 1, 5,
-                                                test_plan.json()["issues"][0]["fields"]["summary"],
+        report["sheets"]["summary"].merge_range(1, 1, 1, 5, test_plan["summary"],
                                                 report["format"]["main_title"])
         report["sheets"]["summary"].merge_range(3, 3, 3, 5, "Description",
                                                 report["format"]["header"])
         report["sheets"]["summary"].write_string(3, 1, "Key", report["format"]["header"])
         report["sheets"]["summary"].write_string(3, 3, "Description", report["format"]["header"])
 
-        test_executions = XRayIssues.get_tests_execution_of_test_plan(url=url,
-                                                                      headers=headers,
-                                                                      test_plan_key=test_plan_key)
-        log.info("test_plan_key: {}".format(test_plan_key))
-
-        for index, test_execution in enumerate(test_executions.json()):
+        for index, execution in enumerate(test_plan["executions"]):
             log.debug("Line: {}".format(4 + index))
-            #  Creating the sheet for the execution
-            report["sheets"][test_execution["key"]] = report["workbook"].add_worksheet(test_execution["key"])  # noqa
-
-            #  Updating the summary's sheet
             #  TODO: check the wrap format as it seems not to work
             report["sheets"]["summary"].merge_range(4 + index, 3, 4 + index, 5,
-                                                    test_execution["summary"],
+                                                    execution["summary"],
                                                     report["format"]["wrap"])
             report["sheets"]["summary"].write_url(4 + index, 1,
-                                                  "internal:'{}'!A1".format(test_execution["key"]))
-            report["sheets"]["summary"].write_string(4 + index, 1, test_execution["key"],
+                                                  "internal:'{}'!A1".format(execution["key"]))
+            report["sheets"]["summary"].write_string(4 + index, 1, execution["key"],
                                                      report["format"]["wrap"])
 
-            # data
-            JiraReporter.__from_test_execution_report(url=url,
-                                                      headers=headers,
-                                                      test_execution_key=test_execution["key"],
-                                                      new_report_sheet=report["sheets"][test_execution["key"]],  # noqa
-                                                      folder=os.path.join(folder, test_plan_key,
-                                                                          test_execution["key"]),
-                                                      relative_folder='{}/{}/'.format(test_plan_key,
-                                                                                      test_execution["key"]))  # noqa
-            # set format
-            JiraReporter.__format_test_report_sheet(report=report, sheet_key=test_execution["key"])
-
-        report["workbook"].close()
-
-    @staticmethod
-    def __from_test_execution_report(url=None, headers=None, test_execution_key=None,
-                                     new_report_sheet=None, folder=None, relative_folder=None):
-        if new_report_sheet is None:
-            log.debug("Only one test execution")
-            report = JiraReporter.__create_xlsx_file(folder=folder, name=test_execution_key)
-            report["sheets"][test_execution_key] = report["workbook"].add_worksheet(test_execution_key)  # noqa
-            JiraReporter.__format_test_report_sheet(report=report, sheet_key=test_execution_key)
-            JiraReporter.__add_execution_to_report(url=url,
-                                                   headers=headers,
-                                                   test_execution_key=test_execution_key,
-                                                   new_report_sheet=report["sheets"][test_execution_key],  # noqa
-                                                   folder=os.path.join(folder, test_execution_key),
-                                                   relative_folder=relative_folder)
-            JiraReporter.__format_test_report_sheet(report=report, sheet_key=test_execution_key)
-            report["workbook"].close()
-        else:
-            JiraReporter.__add_execution_to_report(url=url,
-                                                   headers=headers,
-                                                   test_execution_key=test_execution_key,
-                                                   new_report_sheet=new_report_sheet,
-                                                   folder=folder,
-                                                   relative_folder=relative_folder)
-
     @staticmethod
-    def __add_execution_to_report(url=None, headers=None, test_execution_key=None,
-                                  new_report_sheet=None, folder=None,
-                                  relative_folder=None):
+    def __write_execution_sheet(url=None, report=None, sheet_key=None, execution=None):
         # this function add lines in test execution's sheet
-
-        test_execution = JiraIssue.search(url=url, headers=headers,
-                                          search_request={"jql": 'issuekey="{}"'.format(test_execution_key),  # noqa
-                                                          "fields": ["key", "summary", "description"]})  # noqa
-
+        # The rows are written in order so that the sheet can be streamed (constant memory)
+        sheet = report["sheets"][sheet_key]
         # header definition
-        new_report_sheet.merge_range(1, 1, 1, 5,
-                                     test_execution.json()["issues"][0]["fields"]["summary"])
-        new_report_sheet.write_string('A2', 'Test execution:')
-
-        # get test data
-        tests = XRayIssues.get_tests_in_execution(url=url, headers=headers,
-                                                  test_execution_key=test_execution_key)
-        evidences = JiraIssue.sanitize(content=tests.content)
-        evidences = {item["key"]: item for item in evidences}
+        sheet.merge_range(1, 1, 1, 5, execution["summary"])
+        sheet.write_string('A2', 'Test execution:')
+        JiraReporter.__format_test_report_sheet(report=report, sheet_key=sheet_key)
 
         current_row = 4
-        log.debug("{} data: \n{}".format(test_execution_key, tests.json()))
-        log.debug("Evidences {} data: \n{}".format(test_execution_key, evidences))
-
-        for index, test in enumerate(tests.json()):
-            #  Create the download folder
-            os.makedirs(os.path.join(folder, test["key"]))
-            #  Get steps or scenarios
-            steps = JiraIssue.search(url=url,
-                                     headers=headers,
-                                     search_request={"jql": 'issuekey="{}"'.format(test["key"]),
-                                                     "fields": ["key",
-                                                                "customfield_10204",
-                                                                "customfield_10206",
-                                                                "summary", "issuelinks"]})
-            steps = JiraIssue.sanitize(content=steps.content)
-            # log.info("step {} data:\n[{}".format(test["key"], steps))
-
-            story_key = ''
-            story_name = ''
-            # try to catch story attached to the test
-            try:
-                # these fields doesn't exist for Release level, only for test plan / exec level
-                short_link = steps["issues"][0]["fields"]["issuelinks"][0]  # to ease readability
-                story_key = short_link["inwardIssue"]["key"]
-                story_name = short_link["inwardIssue"]["fields"]["summary"]
-            except (KeyError, IndexError):
-                try:
-                    # on old version, field use outward instead of inward
-                    short_link = steps["issues"][0]["fields"]["issuelinks"][0]  # ease readability
-
-                    log.debug("step {} data:\n{}".format(test["key"],
-                                                         short_link["outwardIssue"]["key"]))
-                    story_key = short_link["outwardIssue"]["key"]
-                    story_name = short_link["outwardIssue"]["fields"]["summary"]
-                except (KeyError, IndexError):
-                    log.warning("There is no story / improvement attached to"
-                                " test {}".format(test["key"]))
-
-            if steps["issues"][0]["fields"]["customfield_10204"] is not None:
-                steps_list = [steps["issues"][0]["fields"]["customfield_10204"]]
-            else:
-                steps_list = [item["step"] for item in
-                              steps["issues"][0]["fields"]["customfield_10206"]["steps"]]
-
-            file_list = evidences[test["key"]]["evidences"]
-            defect_list = evidences[test["key"]]["defects"]
-
-            lines_to_write = max((len(steps_list), len(file_list), len(defect_list)))
-            for step_index, step in enumerate(steps_list):
-                new_report_sheet.write_string(current_row + step_index, 6, step)
-            for evidence_index, evidence in enumerate(file_list):
-                file_name = evidence["fileName"]
-                JiraAttachments.download_file(url=evidence["fileURL"],
-                                              headers=headers,
-                                              file_absolute_path=os.path.join(folder,
-                                                                              test["key"],
-                                                                              file_name))
-                new_report_sheet.write_url(current_row + evidence_index, 7,
-                                           os.path.join(relative_folder, test["key"], file_name),
-                                           string=file_name)
-            # set jira's ID url
-            new_report_sheet.write_url(current_row, 3,
-                                       "{}/browse/{}".format(url, test["key"]),
-                                       string=test["key"])  # Test ID
-            if story_key != '':
-                new_report_sheet.write_url(current_row, 1,
-                                           "{}/browse/{}".format(url, story_key),
-                                           string=story_key)  # US ID
-            new_report_sheet.write_string(current_row, 2, story_name)  # US name
-
+        for test in execution["tests"]:
+            lines_to_write = max((len(test["steps"]), len(test["evidences"]),
+                                  len(test["defects"]), 1))
             # merge rows when result is on multi lines
             if lines_to_write > 1:
-                # set values and merge rows
-                new_report_sheet.merge_range(current_row, 4,
-                                             current_row + lines_to_write - 1, 4,
-                                             steps["issues"][0]["fields"]["summary"])
-                new_report_sheet.merge_range(current_row, 5, current_row + lines_to_write - 1, 5,
-                                             test["status"])
-                # value already set, only merge rows
-                new_report_sheet.merge_range(current_row, 1, current_row + lines_to_write - 1, 1,
-                                             story_key)  # US ID field  # todo improve format
-                new_report_sheet.merge_range(current_row, 2, current_row + lines_to_write - 1, 2,
-                                             None)  # US title field
-                new_report_sheet.merge_range(current_row, 3, current_row + lines_to_write - 1, 3,
-                                             test["key"])  # Test ID   # todo improve format
-                new_report_sheet.merge_range(current_row, 6, current_row + lines_to_write - 1, 6,
-                                             None)  # Step field
+                # the merges are set on the first row, before the next rows are written
+                last_row = current_row + lines_to_write - 1
+                sheet.merge_range(current_row, 1, last_row, 1,
+                                  test["story_key"])  # US ID field  # todo improve format
+                sheet.merge_range(current_row, 2, last_row, 2, test["story_name"])  # US title
+                sheet.merge_range(current_row, 3, last_row, 3,
+                                  test["key"])  # Test ID   # todo improve format
+                sheet.merge_range(current_row, 4, last_row, 4, test["summary"])
+                sheet.merge_range(current_row, 5, last_row, 5, test["status"])
+                sheet.merge_range(current_row, 6, last_row, 6, None)  # Step field
             else:
-                new_report_sheet.write_string(current_row, 1, story_key)  # todo improve format
-                new_report_sheet.write_string(current_row, 3, test["key"])  # todo improve format
-                new_report_sheet.write_string(current_row, 4,
-                                              steps["issues"][0]["fields"]["summary"])
-                new_report_sheet.write_string(current_row, 5, test["status"])
+                sheet.write_string(current_row, 1, test["story_key"])  # todo improve format
+                sheet.write_string(current_row, 2, test["story_name"])  # US name
+                sheet.write_string(current_row, 4, test["summary"])
+                sheet.write_string(current_row, 5, test["status"])
+            # set jira's ID url
+            sheet.write_url(current_row, 3, "{}/browse/{}".format(url, test["key"]),
+                            string=test["key"])  # Test ID
+            if test["story_key"] != '':
+                sheet.write_url(current_row, 1, "{}/browse/{}".format(url, test["story_key"]),
+                                string=test["story_key"])  # US ID
+
+            for line in range(lines_to_write):
+                if line < len(test["steps"]):
+                    sheet.write_string(current_row + line, 6, test["steps"][line])
+                if line < len(test["evidences"]):
+                    evidence = test["evidences"][line]
+                    # A relative file link needs the external prefix
+                    sheet.write_url(current_row + line, 7,
+                                    "external:{}".format(evidence["link"]),
+                                    string=evidence["file_name"])
 
             current_row = current_row + lines_to_write
@@ -0,0 +1,195 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Rate limiter allowing rate requests per second with bursts up to capacity requests."""
+
+    def __init__(self, rate: float = None, capacity: int = None):
+        """
+        :param rate: the number of tokens added per second
+        :param capacity: the maximum number of tokens, by default one second of requests
+        """
+        assert rate is not None and rate > 0, "rate must be a positive number"
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self.__tokens = float(self.capacity)
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting for it if the bucket is empty.
+        :return: the waited time in seconds
+        """
+        waited = 0.0
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity,
+                                    self.__tokens + (now - self.__last) * self.rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return waited
+                delay = (1 - self.__tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class JiraSession(requests.Session):
+    """Keep-alive HTTP session shared by all the Jira and XRay helpers.
+
+        The session holds a pool of connections per host so that consecutive requests reuse the
+        same TCP+TLS connection instead of opening a new one for each call.
+        Connection errors are retried by the transport adapter and every request gets a default
+        timeout unless the caller provides its own.
+
+        Every request goes through a single executor which:
+         - waits for a token when a rate limit is set and bounds the requests in flight,
+         - retries the 429 responses and the 5xx responses of idempotent requests, honouring the
+           Retry-After header or else waiting with a jittered exponential backoff,
+         - counts the requests, retries and throttled time (see statistics).
+    """
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_TIMEOUT = 60
+    DEFAULT_BACKOFF_FACTOR = 0.5
+    DEFAULT_MAX_BACKOFF = 60
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = DEFAULT_MAX_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF, max_in_flight: int = None,
+                 rate_limit: float = None):
+        """
+        :param pool_size: the number of connections kept alive per host
+        :param max_retries: the number of retries on connection or read errors and on the
+         throttled or failed responses
+        :param timeout: the default request timeout in seconds, None means no timeout
+        :param backoff_factor: the first retry waits around backoff_factor seconds then the wait
+         doubles at each retry
+        :param max_backoff: the maximum wait in seconds between two attempts
+        :param max_in_flight: the maximum number of requests sent at the same time, by default
+         the pool size
+        :param rate_limit: the maximum number of requests per second, None means no limit
+        """
+        assert isinstance(pool_size, int) and pool_size > 0, "pool_size must be a positive integer"
+        assert isinstance(max_retries, int) and max_retries >= 0, \
+            "max_retries must be a positive integer or 0"
+        assert max_in_flight is None or (isinstance(max_in_flight, int) and max_in_flight > 0), \
+            "max_in_flight must be a positive integer"
+        super().__init__()
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        retry = Retry(total=max_retries, connect=max_retries, read=max_retries, status=0,
+                      backoff_factor=backoff_factor, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.__in_flight = threading.BoundedSemaphore(max_in_flight or pool_size)
+        self.__bucket = TokenBucket(rate=rate_limit) if rate_limit is not None else None
+        self.__statistics_lock = threading.Lock()
+        self.__statistics = {"requests": 0, "retries": 0, "throttled": 0,
+                             "backoff_time": 0.0, "rate_limit_time": 0.0}
+
+    @property
+    def statistics(self):
+        """
+        The executor counters:
+         - requests: the number of requests sent, retries included
+         - retries: the number of retried requests
+         - throttled: the number of 429 responses
+         - backoff_time: the time spent waiting before the retries, in seconds
+         - rate_limit_time: the time spent waiting for the rate limit, in seconds
+        :return: a copy of the counters dictionary
+        """
+        with self.__statistics_lock:
+            return dict(self.__statistics)
+
+    def reset_statistics(self):
+        with self.__statistics_lock:
+            for key in self.__statistics:
+                self.__statistics[key] = 0 if isinstance(self.__statistics[key], int) else 0.0
+
+    def __count(self, **increments):
+        with self.__statistics_lock:
+            for key, value in increments.items():
+                self.__statistics[key] += value
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        # Streamed bodies (files, generators) can't be sent twice
+        replayable = kwargs.get("files") is None and \
+            isinstance(kwargs.get("data"), (type(None), str, bytes, dict, list, tuple))
+        attempt = 0
+        while True:
+            if self.__bucket is not None:
+                self.__count(rate_limit_time=self.__bucket.acquire())
+            with self.__in_flight:
+                response = super().request(method, url, **kwargs)
+            self.__count(requests=1)
+            if response.status_code == 429:
+                self.__count(throttled=1)
+            if not self.__is_retryable(method, response) or not replayable \
+                    or attempt >= self.max_retries:
+                return response
+            delay = self.__retry_delay(response=response, attempt=attempt)
+            log.warning("{} {} returned {}, retry in {:.2f}s".format(method, url,
+                                                                     response.status_code, delay))
+            response.close()
+            self.__count(retries=1, backoff_time=delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def __is_retryable(self, method, response):
+        if response.status_code == 429:
+            # The request has been rejected before being processed
+            return True
+        return response.status_code in JiraSession.RETRY_STATUSES and \
+            method.upper() in JiraSession.IDEMPOTENT_METHODS
+
+    def __retry_delay(self, response=None, attempt=0):
+        """
+        Compute the wait before the next attempt from the Retry-After header or else with a
+        jittered exponential backoff.
+        :return: the delay in seconds
+        """
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0), self.max_backoff)
+        backoff = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    @staticmethod
+    def resolve(session: requests.Session = None):
+        """
+        Return the object to send the requests with.
+        Without session the requests module is used so that the helpers can still be called with
+        only the url and headers parameters.
+        :param session: a requests session or None
+        :return: the session or the requests module
+        """
+        return requests if session is None else session
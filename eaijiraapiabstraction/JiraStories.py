@@ -1,4 +1,7 @@
+import requests
+
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraMetadataCache import JiraMetadataCache
 
 
 class JiraStories:
@@ -9,7 +12,8 @@ class JiraStories:
 
     @staticmethod
     def create_story(url=None, headers=None, project_id=None, title=None, description=None,
-                     epic_key=None, actor=None, action=None, benefit=None):
+                     epic_key=None, actor=None, action=None, benefit=None,
+                     session: requests.Session = None, cache: JiraMetadataCache = None):
         """
         Request the creation of a story
         :param project_id:
@@ -21,27 +25,70 @@ class JiraStories:
         :param epic_key:
         :param title:
         :param description:
+        :param session: the session to send the requests with
+        :param cache: the metadata cache holding the issue types
         :return: request response
         """
-        data = {"fields": {"project": {"id": str(project_id)},
+        data = JiraStories.__story_data(project_id=project_id,
+                                        issue_type_id=JiraIssue.get_issue_identifier(
+                                            url=url, headers=headers,
+                                            issue_type=JiraStories.STORY, project_id=project_id,
+                                            session=session, cache=cache),
+                                        title=title, description=description, epic_key=epic_key,
+                                        actor=actor, action=action, benefit=benefit)
+        return JiraIssue.create_issue(url=url, headers=headers, issue_data=data, session=session)
+
+    @staticmethod
+    def create_stories(url=None, headers=None, project_id=None, stories: list = None,
+                       session: requests.Session = None, cache: JiraMetadataCache = None):
+        """
+        Request the creation of many stories with the bulk endpoint
+        :param url: the jira server url without endpoint
+        :param headers: the request headers
+        :param project_id: the project id not the project key
+        :param stories: a list of dictionaries with the create_story parameters i.e. the "title",
+         "description", "epic_key", "actor", "action" and "benefit" keys
+        :param session: the session to send the requests with
+        :param cache: the metadata cache holding the issue types
+        :return: a list of dictionaries in the stories order with the "key", "id" and "error" keys
+        """
+        assert isinstance(stories, list), "stories must be a list"
+
+        issue_type_id = JiraIssue.get_issue_identifier(url=url, headers=headers,
+                                                       issue_type=JiraStories.STORY,
+                                                       project_id=project_id, session=session,
+                                                       cache=cache)
+        return JiraIssue.create_issues(url=url, headers=headers, session=session,
+                                       issues_data=[JiraStories.__story_data(
+                                           project_id=project_id, issue_type_id=issue_type_id,
+                                           title=story.get("title"),
+                                           description=story.get("description"),
+                                           epic_key=story.get("epic_key"),
+                                           actor=story.get("actor"), action=story.get("action"),
+                                           benefit=story.get("benefit"))
+                                           for story in stories])
+
+    @staticmethod
+    def __story_data(project_id=None, issue_type_id=None, title=None, description=None,
+                     epic_key=None, actor=None, action=None, benefit=None):
+        return {"fields": {"project": {"id": str(project_id)},
                            "summary": title,
-                           "issuetype": {"id": str(
-                               JiraIssue.get_issue_identifier(url=url, headers=headers,
-                                                              issue_type=JiraStories.STORY))},
+                           "issuetype": {"id": str(issue_type_id)},
                            "description": description,
                            "customfield_10002": epic_key,
                            JiraStories.ROLE_JIRA_KEY: actor,
                            JiraStories.ACTION_JIRA_KEY: action,
                            JiraStories.BENEFIT_JIRA_KEY: benefit}}
-        return JiraIssue.create_issue(url=url, headers=headers, issue_data=data)
 
     @staticmethod
     def update_story(url=None, headers=None, issue_key=None, title=None, description=None,
-                     epic_key=None, actor=None, action=None, benefit=None):
+                     epic_key=None, actor=None, action=None, benefit=None,
+                     session: requests.Session = None):
         data = {"fields": {"summary": title,
                            "description": description,
                            "customfield_10002": epic_key,
                            JiraStories.ROLE_JIRA_KEY: actor,
                            JiraStories.ACTION_JIRA_KEY: action,
                            JiraStories.BENEFIT_JIRA_KEY: benefit}}
-        return JiraIssue.update_issue(url=url, headers=headers, issue_key=issue_key, issue_data=data)  # noqa
+        return JiraIssue.update_issue(url=url, headers=headers, issue_key=issue_key, issue_data=data,  # noqa
+                                      session=session)
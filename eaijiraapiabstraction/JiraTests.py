@@ -1,4 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraMetadataCache import JiraMetadataCache
 
 
 class JiraTests:
@@ -7,7 +12,8 @@ class JiraTests:
     @staticmethod
     def add_test(url: str = None, headers: dict = None, project_id: str = None,
                  story_key: str = None, test_description: str = None, test_name: str = None,
-                 test_type: str = None):
+                 test_type: str = None, session: requests.Session = None,
+                 cache: JiraMetadataCache = None):
         """
         Create a Jira "test" entry related to a project and story
         TODO work on the customfield as it may vary with the jira setting
@@ -18,17 +24,86 @@ class JiraTests:
         :param test_description: the test description
         :param test_name: the test name
         :param test_type: the test type (Manual, Cucumber, Generic)
+        :param session: the session to send the requests with
+        :param cache: the metadata cache holding the issue types
         :return: the create link response and the test key
         """
-        data = {"fields": {
+        data = JiraTests.__test_data(project_id=project_id,
+                                     issue_type_id=JiraIssue.get_issue_identifier(
+                                         url=url, headers=headers, issue_type=JiraTests.TEST,
+                                         project_id=project_id, session=session, cache=cache),
+                                     test_description=test_description, test_name=test_name,
+                                     test_type=test_type)
+
+        response = JiraIssue.create_issue(url=url, headers=headers, issue_data=data,
+                                          session=session)
+        key = response.json()["key"]
+
+        response = JiraIssue.create_link(url=url, headers=headers, from_key=key, to_key=story_key,
+                                         link_type="Tests", session=session)
+        return response, key
+
+    @staticmethod
+    def add_tests(url: str = None, headers: dict = None, project_id: str = None,
+                  tests: list = None, session: requests.Session = None,
+                  cache: JiraMetadataCache = None, max_workers: int = 1):
+        """
+        Create many Jira "test" entries with the bulk endpoint then link them to their story.
+        :param url: the jira server url without endpoint
+        :param headers: the request headers
+        :param project_id: the project id not the project key
+        :param tests: a list of dictionaries with the add_test parameters i.e. the "story_key",
+         "test_description", "test_name" and "test_type" keys
+        :param session: the session to send the requests with
+        :param cache: the metadata cache holding the issue types
+        :param max_workers: the number of links created concurrently
+        :return: a list of dictionaries in the tests order with the "key", "link" (the create link
+         response) and "error" keys. "error" is None when both the creation and the link succeed.
+        """
+        assert isinstance(tests, list), "tests must be a list"
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+
+        issue_type_id = JiraIssue.get_issue_identifier(url=url, headers=headers,
+                                                       issue_type=JiraTests.TEST,
+                                                       project_id=project_id, session=session,
+                                                       cache=cache)
+        created = JiraIssue.create_issues(url=url, headers=headers, session=session,
+                                          issues_data=[JiraTests.__test_data(
+                                              project_id=project_id, issue_type_id=issue_type_id,
+                                              test_description=test.get("test_description"),
+                                              test_name=test.get("test_name"),
+                                              test_type=test.get("test_type"))
+                                              for test in tests])
+        results = [{"key": item["key"], "link": None, "error": item["error"]}
+                   for item in created]
+
+        def link(index):
+            return JiraIssue.create_link(url=url, headers=headers, from_key=results[index]["key"],
+                                         to_key=tests[index]["story_key"], link_type="Tests",
+                                         session=session)
+
+        to_link = [index for index, result in enumerate(results)
+                   if result["error"] is None and tests[index].get("story_key")]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for index, response in zip(to_link, executor.map(link, to_link)):
+                results[index]["link"] = response
+                if not response.ok:
+                    results[index]["error"] = {"status": response.status_code,
+                                               "text": response.text}
+        return results
+
+    @staticmethod
+    def __test_data(project_id=None, issue_type_id=None, test_description=None, test_name=None,
+                    test_type=None):
+        return {"fields": {
             "project": {
                 "id": str(project_id)
             },
             "summary": test_name,
             "description": "",
             "issuetype": {
-                "id": str(JiraIssue.get_issue_identifier(url=url, headers=headers,
-                                                         issue_type=JiraTests.TEST))
+                "id": str(issue_type_id)
             },
             "customfield_10202": {"value": "Cucumber"},
             "customfield_10203": {"value": str(test_type)},
@@ -36,16 +111,9 @@ class JiraTests:
         }
         }
 
-        response = JiraIssue.create_issue(url=url, headers=headers, issue_data=data)
-        key = response.json()["key"]
-
-        response = JiraIssue.create_link(url=url, headers=headers, from_key=key, to_key=story_key,
-                                         link_type="Tests")
-        return response, key
-
     @staticmethod
     def update_test(url=None, headers=None, test_key=None, test_description=None, test_name=None,
-                    test_type=None):
+                    test_type=None, session: requests.Session = None):
         data = {"fields": {
             "summary": test_name,
             "description": "",
@@ -54,15 +122,18 @@ class JiraTests:
             "customfield_10204": test_description
         }
         }
-        return JiraIssue.update_issue(url=url, headers=headers, issue_key=test_key, issue_data=data)
+        return JiraIssue.update_issue(url=url, headers=headers, issue_key=test_key, issue_data=data,
+                                      session=session)
 
     @staticmethod
-    def get_test_plan_in_release(url: str = None, headers: dict = None, release_name: str = None):
+    def get_test_plan_in_release(url: str = None, headers: dict = None, release_name: str = None,
+                                 session: requests.Session = None):
         """
 
         :param url: the jira server url without endpoint
         :param headers: the request headers
         :param release_name: the release name
+        :param session: the session to send the requests with
         :return: a dictionary containing the key "issues" which value is a list of test plan key
         in a dictionary i.e.
         can be acceded with return_var["issues"][position]["key"]
@@ -70,4 +141,21 @@ class JiraTests:
         data = {"jql": 'fixVersion="{}" AND issueType = "Test Plan"'.format(release_name),
                 "fields": ["key", ]}
 
-        return JiraIssue.search_issues(url=url, headers=headers, search_request=data)
+        return JiraIssue.search_issues(url=url, headers=headers, search_request=data,
+                                       session=session)
+
+    @staticmethod
+    def iter_test_plan_in_release(url: str = None, headers: dict = None, release_name: str = None,
+                                  session: requests.Session = None):
+        """
+        Iterate over the test plans of a release.
+        :param url: the jira server url without endpoint
+        :param headers: the request headers
+        :param release_name: the release name
+        :param session: the session to send the requests with
+        :return: a generator of test plans as dictionaries with the "key" entry
+        """
+        return JiraIssue.iter_issues(url=url, headers=headers,
+                                     jql='fixVersion="{}" AND issueType = "Test Plan"'.format(
+                                         release_name),
+                                     fields=["key", ], session=session, prefetch=True)
@@ -1,96 +1,400 @@
-import base64
 import logging
 import os
 import os.path
+import shutil
+import tempfile
 import requests
-from json import load
+from concurrent.futures import ThreadPoolExecutor
+from json import dump, dumps, load
 
-from eaijiraapiabstraction.JiraAttachments import JiraAttachments
+from eaijiraapiabstraction.JiraDownloader import JiraDownloader
+from eaijiraapiabstraction.JiraSession import JiraSession
 from eaijiraapiabstraction.JiraTests import JiraTests
+from eaijiraapiabstraction.XRayUploader import MultipartBody, XRayUploader
 
 log = logging.getLogger(__name__)
 
 
 class XRayIssues:
+    DEFAULT_PAGE_SIZE = 100
+    MANIFEST = ".evidences.json"
+    # Keep the imports far below the usual reverse proxies and Jira request size limits
+    MAX_IMPORT_SIZE = 10 * 1024 * 1024
+
+    @staticmethod
+    def get_tests_in_test_plan(url=None, headers=None, test_plan_key=None,
+                               session: requests.Session = None):
+        #  May be paginated, iter_tests_in_test_plan returns all the tests
+        return JiraSession.resolve(session).get(
+            url="{}/rest/raven/1.0/api/testplan/{}/test".format(url, test_plan_key),
+            headers=headers)
+
     @staticmethod
-    def get_tests_in_test_plan(url=None, headers=None, test_plan_key=None):
-        #  May be paginated
-        #  TODO get rid of pagination
-        return requests.get(url="{}/rest/raven/1.0/api/testplan/{}/test".format(url, test_plan_key),
-                            headers=headers)
+    def iter_tests_in_test_plan(url=None, headers=None, test_plan_key=None,
+                                session: requests.Session = None,
+                                page_size: int = DEFAULT_PAGE_SIZE, max_workers: int = 1):
+        """
+        Yield all the tests of a test plan, page after page.
+        :param test_plan_key: the test plan key
+        :param page_size: the number of tests per page
+        :param max_workers: the number of pages requested at the same time
+        :return: a generator of tests dictionaries
+        """
+        return XRayIssues.__iter_pages(
+            url="{}/rest/raven/1.0/api/testplan/{}/test".format(url, test_plan_key),
+            headers=headers, session=session, page_size=page_size, max_workers=max_workers)
 
     @staticmethod
-    def get_tests_execution_of_test_plan(url=None, headers=None, test_plan_key=None):
+    def get_tests_execution_of_test_plan(url=None, headers=None, test_plan_key=None,
+                                         session: requests.Session = None):
         #  The return is not paginated
-        return requests.get(
+        return JiraSession.resolve(session).get(
             url="{}/rest/raven/1.0/api/testplan/{}/testexecution".format(url, test_plan_key),
             # noqa
             headers=headers)
 
     @staticmethod
-    def get_tests_in_execution(url=None, headers=None, test_execution_key=None):
-        #  The return may be paginated
-        #  TODO get rid of pagination
-        return requests.get(url="{}/rest/raven/1.0/api/testexec/{}/test".format(url,
-                                                                                test_execution_key),
-                            headers=headers,
-                            params={"detailed": True})
+    def get_tests_in_execution(url=None, headers=None, test_execution_key=None,
+                               session: requests.Session = None):
+        #  The return may be paginated, iter_tests_in_execution returns all the tests
+        return JiraSession.resolve(session).get(
+            url="{}/rest/raven/1.0/api/testexec/{}/test".format(url, test_execution_key),
+            headers=headers,
+            params={"detailed": True})
+
+    @staticmethod
+    def iter_tests_in_execution(url=None, headers=None, test_execution_key=None,
+                                session: requests.Session = None,
+                                page_size: int = DEFAULT_PAGE_SIZE, max_workers: int = 1):
+        """
+        Yield all the detailed tests i.e. test runs of a test execution, page after page.
+        :param test_execution_key: the test execution key
+        :param page_size: the number of tests per page
+        :param max_workers: the number of pages requested at the same time
+        :return: a generator of tests dictionaries
+        """
+        return XRayIssues.__iter_pages(
+            url="{}/rest/raven/1.0/api/testexec/{}/test".format(url, test_execution_key),
+            headers=headers, session=session, params={"detailed": True}, page_size=page_size,
+            max_workers=max_workers)
+
+    @staticmethod
+    def __iter_pages(url=None, headers=None, session: requests.Session = None,
+                     params: dict = None, page_size: int = DEFAULT_PAGE_SIZE,
+                     max_workers: int = 1):
+        """
+        Yield the items of a XRay list endpoint paginated with the page (from 1) and limit
+         parameters.
+        The total is unknown so the pages are requested by waves of max_workers pages, the
+         iteration stops after the first page which is not full. It also stops when a page starts
+         with the first item of the previous page, i.e. the server ignores the pagination.
+        :raise Exception: a page request failed
+        """
+        assert isinstance(page_size, int) and page_size > 0, \
+            "page_size must be a positive integer"
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+
+        http = JiraSession.resolve(session)
+
+        def fetch(page):
+            response = http.get(url=url, headers=headers,
+                                params=dict(params or {}, page=page, limit=page_size))
+            if response.status_code != 200:
+                raise Exception("Get '{}' page {} return\n response code: '{}'\n response text: "
+                                "'{}'".format(url, page, response.status_code, response.text))
+            return response.json()
+
+        page = 1
+        previous_first = None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # map keeps the pages order
+                for index, items in enumerate(executor.map(fetch,
+                                                           range(page, page + max_workers))):
+                    if items and previous_first is not None and items[0] == previous_first:
+                        log.warning("Get '{}' page {} repeats the previous page, the pagination "
+                                    "is ignored".format(url, page + index))
+                        return
+                    yield from items
+                    if len(items) < page_size:
+                        return
+                    previous_first = items[0]
+                page += max_workers
+
+    @staticmethod
+    def get_test_runs_index(url=None, headers=None, test_execution_key=None,
+                            session: requests.Session = None):
+        """
+        Index the test runs of an execution by test key.
+        :param test_execution_key: the test execution key
+        :return: a dictionary of test run ids by test key, empty if the execution can't be read
+        """
+        try:
+            tests = XRayIssues.iter_tests_in_execution(url=url, headers=headers,
+                                                       test_execution_key=test_execution_key,
+                                                       session=session)
+            # The detailed tests are the test runs: "id" is the run id and "key" the test key
+            return {test["key"]: test["id"] for test in tests}
+        except Exception as exception:
+            log.warning("Tests of {} not read: {}".format(test_execution_key, repr(exception)))
+            return {}
+
+    @staticmethod
+    def list_executions_evidences(url=None, headers=None, executions: list = None,
+                                  session: requests.Session = None, max_workers: int = 1):
+        """
+        List the evidences of test executions, creating the test folders.
+        Each execution is requested once, even when it has several destination folders i.e. it
+         belongs to several test plans.
+        :param executions: a list of (test execution key, destination folder) tuples
+        :param max_workers: the number of executions requested at the same time
+        :return: a list of dictionaries with the "url", "path", "id" and "created" keys
+        """
+        folders = {}
+        for execution_key, folder in executions:
+            folders.setdefault(execution_key, []).append(folder)
+
+        def list_tests(execution_key):
+            return list(XRayIssues.iter_tests_in_execution(url=url, headers=headers,
+                                                           test_execution_key=execution_key,
+                                                           session=session))
+
+        files = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for execution_key, tests in zip(folders, executor.map(list_tests, folders)):
+                for folder in folders[execution_key]:
+                    for test in tests:
+                        destination_folder = os.path.join(folder, test['key'])
+                        os.makedirs(destination_folder, exist_ok=True)
+                        files.extend([{"url": evidence["fileURL"],
+                                       "path": os.path.join(destination_folder,
+                                                            evidence["fileName"]),
+                                       "id": evidence.get("id"),
+                                       "created": evidence.get("created")}
+                                      for evidence in test["evidences"]])
+        return files
+
+    @staticmethod
+    def list_test_plans_evidences(url=None, headers=None, test_plans: list = None,
+                                  session: requests.Session = None, max_workers: int = 1):
+        """
+        List the evidences of test plans, creating the execution and test folders.
+        :param test_plans: a list of (test plan key, destination folder) tuples
+        :param max_workers: the number of plans then executions requested at the same time
+        :return: a list of dictionaries with the "url", "path", "id" and "created" keys
+        """
+        def list_executions(test_plan):
+            test_plan_key, folder = test_plan
+            response = XRayIssues.get_tests_execution_of_test_plan(url=url, headers=headers,
+                                                                   test_plan_key=test_plan_key,
+                                                                   session=session)
+            return [(execution["key"], os.path.join(folder, execution["key"]))
+                    for execution in response.json()]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            executions = [execution for plan_executions in executor.map(list_executions,
+                                                                        test_plans)
+                          for execution in plan_executions]
+        return XRayIssues.list_executions_evidences(url=url, headers=headers,
+                                                    executions=executions, session=session,
+                                                    max_workers=max_workers)
+
+    @staticmethod
+    def download_evidence_files(headers=None, files: list = None,
+                                session: requests.Session = None, max_workers: int = 1,
+                                progress=None):
+        """
+        Download a flat list of evidences. An evidence listed several times is downloaded once
+         and copied to its other paths.
+        :param files: a list of dictionaries with the "url", "path" and optional "force" keys
+        :param max_workers: the maximum number of files downloaded at the same time
+        :param progress: a callable receiving each download result with the number of finished
+         and total downloads
+        :return: the JiraDownloader results in the files order, the copies have the "copied"
+         status
+        """
+        unique = {}
+        for file in files:
+            unique.setdefault(file["url"], file)
+            if file.get("force") and not unique[file["url"]].get("force"):
+                unique[file["url"]] = dict(unique[file["url"]], force=True)
+        downloader = JiraDownloader(headers=headers, session=session, max_workers=max_workers)
+        downloaded = dict(zip(unique, downloader.download_files(list(unique.values()),
+                                                                progress=progress)))
+        results = []
+        for file in files:
+            source = downloaded[file["url"]]
+            if source["path"] == file["path"]:
+                results.append(source)
+                continue
+            result = {"path": file["path"], "status": JiraDownloader.COPIED, "bytes": 0,
+                      "error": source["error"]}
+            if source["status"] == JiraDownloader.FAILED:
+                result["status"] = JiraDownloader.FAILED
+            else:
+                try:
+                    shutil.copyfile(source["path"], file["path"])
+                except OSError as exception:
+                    result["status"] = JiraDownloader.FAILED
+                    result["error"] = repr(exception)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def mirror_evidence_files(headers=None, files: list = None, folder: str = None,
+                              session: requests.Session = None, max_workers: int = 1,
+                              progress=None):
+        """
+        Make the folder a mirror of the evidences list.
+        The manifest file of the folder records the id, creation date and size of the mirrored
+         evidences, so that only the new or changed evidences are downloaded and the evidences
+         which are no more listed are removed.
+        :param files: a list of dictionaries with the "url", "path", "id" and "created" keys, the
+         paths being inside the folder
+        :param folder: the mirror folder
+        :param max_workers: the maximum number of files downloaded at the same time
+        :param progress: a callable receiving each download result with the number of finished
+         and total downloads
+        :return: the results in the files order, the unchanged evidences have the "skipped"
+         status
+        """
+        manifest_path = os.path.join(folder, XRayIssues.MANIFEST)
+        manifest = {}
+        if os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path) as manifest_file:
+                    manifest = load(manifest_file)
+            except ValueError:
+                log.warning("Manifest '{}' ignored, everything is downloaded".format(
+                    manifest_path))
+
+        def is_unchanged(file):
+            entry = manifest.get(os.path.relpath(file["path"], folder))
+            return entry is not None and entry["id"] == file.get("id") \
+                and entry["created"] == file.get("created") and os.path.isfile(file["path"]) \
+                and os.path.getsize(file["path"]) == entry["size"]
+
+        def is_replaced(file):
+            # Re-uploaded under the same name: the file on disk may have the same size
+            entry = manifest.get(os.path.relpath(file["path"], folder))
+            return entry is not None and (entry["id"] != file.get("id")
+                                          or entry["created"] != file.get("created"))
+
+        changed = [dict(file, force=True) if is_replaced(file) else file
+                   for file in files if not is_unchanged(file)]
+        changed_paths = set(file["path"] for file in changed)
+        downloaded = iter(XRayIssues.download_evidence_files(headers=headers, files=changed,
+                                                             session=session,
+                                                             max_workers=max_workers,
+                                                             progress=progress))
+        results = []
+        new_manifest = {}
+        for file in files:
+            relative_path = os.path.relpath(file["path"], folder)
+            if file["path"] in changed_paths:
+                result = next(downloaded)
+                if result["status"] == JiraDownloader.FAILED:
+                    # Not recorded so that it is downloaded on the next run
+                    results.append(result)
+                    continue
+            else:
+                result = {"path": file["path"], "status": JiraDownloader.SKIPPED, "bytes": 0,
+                          "error": None}
+            results.append(result)
+            new_manifest[relative_path] = {"id": file.get("id"), "created": file.get("created"),
+                                           "size": os.path.getsize(file["path"]),
+                                           "url": file["url"]}
+
+        listed = set(os.path.relpath(file["path"], folder) for file in files)
+        removed = [relative_path for relative_path in manifest if relative_path not in listed]
+        for relative_path in removed:
+            XRayIssues.__remove_mirrored_file(folder, relative_path)
+
+        temporary_path = "{}.tmp".format(manifest_path)
+        with open(temporary_path, "w") as manifest_file:
+            dump(new_manifest, manifest_file, indent=1)
+        os.replace(temporary_path, manifest_path)
+        log.info("Mirror '{}': {} evidence(s) fetched, {} unchanged, {} removed".format(
+            folder, len(changed), len(files) - len(changed), len(removed)))
+        return results
+
+    @staticmethod
+    def __remove_mirrored_file(folder, relative_path):
+        path = os.path.join(folder, relative_path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        # Remove the emptied test, execution and plan folders
+        parent = os.path.dirname(path)
+        while os.path.abspath(parent) != os.path.abspath(folder):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
 
     @staticmethod
-    def download_evidence(url=None, headers=None, test_execution_key=None, folder=None):
+    def download_evidence(url=None, headers=None, test_execution_key=None, folder=None,
+                          session: requests.Session = None, max_workers: int = 1,
+                          progress=None, mirror: bool = False):
         # TODO maybe check folder
-        execution = XRayIssues.get_tests_in_execution(url=url, headers=headers,
-                                                      test_execution_key=test_execution_key)
-        for test in execution.json():
-            destination_folder = os.path.join(folder, test['key'])
-            if not os.path.isdir(destination_folder):
-                os.mkdir(destination_folder)
-            for evidence in test["evidences"]:
-                JiraAttachments.download_file(url=evidence["fileURL"], headers=headers,
-                                              file_absolute_path=os.path.join(destination_folder,
-                                                                              evidence["fileName"]))
-            del destination_folder
-        del execution
-
-    @staticmethod
-    def download_test_plan_evidences(url=None, headers=None, test_plan_key=None, folder=None):
-        test_executions = XRayIssues.get_tests_execution_of_test_plan(url=url,
-                                                                      headers=headers,
-                                                                      test_plan_key=test_plan_key)
-        for execution in test_executions.json():
-            destination_folder = os.path.join(folder, execution["key"])
-            if not os.path.isdir(destination_folder):
-                os.mkdir(destination_folder)
-            XRayIssues.download_evidence(url=url,
-                                         headers=headers,
-                                         test_execution_key=execution["key"],
-                                         folder=destination_folder)
-
-    @staticmethod
-    def download_release_evidence(url=None, headers=None, release_name=None, folder=None):
-        test_plans = JiraTests.get_test_plan_in_release(url=url, headers=headers,
-                                                        release_name=release_name)
-        for test_plan in test_plans.json()["issues"]:
-            destination_folder = os.path.join(folder, test_plan['key'])
-            if not os.path.isdir(destination_folder):
-                os.mkdir(destination_folder)
-            XRayIssues.download_test_plan_evidences(url=url,
-                                                    headers=headers,
-                                                    test_plan_key=test_plan["key"],
-                                                    folder=destination_folder)
-            del destination_folder
-        del test_plans
+        files = XRayIssues.list_executions_evidences(url=url, headers=headers,
+                                                     executions=[(test_execution_key, folder)],
+                                                     session=session)
+        if mirror:
+            return XRayIssues.mirror_evidence_files(headers=headers, files=files, folder=folder,
+                                                    session=session, max_workers=max_workers,
+                                                    progress=progress)
+        return XRayIssues.download_evidence_files(headers=headers, files=files, session=session,
+                                                  max_workers=max_workers, progress=progress)
+
+    @staticmethod
+    def download_test_plan_evidences(url=None, headers=None, test_plan_key=None, folder=None,
+                                     session: requests.Session = None, max_workers: int = 1,
+                                     progress=None, mirror: bool = False):
+        files = XRayIssues.list_test_plans_evidences(url=url, headers=headers,
+                                                     test_plans=[(test_plan_key, folder)],
+                                                     session=session, max_workers=max_workers)
+        if mirror:
+            return XRayIssues.mirror_evidence_files(headers=headers, files=files, folder=folder,
+                                                    session=session, max_workers=max_workers,
+                                                    progress=progress)
+        return XRayIssues.download_evidence_files(headers=headers, files=files, session=session,
+                                                  max_workers=max_workers, progress=progress)
+
+    @staticmethod
+    def download_release_evidence(url=None, headers=None, release_name=None, folder=None,
+                                  session: requests.Session = None, max_workers: int = 1,
+                                  progress=None, mirror: bool = False):
+        test_plans = [(test_plan["key"], os.path.join(folder, test_plan["key"]))
+                      for test_plan in JiraTests.iter_test_plan_in_release(
+                          url=url, headers=headers, release_name=release_name,
+                          session=session)]
+        files = XRayIssues.list_test_plans_evidences(url=url, headers=headers,
+                                                     test_plans=test_plans, session=session,
+                                                     max_workers=max_workers)
+        log.info("{} evidence(s) in {} test plan(s) of {}".format(len(files), len(test_plans),
+                                                                  release_name))
+        if mirror:
+            return XRayIssues.mirror_evidence_files(headers=headers, files=files, folder=folder,
+                                                    session=session, max_workers=max_workers,
+                                                    progress=progress)
+        return XRayIssues.download_evidence_files(headers=headers, files=files, session=session,
+                                                  max_workers=max_workers, progress=progress)
 
     @staticmethod
     def test_plan_report(url=None, headers=None, test_plan_key=None, folder=None):
         pass
 
     @staticmethod
-    def create_test_execution(url=None, headers=None, result_file=None):
+    def create_test_execution(url=None, headers=None, result_file=None,
+                              session: requests.Session = None):
         with open(result_file) as my_results:
             result = load(my_results)
 
-            response = requests.post(
+            response = JiraSession.resolve(session).post(
                 url="{}/rest/raven/1.0/import/execution/cucumber".format(url),
                 headers=headers,
                 json=result
@@ -98,27 +402,142 @@ class XRayIssues:
         return response
 
     @staticmethod
-    def load_attachments(url=None, headers=None, execution_key=None, evidence_files=None):
+    def import_cucumber_result(url=None, headers=None, result_file=None, info: dict = None,
+                               session: requests.Session = None):
+        """
+        Import a cucumber json report as a new test execution, streaming the file from the disk.
+        :param result_file: the cucumber json report
+        :param info: the fields of the test execution issue (e.g. summary, test plan) as for the
+         issue creation, None for the XRay defaults
+        :return: a requests response
+        """
+        http = JiraSession.resolve(session)
+        if info is None:
+            with open(result_file, "rb") as result:
+                return http.post(url="{}/rest/raven/1.0/import/execution/cucumber".format(url),
+                                 headers=headers,
+                                 data=result)
+        body = MultipartBody([("info", "info.json", "application/json", dumps(info).encode()),
+                              ("result", os.path.basename(result_file), "application/json",
+                               result_file)])
+        multipart_headers = {key: value for key, value in (headers or {}).items()
+                             if key.lower() != "content-type"}
+        multipart_headers["Content-Type"] = body.content_type
+        try:
+            return http.post(
+                url="{}/rest/raven/1.0/import/execution/cucumber/multipart".format(url),
+                headers=multipart_headers,
+                data=body)
+        finally:
+            body.close()
+
+    @staticmethod
+    def split_cucumber_results(result_files: list = None, folder: str = None,
+                               max_size: int = MAX_IMPORT_SIZE):
+        """
+        Merge the features of many cucumber json reports, e.g. from parallel runs, into as few
+         reports as possible, each one smaller than max_size bytes.
+        A feature bigger than max_size is written alone in its report.
+        :param result_files: the cucumber json reports
+        :param folder: the folder where the reports are written
+        :param max_size: the maximum size of a report in bytes
+        :return: the list of the written reports
+        """
+        file_names = []
+
+        def write(batch):
+            file_name = os.path.join(folder, "cucumber-{}.json".format(len(file_names) + 1))
+            with open(file_name, "w") as result:
+                result.write("[{}]".format(",".join(batch)))
+            file_names.append(file_name)
+
+        batch, batch_size = [], 2  # The list brackets
+        for result_file in result_files:
+            with open(result_file) as result:
+                features = load(result)
+            for feature in features:
+                feature = dumps(feature)
+                if batch and batch_size + len(feature) + 1 > max_size:
+                    write(batch)
+                    batch, batch_size = [], 2
+                if len(feature) + 2 > max_size:
+                    log.warning("A feature of '{}' is bigger than {} bytes".format(result_file,
+                                                                                  max_size))
+                batch.append(feature)
+                batch_size += len(feature) + 1
+            del features
+        if batch:
+            write(batch)
+        return file_names
+
+    @staticmethod
+    def import_cucumber_results(url=None, headers=None, result_files: list = None,
+                                info: dict = None, session: requests.Session = None,
+                                max_size: int = MAX_IMPORT_SIZE, max_workers: int = 1):
+        """
+        Import many cucumber json reports. The reports are merged or split so that each import
+         stays under max_size bytes and the imports run concurrently. Each import creates its own
+         test execution with the info fields.
+        :param result_files: the cucumber json reports
+        :param info: the fields of the test execution issues, None for the XRay defaults
+        :param max_size: the maximum size of an imported report in bytes
+        :param max_workers: the maximum number of imports sent at the same time
+        :return: the requests responses, one per import
+        """
+        assert isinstance(result_files, list), "result_files must be a list"
+
+        with tempfile.TemporaryDirectory() as folder:
+            reports = XRayIssues.split_cucumber_results(result_files=result_files, folder=folder,
+                                                        max_size=max_size)
+            log.info("{} report(s) imported as {} test execution(s)".format(len(result_files),
+                                                                            len(reports)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(
+                    lambda report: XRayIssues.import_cucumber_result(url=url, headers=headers,
+                                                                     result_file=report,
+                                                                     info=info,
+                                                                     session=session),
+                    reports))
+
+    @staticmethod
+    def load_attachments(url=None, headers=None, execution_key=None, evidence_files=None,
+                         session: requests.Session = None, max_workers: int = 1,
+                         journal_file: str = None, executed_only: bool = False):
+        """
+        Attach the evidences to the test runs of an execution.
+        :param evidence_files: a json file holding the lists of file names by test key
+        :param max_workers: the maximum number of test runs processed at the same time
+        :param journal_file: the file recording the uploaded evidences so that a new call only
+         uploads the missing ones, None for no journal
+        :param executed_only: only attach the evidences of the tests listed in the execution,
+         the other tests are ignored instead of being looked up one by one
+        :return: a list of dictionaries with the "test", "file", "status" and "error" keys
+        """
         with open(evidence_files) as evidences:
             evidences_list = load(evidences)
 
-        for key in evidences_list:
-            response = requests.get("{}/rest/raven/1.0/api/testrun".format(url),
-                                    headers=headers,
-                                    params={"testExecIssueKey": execution_key, "testIssueKey": key})
+        test_runs = XRayIssues.get_test_runs_index(url=url, headers=headers,
+                                                   test_execution_key=execution_key,
+                                                   session=session)
+        if executed_only:
+            evidences_list = {key: files for key, files in evidences_list.items()
+                              if key in test_runs}
+        http = JiraSession.resolve(session)
+
+        def test_run_id(key):
+            if key in test_runs:
+                return test_runs[key]
+            # Not in the execution listing, ask XRay for this test only
+            response = http.get("{}/rest/raven/1.0/api/testrun".format(url),
+                                headers=headers,
+                                params={"testExecIssueKey": execution_key, "testIssueKey": key})
             if response.status_code == 200:
-                test_run_id = response.json()["id"]
-
-            for file_name in evidences_list[key]:
-                with open(file_name, 'rb') as file:
-                    b64_file = base64.b64encode(file.read())
-                    payload = {"data": b64_file.decode("utf-8"),
-                               "filename": file_name.split("/")[-1],
-                               "contentType": "application/msword"
-                               }
-                    response = requests.post(
-                        url="{}/rest/raven/1.0/api/testrun/{}/attachment".format(url, test_run_id),
-                        # noqa
-                        headers=headers,
-                        json=payload)
-                    log.debug(response)
+                return response.json()["id"]
+            log.error("Test run of {} in {} not found: {}".format(key, execution_key,
+                                                                  response.status_code))
+            return None
+
+        uploader = XRayUploader(url=url, headers=headers, session=session,
+                                max_workers=max_workers, journal_file=journal_file)
+        return uploader.upload_evidences(execution_key=execution_key, evidences=evidences_list,
+                                         test_run_id=test_run_id)
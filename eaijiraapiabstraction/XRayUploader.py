@@ -0,0 +1,276 @@
+import base64
+import json
+import logging
+import mimetypes
+import os
+import os.path
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from eaijiraapiabstraction.JiraSession import JiraSession
+
+log = logging.getLogger(__name__)
+
+
+class Base64JsonBody:
+    """File-like request body of a XRay attachment read by chunks.
+
+        The XRay test run attachment endpoint only accepts a json payload with the file content
+        encoded in base64. The payload is produced while it is sent so that neither the file nor
+        its encoded form is held in memory. Its length is known beforehand so the request is sent
+        with a Content-Length header.
+    """
+    CHUNK_SIZE = 3 * 256 * 1024  # A multiple of 3 so that the encoded chunks can be concatenated
+
+    def __init__(self, file_name: str = None, content_type: str = None,
+                 chunk_size: int = CHUNK_SIZE):
+        assert chunk_size % 3 == 0, "chunk_size must be a multiple of 3"
+        self.chunk_size = chunk_size
+        self.__file = open(file_name, "rb")
+        prefix = '{{"filename": {}, "contentType": {}, "data": "'.format(
+            json.dumps(os.path.basename(file_name)), json.dumps(content_type)).encode()
+        self.__suffix = b'"}'
+        self.__length = len(prefix) + 4 * ((os.path.getsize(file_name) + 2) // 3) + \
+            len(self.__suffix)
+        self.__buffer = prefix
+        self.__offset = 0
+        self.__done = False
+
+    def __len__(self):
+        return self.__length
+
+    def __fill(self):
+        chunk = self.__file.read(self.chunk_size)
+        if chunk:
+            self.__buffer = base64.b64encode(chunk)
+        else:
+            self.__buffer = self.__suffix
+            self.__done = True
+            self.__file.close()
+        self.__offset = 0
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            parts = [self.__buffer[self.__offset:]]
+            while not self.__done:
+                self.__fill()
+                parts.append(self.__buffer)
+            self.__buffer, self.__offset = b"", 0
+            return b"".join(parts)
+        if self.__offset >= len(self.__buffer):
+            if self.__done:
+                return b""
+            self.__fill()
+        # A short read is valid, the next call continues with the next encoded chunk
+        data = self.__buffer[self.__offset:self.__offset + size]
+        self.__offset += len(data)
+        return data
+
+    def close(self):
+        self.__file.close()
+
+
+class MultipartBody:
+    """File-like multipart/form-data request body streaming its file parts from the disk.
+
+        The parts are given as (name, file name, content type, content) where the content is
+        either bytes or the path of the file to send. The body length is known beforehand so the
+        request is sent with a Content-Length header.
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, parts: list = None, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        self.__segments = []
+        for name, file_name, content_type, content in parts:
+            self.__segments.append(
+                '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+                'Content-Type: {}\r\n\r\n'.format(self.boundary, name, file_name,
+                                                 content_type).encode())
+            self.__segments.append(content)
+            self.__segments.append(b"\r\n")
+        self.__segments.append("--{}--\r\n".format(self.boundary).encode())
+        self.__length = sum(len(segment) if isinstance(segment, bytes)
+                            else os.path.getsize(segment) for segment in self.__segments)
+        self.__index = 0
+        self.__file = None
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def __len__(self):
+        return self.__length
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            size = self.__length
+        data = b""
+        while len(data) < size and self.__index < len(self.__segments):
+            segment = self.__segments[self.__index]
+            if isinstance(segment, bytes):
+                data += segment
+                self.__index += 1
+                continue
+            if self.__file is None:
+                self.__file = open(segment, "rb")
+            chunk = self.__file.read(min(self.chunk_size, size - len(data)))
+            if chunk:
+                data += chunk
+            else:
+                self.__file.close()
+                self.__file = None
+                self.__index += 1
+        return data
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+class XRayUploader:
+    """Upload manager of the evidences attached to the XRay test runs.
+
+        The test runs are processed concurrently, the files of a test run one after the other.
+        With a journal file, each uploaded (execution, test, file) is recorded so that an
+        interrupted upload can be run again without uploading the same file twice.
+    """
+    UPLOADED = "uploaded"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    def __init__(self, url: str = None, headers: dict = None, session: requests.Session = None,
+                 max_workers: int = 1, journal_file: str = None):
+        """
+        :param url: the jira server url without endpoint
+        :param headers: the request headers
+        :param session: the session to send the requests with, None for one-shot connections
+        :param max_workers: the maximum number of test runs processed at the same time
+        :param journal_file: the json lines file recording the uploaded files, None for no
+         journal
+        """
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "max_workers must be a positive integer"
+        self.url = url
+        self.headers = headers
+        self.session = session
+        self.max_workers = max_workers
+        self.journal_file = journal_file
+        self.__lock = threading.Lock()
+        self.__journal = set()
+        self.__load_journal()
+
+    @staticmethod
+    def __journal_key(execution_key, test_key, file_name):
+        return execution_key, test_key, os.path.abspath(file_name)
+
+    def __load_journal(self):
+        if self.journal_file is None or not os.path.isfile(self.journal_file):
+            return
+        with open(self.journal_file) as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line of an interrupted run may be incomplete
+                    continue
+                self.__journal.add(XRayUploader.__journal_key(entry["execution"], entry["test"],
+                                                              entry["file"]))
+
+    def __record(self, execution_key, test_key, file_name):
+        with self.__lock:
+            self.__journal.add(XRayUploader.__journal_key(execution_key, test_key, file_name))
+            if self.journal_file is None:
+                return
+            with open(self.journal_file, "a") as journal:
+                journal.write(json.dumps({"execution": execution_key, "test": test_key,
+                                          "file": os.path.abspath(file_name)}) + "\n")
+
+    def is_uploaded(self, execution_key: str = None, test_key: str = None,
+                    file_name: str = None):
+        with self.__lock:
+            return XRayUploader.__journal_key(execution_key, test_key,
+                                              file_name) in self.__journal
+
+    def upload_file(self, test_run_id=None, file_name: str = None):
+        """
+        Attach a file to a test run.
+        :param test_run_id: the XRay test run id
+        :param file_name: the file path
+        :return: a requests response
+        """
+        content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        body = Base64JsonBody(file_name=file_name, content_type=content_type)
+        try:
+            return JiraSession.resolve(self.session).post(
+                url="{}/rest/raven/1.0/api/testrun/{}/attachment".format(self.url, test_run_id),
+                headers=self.headers,
+                data=body)
+        finally:
+            body.close()
+
+    def upload_test_evidences(self, execution_key: str = None, test_key: str = None,
+                              test_run_id=None, file_names: list = None):
+        """
+        Attach the files of a test which are not recorded in the journal yet.
+        :return: a list of dictionaries with the "test", "file", "status" and "error" keys
+        """
+        results = []
+        for file_name in file_names:
+            result = {"test": test_key, "file": file_name, "status": XRayUploader.SKIPPED,
+                      "error": None}
+            results.append(result)
+            if self.is_uploaded(execution_key=execution_key, test_key=test_key,
+                                file_name=file_name):
+                continue
+            if test_run_id is None:
+                result["status"] = XRayUploader.FAILED
+                result["error"] = "No test run of {} in {}".format(test_key, execution_key)
+                continue
+            try:
+                response = self.upload_file(test_run_id=test_run_id, file_name=file_name)
+            except OSError as exception:
+                result["status"] = XRayUploader.FAILED
+                result["error"] = repr(exception)
+                continue
+            if response.status_code not in (200, 201):
+                result["status"] = XRayUploader.FAILED
+                result["error"] = {"status": response.status_code, "text": response.text}
+                continue
+            result["status"] = XRayUploader.UPLOADED
+            self.__record(execution_key, test_key, file_name)
+        for result in results:
+            if result["status"] == XRayUploader.FAILED:
+                log.error("Evidence '{}' of {} not uploaded: {}".format(result["file"], test_key,
+                                                                        result["error"]))
+        return results
+
+    def upload_evidences(self, execution_key: str = None, evidences: dict = None,
+                         test_run_id=None):
+        """
+        Attach the evidences of many tests concurrently.
+        :param execution_key: the test execution key
+        :param evidences: a dictionary of file names lists by test key
+        :param test_run_id: a callable returning the test run id of a test key or None
+        :return: the upload_test_evidences results of all the tests
+        """
+        assert isinstance(evidences, dict), "evidences must be a dictionary"
+
+        def upload(test_key):
+            # The test run is only looked up when a file remains to upload
+            pending = [file_name for file_name in evidences[test_key]
+                       if not self.is_uploaded(execution_key=execution_key, test_key=test_key,
+                                               file_name=file_name)]
+            return self.upload_test_evidences(execution_key=execution_key, test_key=test_key,
+                                              test_run_id=test_run_id(test_key) if pending
+                                              else None,
+                                              file_names=evidences[test_key])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return [result for results in executor.map(upload, evidences)
+                    for result in results]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+from eaijiraapiabstraction.AsyncJiraConnection import AsyncJiraConnection
+
+
+class TestAsyncJiraConnection:
+    @pytest.fixture
+    def async_connection(self):
+        async_connection = AsyncJiraConnection(username="toto", password="titi",
+                                               url="http://my.domain.com", concurrency=2)
+        yield async_connection
+        async_connection.close()
+
+    def test_async_connection_invalid_concurrency(self):
+        with pytest.raises(AssertionError):
+            AsyncJiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                                concurrency=0)
+            pytest.fail("concurrency must be a positive integer")
+
+    def test_get_issue_non_string_key(self, async_connection):
+        with pytest.raises(AssertionError):
+            asyncio.run(async_connection.get_issue(issue_key=127))
+            pytest.fail("Key must be a string")
+
+    def test_concurrency_is_bounded(self, async_connection):
+        lock = threading.Lock()
+        in_flight = {"current": 0, "max": 0}
+
+        def get_issue(issue_key=None, **kwargs):
+            with lock:
+                in_flight["current"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["current"])
+            time.sleep(0.05)
+            with lock:
+                in_flight["current"] -= 1
+            return issue_key
+
+        async def get_all():
+            return await asyncio.gather(*[async_connection.get_issue(issue_key="TST-{}".format(i))
+                                          for i in range(6)])
+
+        with patch('eaijiraapiabstraction.JiraIssues.JiraIssue.get_issue', side_effect=get_issue):
+            result = asyncio.run(get_all())
+        assert result == ["TST-{}".format(i) for i in range(6)]
+        assert in_flight["max"] == 2
+
+    def test_several_event_loops(self, async_connection):
+        def get_issue(issue_key=None, **kwargs):
+            time.sleep(0.01)
+            return issue_key
+
+        async def get_all():
+            return await asyncio.gather(*[async_connection.get_issue(issue_key="TST-{}".format(i))
+                                          for i in range(6)])
+
+        with patch('eaijiraapiabstraction.JiraIssues.JiraIssue.get_issue', side_effect=get_issue):
+            # The calls wait for the semaphore in both loops
+            for _ in range(2):
+                assert asyncio.run(get_all()) == ["TST-{}".format(i) for i in range(6)]
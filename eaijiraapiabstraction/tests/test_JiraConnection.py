@@ -1,6 +1,15 @@
+import io
+import re
+import zipfile
+import json
+import requests
 import pytest
 from unittest.mock import MagicMock, patch
 from eaijiraapiabstraction.JiraConnection import JiraConnection
+from eaijiraapiabstraction.JiraIssueCache import JiraIssueCache
+from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraSession import JiraSession
+from eaijiraapiabstraction.XRayIssues import XRayIssues
 
 
 class TestJiraConnection:
@@ -33,12 +42,66 @@ class TestJiraConnection:
             JiraConnection(username="toto", password="titi")
             pytest.fail('Expecting jira endpoint is a mandatory field')
 
+    def test_jiraconnection_session(self, jira_connection):
+        assert isinstance(jira_connection.session, JiraSession)
+        assert jira_connection.session.timeout == JiraSession.DEFAULT_TIMEOUT
+
+    def test_jiraconnection_session_parameters(self):
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              pool_size=4, timeout=5)
+        assert test.session.pool_size == 4
+        assert test.session.timeout == 5
+        assert test.session.get_adapter("http://my.domain.com")._pool_maxsize == 4
+
+    @patch('requests.Session.request')
+    def test_session_default_timeout(self, mock_request, jira_connection):
+        jira_connection.session.get("http://my.domain.com/rest/api/2/project")
+        assert mock_request.call_args.kwargs["timeout"] == JiraSession.DEFAULT_TIMEOUT
+        jira_connection.session.get("http://my.domain.com/rest/api/2/project", timeout=2)
+        assert mock_request.call_args.kwargs["timeout"] == 2
+
+    @staticmethod
+    def response(status_code, headers=None):
+        response = MagicMock(status_code=status_code)
+        response.headers = headers or {}
+        return response
+
+    @patch('eaijiraapiabstraction.JiraSession.time.sleep')
+    @patch('requests.Session.request')
+    def test_session_retry_after(self, mock_request, mock_sleep, jira_connection):
+        mock_request.side_effect = [self.response(429, {"Retry-After": "2"}),
+                                    self.response(503), self.response(200)]
+        response = jira_connection.session.get("http://my.domain.com/rest/api/2/issue/A-1")
+        assert response.status_code == 200
+        assert mock_request.call_count == 3
+        assert mock_sleep.call_args_list[0].args[0] == 2
+        statistics = jira_connection.request_statistics()
+        assert statistics["requests"] == 3
+        assert statistics["retries"] == 2
+        assert statistics["throttled"] == 1
+        assert statistics["backoff_time"] >= 2
+
+    @patch('eaijiraapiabstraction.JiraSession.time.sleep')
+    @patch('requests.Session.request')
+    def test_session_retry_limits(self, mock_request, mock_sleep, jira_connection):
+        # A failed creation is not replayed
+        mock_request.return_value = self.response(503)
+        assert jira_connection.session.post("http://my.domain.com/rest/api/2/issue",
+                                            json={}).status_code == 503
+        assert mock_request.call_count == 1
+        # Throttling is retried at most max_retries times
+        mock_request.return_value = self.response(429)
+        assert jira_connection.session.post("http://my.domain.com/rest/api/2/issue",
+                                            json={}).status_code == 429
+        assert mock_request.call_count == 2 + JiraSession.DEFAULT_MAX_RETRIES
+        assert mock_sleep.call_count == JiraSession.DEFAULT_MAX_RETRIES
+
     def test_header(self, jira_connection):
         assert isinstance(jira_connection.header(), dict)
         assert all([element in ["Authorization", "content-type"]
                     for element in jira_connection.header().keys()])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch('jiraapiabstraction.JiraIssues.JiraIssue.sanitize')
     def test_get_project_valid(self, mock_sanitize, mock_get, jira_connection):
         instance = mock_get.return_value
@@ -47,7 +110,7 @@ class TestJiraConnection:
         assert all([element in ["status_code", "content"]
                     for element in jira_connection.get_project()])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_get_project_error(self, mock_get, jira_connection):
         instance = mock_get.return_value
         instance.status_code = 201
@@ -122,6 +185,117 @@ class TestJiraConnection:
             test.get_issue(issue_key=127)
             pytest.fail("Key must be a string")
 
+    @staticmethod
+    def issue_response(status_code=200, content=None, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = "http://my.domain.com/rest/api/2/issue/TST-1"
+        response.headers.update(headers or {})
+        response._content = json.dumps(content).encode() if content is not None else b""
+        return response
+
+    @patch('requests.Session.get')
+    def test_get_issue_cached_in_run(self, mock_get, jira_connection):
+        mock_get.return_value = self.issue_response(content={"key": "TST-1", "fields": {
+            "status": {"name": "Done"}, "attachment": [{"id": "7"}]}})
+        for _ in range(2):
+            assert jira_connection.get_issue(issue_key="TST-1").json()["key"] == "TST-1"
+            assert jira_connection.get_issue_status(issue_key="TST-1") == "Done"
+        assert mock_get.call_count == 2
+        with patch('requests.Session.put'):
+            jira_connection.update_issue_description(issue_key="TST-1", description="new")
+        jira_connection.get_issue(issue_key="TST-1")
+        assert mock_get.call_count == 3
+
+    @patch('requests.Session.get')
+    def test_get_issue_cache_revalidation(self, mock_get, tmp_path):
+        issue = {"key": "TST-1", "fields": {"updated": "2020-01-01T10:00:00.000+0000"}}
+        mock_get.return_value = self.issue_response(content=issue, headers={
+            "Set-Cookie": "JSESSIONID=secret", "Content-Type": "application/json"})
+        JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                       issue_cache_folder=str(tmp_path)).get_issue(issue_key="TST-1")
+        # The session cookies are not written on the disk
+        assert not any("JSESSIONID" in path.read_text() for path in tmp_path.iterdir())
+        # Unchanged issue: only the updated field is requested
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              issue_cache_folder=str(tmp_path))
+        response = test.get_issue(issue_key="TST-1")
+        assert response.json() == issue
+        assert dict(response.headers) == {"Content-Type": "application/json"}
+        assert mock_get.call_count == 2
+        assert mock_get.call_args.kwargs["params"] == {"fields": "updated"}
+        # Changed issue: downloaded again
+        test.invalidate_issues()
+        mock_get.return_value = self.issue_response(content=issue, headers={"ETag": "v1"})
+        test.get_issue(issue_key="TST-1")
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              issue_cache_folder=str(tmp_path))
+        mock_get.return_value = self.issue_response(status_code=304)
+        assert test.get_issue(issue_key="TST-1").json() == issue
+        assert mock_get.call_args.kwargs["headers"]["If-None-Match"] == "v1"
+
+    @patch('requests.Session.get')
+    def test_get_issue_cache_two_servers(self, mock_get, tmp_path):
+        def connection(url):
+            return JiraConnection(username="toto", password="titi", url=url,
+                                  issue_cache_folder=str(tmp_path))
+
+        for url in ["http://my.domain.com", "http://other.domain.com"]:
+            mock_get.return_value = self.issue_response(content={"key": "TST-1", "fields": {
+                "summary": url}}, headers={"ETag": "v1"})
+            connection(url).get_issue(issue_key="TST-1")
+        assert len(list(tmp_path.iterdir())) == 2
+        # Each server reads back its own entry and only invalidates its own entries
+        mock_get.return_value = self.issue_response(status_code=304)
+        test = connection("http://my.domain.com")
+        assert test.get_issue(issue_key="TST-1").json()["fields"]["summary"] == \
+            "http://my.domain.com"
+        test.invalidate_issues(issue_key="TST-1")
+        assert connection("http://other.domain.com").get_issue(
+            issue_key="TST-1").json()["fields"]["summary"] == "http://other.domain.com"
+        assert len(list(tmp_path.iterdir())) == 1
+
+    @patch('requests.Session.get')
+    def test_get_issue_fields(self, mock_get, jira_connection):
+        mock_get.return_value = self.issue_response(content={"key": "TST-1", "fields": {
+            "status": {"name": "Done"}}})
+        assert jira_connection.get_issue_status(issue_key="TST-1") == "Done"
+        assert mock_get.call_args.kwargs["params"] == {"fields": "status,updated"}
+        jira_connection.get_issue(issue_key="TST-1", fields=["summary"], expand=["changelog"])
+        assert mock_get.call_args.kwargs["params"] == {"fields": "summary,updated",
+                                                       "expand": "changelog"}
+        assert mock_get.call_count == 2
+
+    @patch('requests.Session.post')
+    def test_get_issues_status(self, mock_post, jira_connection):
+        def search(url=None, headers=None, data=None):
+            keys = json.loads(data)["jql"][len("issuekey in ("):-1].split(",")
+            response = MagicMock()
+            response.json.return_value = {"maxResults": 1000, "issues": [
+                {"key": key, "fields": {"status": {"name": "Done"}}}
+                for key in keys if key != "TST-5"]}
+            return response
+
+        mock_post.side_effect = search
+        keys = ["TST-{}".format(index) for index in range(250)] + ["TST-1"]
+        statuses = jira_connection.get_issues_status(issue_keys=keys, max_workers=3)
+        assert mock_post.call_count == 3
+        assert len(statuses) == 249
+        assert "TST-5" not in statuses
+        assert json.loads(mock_post.call_args.kwargs["data"])["validateQuery"] is False
+
+    @patch('requests.Session.post')
+    def test_get_issues_jql_length(self, mock_post, jira_connection):
+        mock_post.return_value.json.return_value = {"maxResults": 1000, "issues": []}
+        keys = ["AVERYLONGPROJECTKEYNAME-{}".format(10000 + index) for index in range(300)]
+        jira_connection.get_issues(issue_keys=keys, fields=["summary"])
+        jqls = [json.loads(call.kwargs["data"])["jql"] for call in mock_post.call_args_list]
+        assert all(len(jql) <= JiraIssue.JQL_MAX_LENGTH for jql in jqls)
+        assert sorted(key for jql in jqls for key in jql[len("issuekey in ("):-1].split(",")) \
+            == keys
+        # 66 keys of 29 characters with their separator fit in 2000 characters
+        assert mock_post.call_count == 5
+
     #######################################################
     # Test get_issue_identifier
     #######################################################
@@ -137,6 +311,49 @@ class TestJiraConnection:
             test.get_issue_identifier(issue_type=["127", ])
             pytest.fail("Key must be a string")
 
+    @patch('requests.Session.get')
+    def test_get_issue_identifier_cached(self, mock_get, jira_connection):
+        mock_get.return_value.json.return_value = {"projects": [{"issuetypes": [
+            {"id": 1, "name": "Test"}, {"id": 2, "name": "Story"}]}]}
+        assert jira_connection.get_issue_identifier(issue_type="test") == "1"
+        assert jira_connection.get_issue_identifier(issue_type="Story") == "2"
+        assert mock_get.call_count == 1
+        jira_connection.invalidate_metadata()
+        assert jira_connection.get_issue_identifier(issue_type="Story") == "2"
+        assert mock_get.call_count == 2
+
+    @patch('requests.Session.get')
+    def test_metadata_cache_file(self, mock_get, tmp_path):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [{"id": "customfield_10204", "name": "Cucumber"}]
+        cache_file = str(tmp_path / "metadata.json")
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              metadata_file=cache_file)
+        assert test.get_field_identifier(field_name="cucumber") == "customfield_10204"
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              metadata_file=cache_file)
+        assert test.get_field_identifier(field_name="Cucumber") == "customfield_10204"
+        assert mock_get.call_count == 1
+        # Another server sharing the file gets its own fields
+        mock_get.return_value.json.return_value = [{"id": "customfield_2", "name": "Cucumber"}]
+        test = JiraConnection(username="toto", password="titi", url="http://other.domain.com",
+                              metadata_file=cache_file)
+        assert test.get_field_identifier(field_name="Cucumber") == "customfield_2"
+        assert mock_get.call_count == 2
+        test = JiraConnection(username="toto", password="titi", url="http://my.domain.com",
+                              metadata_file=cache_file)
+        assert test.get_field_identifier(field_name="Cucumber") == "customfield_10204"
+        assert mock_get.call_count == 2
+
+    @patch('requests.Session.get')
+    def test_metadata_cache_expired(self, mock_get, jira_connection):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"issueLinkTypes": [{"id": "1", "name": "Tests"}]}
+        jira_connection.metadata_cache.ttl = 0
+        jira_connection.get_link_types()
+        jira_connection.get_link_types()
+        assert mock_get.call_count == 2
+
     #######################################################
     # Test update_issue_description
     #######################################################
@@ -181,3 +398,486 @@ class TestJiraConnection:
     #######################################################
     # Test update_issue
     #######################################################
+
+    #######################################################
+    # Test search
+    #######################################################
+    @staticmethod
+    def search_pages(total=5, max_results=2):
+        def post(url=None, headers=None, data=None):
+            start_at = json.loads(data)["startAt"]
+            response = MagicMock()
+            response.json.return_value = {
+                "startAt": start_at, "maxResults": max_results, "total": total,
+                "issues": [{"key": "TST-{}".format(index)}
+                           for index in range(start_at, min(start_at + max_results, total))]}
+            return response
+        return post
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    def test_search_not_paginated(self, jira_connection, max_workers):
+        with patch.object(jira_connection.session, "post", side_effect=self.search_pages()) as post:
+            result = jira_connection.search(jql_query="project = TST", field_list=["key"],
+                                            paginated=False, max_workers=max_workers)
+        assert [issue["key"] for issue in result["issues"]] == ["TST-{}".format(index)
+                                                               for index in range(5)]
+        assert post.call_count == 3
+
+    def test_search_not_paginated_full_last_page(self, jira_connection):
+        with patch.object(jira_connection.session, "post",
+                          side_effect=self.search_pages(total=4)) as post:
+            result = jira_connection.search(jql_query="project = TST", field_list=["key"],
+                                            paginated=False, max_workers=4)
+        assert len(result["issues"]) == 4
+        assert post.call_count == 3
+
+    @pytest.mark.parametrize("prefetch", [True, False])
+    @pytest.mark.parametrize("total", [0, 4, 5])
+    def test_iter_issues(self, jira_connection, prefetch, total):
+        with patch.object(jira_connection.session, "post",
+                          side_effect=self.search_pages(total=total)):
+            issues = jira_connection.iter_issues(jql_query="project = TST", field_list=["key"],
+                                                 prefetch=prefetch)
+            assert [issue["key"] for issue in issues] == ["TST-{}".format(index)
+                                                          for index in range(total)]
+
+    def test_search_invalid_workers(self, jira_connection):
+        with pytest.raises(AssertionError):
+            jira_connection.search(jql_query="project = TST", field_list=["key"],
+                                   paginated=False, max_workers=0)
+            pytest.fail("max_workers must be a positive integer")
+
+    #######################################################
+    # Test add_tests
+    #######################################################
+    def test_add_tests_partial_failure(self, jira_connection):
+        jira_connection.metadata_cache.set("issuetypes/10051", [{"id": "5", "name": "Test"}])
+        # The linked stories are read before the tests creation
+        story_keys = [JiraIssueCache.key(issue_key=key) for key in ("TST-100", "TST-101", "TST-9")]
+        for key in story_keys:
+            jira_connection.issue_cache.set(key, self.issue_response(content={"fields": {}}))
+
+        def post(url=None, data=None, headers=None):
+            response = MagicMock()
+            if url.endswith("/issue/bulk"):
+                assert len(json.loads(data)["issueUpdates"]) == 3
+                response.status_code = 201
+                response.json.return_value = {
+                    "issues": [{"id": "1", "key": "TST-1"}, {"id": "3", "key": "TST-3"}],
+                    "errors": [{"status": 400, "failedElementNumber": 1,
+                                "elementErrors": {"errors": {"summary": "required"}}}]}
+            else:
+                response.ok = json.loads(data)["inwardIssue"]["key"] == "TST-1"
+                response.status_code = 201 if response.ok else 404
+            return response
+
+        tests = [{"story_key": "TST-100", "test_name": "first", "test_type": "Scenario"},
+                 {"story_key": "TST-100", "test_name": None, "test_type": "Scenario"},
+                 {"story_key": "TST-101", "test_name": "third", "test_type": "Scenario"}]
+        with patch.object(jira_connection.session, "post", side_effect=post) as mock_post:
+            results = jira_connection.add_tests(tests=tests)
+        assert [result["key"] for result in results] == ["TST-1", None, "TST-3"]
+        assert results[0]["error"] is None
+        assert results[1]["error"]["failedElementNumber"] == 1
+        assert results[1]["link"] is None
+        assert results[2]["error"]["status"] == 404
+        assert mock_post.call_count == 3
+        assert [jira_connection.issue_cache.get(key) is None for key in story_keys] == \
+            [True, True, False]
+
+    @patch('requests.Session.get')
+    def test_retrieve_attachments(self, mock_get, jira_connection, tmp_path):
+        (tmp_path / "present.txt").write_bytes(b"12345")
+        attachments = [{"id": "1", "filename": "present.txt", "size": 5,
+                        "content": "http://my.domain.com/attachment/1"},
+                       {"id": "2", "filename": "new.txt", "size": 7,
+                        "content": "http://my.domain.com/attachment/2"}]
+
+        def get(url=None, headers=None, params=None, stream=False):
+            if not stream:
+                return self.issue_response(content={"fields": {"attachment": attachments}})
+            response = self.issue_response()
+            response.raw = io.BytesIO(b"content")
+            return response
+
+        mock_get.side_effect = get
+        results = jira_connection.retrieve_attachments(issue_key="TST-1", folder=str(tmp_path))
+        assert [result["status"] for result in results] == ["skipped", "downloaded"]
+        assert (tmp_path / "new.txt").read_bytes() == b"content"
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["new.txt", "present.txt"]
+        assert mock_get.call_count == 2
+
+    @patch('requests.Session.get')
+    def test_retrieve_attachments_same_name(self, mock_get, jira_connection, tmp_path):
+        attachments = [{"id": str(index), "filename": "log.txt", "size": index + 1,
+                        "content": "http://my.domain.com/attachment/{}".format(index)}
+                       for index in range(4)]
+
+        def get(url=None, headers=None, params=None, stream=False):
+            if not stream:
+                return self.issue_response(content={"fields": {"attachment": attachments}})
+            response = self.issue_response()
+            response.raw = io.BytesIO(b"x" * (int(url.rsplit("/", 1)[1]) + 1))
+            return response
+
+        mock_get.side_effect = get
+        results = jira_connection.retrieve_attachments(issue_key="TST-1", folder=str(tmp_path),
+                                                       max_workers=4)
+        # The downloads of the same file run one after the other, the last one is kept
+        assert [result["status"] for result in results] == ["downloaded"] * 4
+        assert (tmp_path / "log.txt").read_bytes() == b"xxxx"
+        assert [path.name for path in tmp_path.iterdir()] == ["log.txt"]
+
+    def test_load_attachments_resume(self, jira_connection, tmp_path):
+        evidences = {}
+        for key in ["TST-1", "TST-2"]:
+            evidence = tmp_path / "{}.png".format(key)
+            evidence.write_bytes(b"evidence")
+            evidences[key] = [str(evidence)]
+        evidence_files = tmp_path / "evidences.json"
+        evidence_files.write_text(json.dumps(evidences))
+        journal_file = str(tmp_path / "journal")
+        uploaded = []
+
+        def post(url=None, headers=None, data=None):
+            payload = json.loads(data.read())
+            uploaded.append(payload["filename"])
+            assert payload["contentType"] == "image/png"
+            return self.response(500 if len(uploaded) == 1 and "fail" in url else 200)
+
+        def get(url=None, headers=None, params=None):
+            response = self.response(200)
+            if url.endswith("/testexec/TST-10/test"):
+                # TST-1 is missing from the listing and is looked up alone
+                response.json.return_value = [{"id": "1", "key": "TST-2"}]
+            else:
+                response.json.return_value = {"id": "fail"}
+            return response
+
+        with patch.object(jira_connection.session, "get", side_effect=get) as mock_get, \
+                patch.object(jira_connection.session, "post", side_effect=post):
+            results = jira_connection.test_execution_load_attachments(
+                execution_key="TST-10", evidence_files=str(evidence_files),
+                journal_file=journal_file, max_workers=1)
+            assert [result["status"] for result in results] == ["failed", "uploaded"]
+            results = jira_connection.test_execution_load_attachments(
+                execution_key="TST-10", evidence_files=str(evidence_files),
+                journal_file=journal_file)
+        assert [result["status"] for result in results] == ["uploaded", "skipped"]
+        assert uploaded == ["TST-1.png", "TST-2.png", "TST-1.png"]
+        assert mock_get.call_count == 4
+
+    def test_load_attachments_executed_only(self, jira_connection, tmp_path):
+        evidences = {}
+        for key in ["TST-1", "TST-2"]:
+            evidence = tmp_path / "{}.png".format(key)
+            evidence.write_bytes(b"evidence")
+            evidences[key] = [str(evidence)]
+        evidence_files = tmp_path / "evidences.json"
+        evidence_files.write_text(json.dumps(evidences))
+
+        def get(url=None, headers=None, params=None):
+            response = self.response(200)
+            response.json.return_value = [{"id": "1", "key": "TST-2"}]
+            return response
+
+        with patch.object(jira_connection.session, "get", side_effect=get) as mock_get, \
+                patch.object(jira_connection.session, "post",
+                             return_value=self.response(200)) as mock_post:
+            results = jira_connection.test_execution_load_attachments(
+                execution_key="TST-10", evidence_files=str(evidence_files), executed_only=True)
+        # TST-1 belongs to another execution, it is neither looked up nor failed
+        assert [(result["test"], result["status"]) for result in results] == \
+            [("TST-2", "uploaded")]
+        assert mock_get.call_count == 1
+        assert mock_post.call_count == 1
+
+    @pytest.mark.parametrize("max_workers,total", [(1, 250), (4, 250), (4, 300), (3, 0)])
+    def test_iter_tests_in_test_plan(self, jira_connection, max_workers, total):
+        def get(url=None, headers=None, params=None):
+            start = (params["page"] - 1) * params["limit"]
+            response = self.response(200)
+            response.json.return_value = [{"key": "TST-{}".format(index)}
+                                          for index in range(start,
+                                                             min(start + params["limit"], total))]
+            return response
+
+        with patch.object(jira_connection.session, "get", side_effect=get):
+            tests = list(jira_connection.iter_tests_in_test_plan(test_plan_key="TST-1",
+                                                                 max_workers=max_workers))
+        assert [test["key"] for test in tests] == ["TST-{}".format(index)
+                                                   for index in range(total)]
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    def test_iter_tests_in_test_plan_pagination_ignored(self, jira_connection, max_workers):
+        def get(url=None, headers=None, params=None):
+            # A full page whatever the requested page
+            response = self.response(200)
+            response.json.return_value = [{"key": "TST-{}".format(index)}
+                                          for index in range(params["limit"])]
+            return response
+
+        with patch.object(jira_connection.session, "get", side_effect=get):
+            tests = list(jira_connection.iter_tests_in_test_plan(test_plan_key="TST-1",
+                                                                 max_workers=max_workers))
+        assert len(tests) == XRayIssues.DEFAULT_PAGE_SIZE
+
+    @patch('eaijiraapiabstraction.XRayIssues.JiraTests.iter_test_plan_in_release')
+    def test_download_release_evidences(self, mock_plans, jira_connection, tmp_path):
+        mock_plans.return_value = [{"key": "TST-1"}, {"key": "TST-2"}]
+
+        def get(url=None, headers=None, params=None, stream=False):
+            response = self.issue_response()
+            if url.endswith("/testexecution"):
+                response._content = json.dumps([{"key": "TST-10"}]).encode()
+            elif url.endswith("/testexec/TST-10/test"):
+                response._content = json.dumps([{"key": "TST-20", "evidences": [
+                    {"id": 1, "fileName": "log.txt",
+                     "fileURL": "http://my.domain.com/evidence/1"}]}]).encode()
+            else:
+                response.raw = io.BytesIO(b"evidence")
+            return response
+
+        progress = MagicMock()
+        with patch.object(jira_connection.session, "get", side_effect=get) as mock_get:
+            results = jira_connection.download_release_evidences(release_name="R1",
+                                                                 folder=str(tmp_path),
+                                                                 progress=progress)
+        assert [result["status"] for result in results] == ["downloaded", "copied"]
+        for plan in ["TST-1", "TST-2"]:
+            assert (tmp_path / plan / "TST-10" / "TST-20" / "log.txt").read_bytes() == b"evidence"
+        # One request per plan, one for the shared execution and one for the shared evidence
+        assert mock_get.call_count == 4
+        progress.assert_called_once()
+
+    def test_download_evidences_mirror(self, jira_connection, tmp_path):
+        evidences = [{"id": 1, "fileName": "a.txt", "created": "1",
+                      "fileURL": "http://my.domain.com/evidence/1"},
+                     {"id": 2, "fileName": "b.txt", "created": "1",
+                      "fileURL": "http://my.domain.com/evidence/2"}]
+
+        def get(url=None, headers=None, params=None, stream=False):
+            response = self.issue_response()
+            if url.endswith("/testexec/TST-10/test"):
+                response._content = json.dumps([{"key": "TST-20",
+                                                 "evidences": evidences}]).encode()
+            else:
+                response.raw = io.BytesIO(url.encode())
+            return response
+
+        def mirror():
+            with patch.object(jira_connection.session, "get", side_effect=get) as mock_get:
+                results = jira_connection.download_execution_evidences(
+                    test_execution_key="TST-10", folder=str(tmp_path), mirror=True)
+            return [result["status"] for result in results], mock_get.call_count
+
+        assert mirror() == (["downloaded", "downloaded"], 3)
+        assert mirror() == (["skipped", "skipped"], 1)
+        evidences[1] = {"id": 3, "fileName": "c.txt", "created": "2",
+                        "fileURL": "http://my.domain.com/evidence/3"}
+        assert mirror() == (["skipped", "downloaded"], 2)
+        assert sorted(path.name for path in (tmp_path / "TST-20").iterdir()) == ["a.txt", "c.txt"]
+
+    def test_download_evidences_mirror_same_size(self, jira_connection, tmp_path):
+        evidence = {"id": 1, "fileName": "a.txt", "created": "1",
+                    "fileURL": "http://my.domain.com/evidence/1"}
+        contents = {1: b"old", 9: b"new"}
+
+        def get(url=None, headers=None, params=None, stream=False):
+            response = self.issue_response(headers={"Content-Length": "3"})
+            if url.endswith("/testexec/TST-10/test"):
+                response._content = json.dumps([{"key": "TST-20",
+                                                 "evidences": [evidence]}]).encode()
+            else:
+                response.raw = io.BytesIO(contents[evidence["id"]])
+            return response
+
+        def mirror():
+            with patch.object(jira_connection.session, "get", side_effect=get):
+                results = jira_connection.download_execution_evidences(
+                    test_execution_key="TST-10", folder=str(tmp_path), mirror=True)
+            return [result["status"] for result in results]
+
+        assert mirror() == ["downloaded"]
+        # Re-uploaded with a new id and the same size
+        evidence["id"] = 9
+        assert mirror() == ["downloaded"]
+        assert (tmp_path / "TST-20" / "a.txt").read_bytes() == b"new"
+        assert mirror() == ["skipped"]
+
+    def test_import_cucumber_reports(self, jira_connection, tmp_path):
+        reports = []
+        for shard in range(2):
+            report = tmp_path / "shard-{}.json".format(shard)
+            report.write_text(json.dumps([{"name": "feature {}-{}".format(shard, index),
+                                           "elements": ["x" * 400]} for index in range(3)]))
+            reports.append(str(report))
+        imported = []
+
+        def post(url=None, headers=None, data=None):
+            assert url.endswith("/import/execution/cucumber/multipart")
+            assert headers["Content-Type"].startswith("multipart/form-data; boundary=")
+            body = data.read()
+            assert len(body) == len(data)
+            imported.append(body.count(b'"name": "feature'))
+            return self.response(200)
+
+        with patch.object(jira_connection.session, "post", side_effect=post):
+            responses = jira_connection.import_cucumber_reports(
+                cucumber_report_paths=reports, info={"fields": {"summary": "run"}},
+                max_size=1500)
+        # 6 features of about 450 bytes merged by 3
+        assert len(responses) == 2
+        assert imported == [3, 3]
+
+    @staticmethod
+    def report_search(url=None, headers=None, data=None):
+        # Jira search of the reports: the summary of any issue or the fields of the tests
+        keys = re.findall(r"[A-Z]+-\d+", json.loads(data)["jql"])
+        return TestJiraConnection.issue_response(content={"maxResults": 50, "issues": [
+            {"key": key, "fields": {"summary": "summary of {}".format(key),
+                                    "customfield_10204": "Given step of {}".format(key),
+                                    "customfield_10206": None,
+                                    "issuelinks": [{"inwardIssue": {
+                                        "key": "US-1", "fields": {"summary": "story"}}}]}}
+            for key in keys]})
+
+    @staticmethod
+    def report_get(url=None, headers=None, params=None, stream=False):
+        response = TestJiraConnection.issue_response()
+        if url.endswith("/testexecution"):
+            response._content = json.dumps([{"key": "TST-{}".format(index),
+                                             "summary": "execution"}
+                                            for index in (10, 11)]).encode()
+        elif "/testexec/" in url:
+            execution = int(url.split("/")[-2].split("-")[1])
+            # The test index gives its number of evidences
+            response._content = json.dumps([{"key": "TST-{}".format(execution * 10 + index),
+                                             "status": "PASS", "defects": [], "evidences": [
+                {"fileName": "log{}.txt".format(number),
+                 "id": execution * 100 + index * 10 + number,
+                 "fileURL": "http://my.domain.com/evidence/{}/{}".format(
+                     execution * 10 + index, number)} for number in range(index + 1)]}
+                for index in range(3)]).encode()
+        else:
+            response.raw = io.BytesIO(url.encode())
+        return response
+
+    @pytest.mark.parametrize("constant_memory", [False, True])
+    def test_release_report_test_plan(self, jira_connection, tmp_path, constant_memory):
+        with patch.object(jira_connection.session, "get", side_effect=self.report_get), \
+                patch.object(jira_connection.session, "post",
+                             side_effect=self.report_search) as mock_post:
+            jira_connection.release_report(test_plan_key="TST-1",
+                                           destination_folder=str(tmp_path), max_workers=4,
+                                           constant_memory=constant_memory)
+        for execution in (10, 11):
+            for index in range(3):
+                key = "TST-{}".format(execution * 10 + index)
+                assert (tmp_path / "TST-1" / "TST-{}".format(execution) / key /
+                        "log{}.txt".format(index)).read_text().endswith(
+                    "{}/{}".format(execution * 10 + index, index))
+        with zipfile.ZipFile(str(tmp_path / "TST-1-report.xlsx")) as workbook:
+            names = workbook.namelist()
+            content = "".join(workbook.read(name).decode() for name in names
+                              if name.endswith((".xml", ".rels")))
+        assert len([name for name in names if name.startswith("xl/worksheets/sheet")]) == 3
+        assert "Given step of TST-112" in content
+        # xlsxwriter writes the external links with Windows separators
+        assert r"TST-1\TST-10\TST-101\log1.txt" in content
+        # The rows of the third test: one per evidence, merged for its status
+        assert '<mergeCell ref="F8:F10"/>' in content
+        assert "log2.txt" in content
+        # The test plan summary then one search per execution
+        assert mock_post.call_count == 3
+
+    @patch('eaijiraapiabstraction.JiraReporter.JiraTests.iter_test_plan_in_release')
+    def test_release_report_single_workbook(self, mock_plans, jira_connection, tmp_path):
+        mock_plans.return_value = [{"key": "TST-1"}, {"key": "TST-2"}]
+        with patch.object(jira_connection.session, "get",
+                          side_effect=self.report_get) as mock_get, \
+                patch.object(jira_connection.session, "post", side_effect=self.report_search):
+            jira_connection.release_report(release_name="R1", destination_folder=str(tmp_path),
+                                           single_workbook=True)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["R1-report.xlsx", "TST-1",
+                                                                    "TST-2"]
+        for plan in ["TST-1", "TST-2"]:
+            assert (tmp_path / plan / "TST-11" / "TST-112" / "log2.txt").is_file()
+        # The evidences shared by the two plans are downloaded once
+        assert len([call for call in mock_get.call_args_list
+                    if "/evidence/" in call.kwargs["url"]]) == 12
+        with zipfile.ZipFile(str(tmp_path / "R1-report.xlsx")) as workbook:
+            names = workbook.namelist()
+            summary = workbook.read("xl/worksheets/sheet1.xml").decode()
+        # The summary then the two executions shared by the plans
+        assert len([name for name in names if name.startswith("xl/worksheets/sheet")]) == 3
+        # The line of each plan counts its 6 tests, all passed, then come its 2 executions
+        for row in (5, 8):
+            assert '<c r="E{0}"><v>6</v></c><c r="F{0}"><v>6</v></c>'.format(row) in summary
+        assert summary.count('location="\'TST-11\'!A1"') == 2
+
+    def test_release_report_incremental(self, jira_connection, tmp_path):
+        updated = {}
+
+        def search(url=None, headers=None, data=None):
+            content = self.report_search(url=url, headers=headers, data=data).json()
+            for issue in content["issues"]:
+                issue["fields"]["updated"] = updated.get(issue["key"], "1")
+            return self.issue_response(content=content)
+
+        def report():
+            with patch.object(jira_connection.session, "get",
+                              side_effect=self.report_get) as mock_get, \
+                    patch.object(jira_connection.session, "post",
+                                 side_effect=search) as mock_post:
+                jira_connection.release_report(test_plan_key="TST-1",
+                                               destination_folder=str(tmp_path),
+                                               incremental=True)
+            return [call.kwargs["url"].split("/rest/raven/1.0/api/")[-1]
+                    for call in mock_get.call_args_list], mock_post.call_count
+
+        gets, posts = report()
+        assert len([get for get in gets if "/evidence/" in get]) == 12
+        # Nothing updated: only the plan executions and their last update are read
+        assert report() == (["testplan/TST-1/testexecution"], 2)
+        updated["TST-11"] = "2"
+        assert report() == (["testplan/TST-1/testexecution", "testexec/TST-11/test"], 3)
+        with zipfile.ZipFile(str(tmp_path / "TST-1-report.xlsx")) as workbook:
+            content = workbook.read("xl/sharedStrings.xml").decode()
+        assert "Given step of TST-102" in content
+        assert "Given step of TST-112" in content
+
+    def test_release_report_incremental_replaced_evidence(self, jira_connection, tmp_path):
+        version = {"updated": "1", "id": 0, "content": b"old"}
+
+        def search(url=None, headers=None, data=None):
+            content = self.report_search(url=url, headers=headers, data=data).json()
+            for issue in content["issues"]:
+                issue["fields"]["updated"] = version["updated"]
+            return self.issue_response(content=content)
+
+        def get(url=None, headers=None, params=None, stream=False):
+            response = self.report_get(url=url, headers=headers, params=params, stream=stream)
+            if "/testexec/" in url:
+                tests = response.json()
+                for test in tests:
+                    for evidence in test["evidences"]:
+                        evidence["id"] += version["id"]
+                response._content = json.dumps(tests).encode()
+            elif "/evidence/" in url:
+                response.headers["Content-Length"] = "3"
+                response.raw = io.BytesIO(version["content"])
+            return response
+
+        def report():
+            with patch.object(jira_connection.session, "get", side_effect=get), \
+                    patch.object(jira_connection.session, "post", side_effect=search):
+                jira_connection.release_report(test_plan_key="TST-1",
+                                               destination_folder=str(tmp_path),
+                                               incremental=True)
+
+        report()
+        # The evidences are uploaded again: new ids, same names and sizes
+        version.update(updated="2", id=1000, content=b"new")
+        report()
+        assert (tmp_path / "TST-1" / "TST-11" / "TST-112" / "log2.txt").read_bytes() == b"new"
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""Lightweight feature models shared by the feature files tools.
+
+    The behave models keep references to their parent and to the parser so they are heavy and
+    can't be sent between processes. The models below only keep what the tools read, with the
+    same attribute names as the behave models, and can be pickled.
+    With a FeatureCache the models of the unchanged files are read from the disk instead of
+    being parsed again.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+from behave import __version__ as behave_version
+from behave.parser import parse_file
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Row:
+    cells: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Table:
+    headings: List[str] = field(default_factory=list)
+    rows: List[Row] = field(default_factory=list)
+
+
+@dataclass
+class Step:
+    keyword: str = None
+    name: str = None
+    table: Optional[Table] = None
+    text: Optional[str] = None
+
+
+@dataclass
+class Examples:
+    keyword: str = None
+    name: str = None
+    table: Optional[Table] = None
+
+
+@dataclass
+class Background:
+    keyword: str = None
+    name: str = None
+    steps: List[Step] = field(default_factory=list)
+
+
+@dataclass
+class Scenario:
+    keyword: str = None
+    name: str = None
+    type: str = None  # "scenario" or "scenario_outline"
+    tags: List[str] = field(default_factory=list)
+    effective_tags: List[str] = field(default_factory=list)
+    steps: List[Step] = field(default_factory=list)
+    examples: List[Examples] = field(default_factory=list)
+
+
+@dataclass
+class Feature:
+    filename: str = None
+    keyword: str = None
+    name: str = None
+    tags: List[str] = field(default_factory=list)
+    description: List[str] = field(default_factory=list)
+    background: Optional[Background] = None
+    scenarios: List[Scenario] = field(default_factory=list)
+
+
+def to_table(table=None):
+    """
+    Convert a behave table
+    :param table: the behave table or None
+    :return: a Table or None
+    """
+    if table is None:
+        return None
+    return Table(headings=[str(heading) for heading in table.headings],
+                 rows=[Row(cells=[str(cell) for cell in row.cells]) for row in table.rows])
+
+
+def to_steps(steps=None):
+    return [Step(keyword=step.keyword, name=step.name, table=to_table(step.table),
+                 text=str(step.text) if step.text is not None else None)
+            for step in steps or []]
+
+
+def to_feature(feature=None):
+    """
+    Convert a behave feature into its lightweight model.
+    :param feature: the behave feature object
+    :return: a Feature
+    """
+    background = None
+    if feature.background is not None:
+        background = Background(keyword=feature.background.keyword,
+                                name=feature.background.name,
+                                steps=to_steps(feature.background.steps))
+    scenarios = []
+    for scenario in feature.scenarios:
+        # The effective tags are a set on the recent behave versions, keep the file order
+        effective_tags = [str(tag) for tag in feature.tags] + \
+            [str(tag) for tag in scenario.tags if tag not in feature.tags]
+        scenarios.append(Scenario(keyword=scenario.keyword, name=scenario.name,
+                                  type=scenario.type,
+                                  tags=[str(tag) for tag in scenario.tags],
+                                  effective_tags=effective_tags,
+                                  steps=to_steps(scenario.steps),
+                                  examples=[Examples(keyword=example.keyword, name=example.name,
+                                                     table=to_table(example.table))
+                                            for example in getattr(scenario, "examples", [])]))
+    return Feature(filename=feature.filename, keyword=feature.keyword, name=feature.name,
+                   tags=[str(tag) for tag in feature.tags],
+                   description=list(feature.description), background=background,
+                   scenarios=scenarios)
+
+
+def parse_feature(file_name: str = None):
+    """
+    Parse a feature file with the behave parser.
+    :param file_name: the feature file path
+    :return: a Feature or None when the file has no feature
+    """
+    feature = parse_file(file_name)
+    return to_feature(feature) if feature is not None else None
+
+
+def _parse_feature(file_name):
+    # The behave parser errors can't always be pickled, only their message is sent back
+    try:
+        return parse_feature(file_name), None
+    except Exception as exception:  # noqa
+        return None, "{}: {}".format(type(exception).__name__, exception)
+
+
+def from_dict(data: dict = None):
+    """
+    Rebuild a feature model from its dictionary (see dataclasses.asdict).
+    :param data: the feature dictionary
+    :return: a Feature
+    """
+    def table(value):
+        if value is None:
+            return None
+        return Table(headings=value["headings"],
+                     rows=[Row(cells=row["cells"]) for row in value["rows"]])
+
+    def steps(values):
+        return [Step(keyword=step["keyword"], name=step["name"], table=table(step["table"]),
+                     text=step["text"]) for step in values]
+
+    background = data["background"]
+    if background is not None:
+        background = Background(keyword=background["keyword"], name=background["name"],
+                                steps=steps(background["steps"]))
+    scenarios = [Scenario(keyword=scenario["keyword"], name=scenario["name"],
+                          type=scenario["type"], tags=scenario["tags"],
+                          effective_tags=scenario["effective_tags"],
+                          steps=steps(scenario["steps"]),
+                          examples=[Examples(keyword=example["keyword"], name=example["name"],
+                                             table=table(example["table"]))
+                                    for example in scenario["examples"]])
+                 for scenario in data["scenarios"]]
+    return Feature(filename=data["filename"], keyword=data["keyword"], name=data["name"],
+                   tags=data["tags"], description=data["description"], background=background,
+                   scenarios=scenarios)
+
+
+class FeatureCache:
+    """Persistent cache of the parsed feature files.
+
+        An entry is stored per feature file, one json file in the cache folder, with the file
+        content hash and the behave version. It is only used while both are unchanged so a
+        modified file or a behave upgrade leads to a new parse.
+    """
+
+    def __init__(self, folder: str = None):
+        """
+        :param folder: the folder where the parsed features are stored
+        """
+        assert isinstance(folder, str), "folder must be a string"
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def content_hash(file_name: str = None):
+        with open(file_name, "rb") as feature_file:
+            return hashlib.sha256(feature_file.read()).hexdigest()
+
+    def __entry_name(self, file_name):
+        return os.path.join(self.folder, "{}.json".format(
+            hashlib.sha1(os.path.abspath(file_name).encode()).hexdigest()))
+
+    def get(self, file_name: str = None, content_hash: str = None):
+        """
+        Get the parsed feature of a file.
+        :param file_name: the feature file path
+        :param content_hash: the current content hash of the file
+        :return: a tuple (found, Feature or None when the file has no feature)
+        """
+        try:
+            with open(self.__entry_name(file_name)) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return False, None
+        if entry.get("path") != os.path.abspath(file_name) or \
+                entry.get("hash") != content_hash or entry.get("behave") != behave_version:
+            return False, None
+        try:
+            return True, from_dict(entry["feature"]) if entry["feature"] is not None else None
+        except (KeyError, TypeError):
+            # Written by a former version of the models
+            return False, None
+
+    def set(self, file_name: str = None, content_hash: str = None, feature: Feature = None):
+        """
+        Store the parsed feature of a file.
+        :param file_name: the feature file path
+        :param content_hash: the content hash of the parsed file
+        :param feature: the Feature or None when the file has no feature
+        :return: None
+        """
+        entry_name = self.__entry_name(file_name)
+        temporary_name = "{}.{}.tmp".format(entry_name, threading.get_ident())
+        try:
+            with open(temporary_name, "w") as entry_file:
+                json.dump({"path": os.path.abspath(file_name), "hash": content_hash,
+                           "behave": behave_version,
+                           "feature": asdict(feature) if feature is not None else None},
+                          entry_file)
+            os.replace(temporary_name, entry_name)
+        except OSError as exception:
+            log.warning("Feature cache entry '{}' not saved: {}".format(file_name,
+                                                                        repr(exception)))
+
+
+def parse_features(file_names: list = None, max_workers: int = None, cache: FeatureCache = None):
+    """
+    Parse many feature files in a process pool.
+    A file which can't be parsed is logged and its feature is None.
+    :param file_names: the feature files paths
+    :param max_workers: the number of parsing processes, by default the number of processors
+    :param cache: the cache of the parsed files, only the new or modified files are parsed when
+     given
+    :return: the list of Feature or None in the file_names order
+    """
+    assert file_names is not None, "file_names must be a list"
+    features = [None] * len(file_names)
+    pending = list(range(len(file_names)))
+    hashes = {}
+    if cache is not None:
+        pending = []
+        for index, file_name in enumerate(file_names):
+            try:
+                hashes[index] = FeatureCache.content_hash(file_name)
+            except OSError:
+                # Reported by the parser
+                pending.append(index)
+                continue
+            found, features[index] = cache.get(file_name, content_hash=hashes[index])
+            if not found:
+                pending.append(index)
+        log.debug("{} feature files loaded from the cache, {} to parse".format(
+            len(file_names) - len(pending), len(pending)))
+    pending_names = [file_names[index] for index in pending]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(pending_names) < 2:
+        results = [_parse_feature(file_name) for file_name in pending_names]
+    else:
+        # Send the files by chunks, a feature file is parsed in a few milliseconds
+        chunksize = max(1, len(pending_names) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_parse_feature, pending_names, chunksize=chunksize))
+    for index, (feature, error) in zip(pending, results):
+        if error is not None:
+            log.warning("Feature file '{}' not parsed: {}".format(file_names[index], error))
+            continue
+        features[index] = feature
+        if cache is not None and index in hashes:
+            cache.set(file_names[index], content_hash=hashes[index], feature=feature)
+    return features
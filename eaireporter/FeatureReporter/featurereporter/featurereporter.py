@@ -9,11 +9,12 @@ import sys
 
 from pathlib import Path
 from PIL import ImageTk, Image
-from behave.parser import parse_file
 from docx import Document
 import tkinter as tk
 from tkinter import filedialog, Toplevel, messagebox
 
+from eaireporter.FeatureModel import FeatureCache, parse_features
+
 log = logging.getLogger(__name__)
 
 LICENCE = """ ExportUtilities  Copyright (C) 2021  E.Aivayan
@@ -254,7 +255,8 @@ class ExportUtilities:
     def document(self):
         return self.__document
 
-    def create_application_documentation(self, report_file=None, output_file_name="demo.docx"):
+    def create_application_documentation(self, report_file=None, output_file_name="demo.docx",
+                                         max_workers=None, cache_folder=None):
         """
         Create a document (docx) object and read first all ".feature" files and
         add their contents into the document.
@@ -266,16 +268,23 @@ class ExportUtilities:
 
         :param report_file: The report file path (absolute or relative)
         :param output_file_name : The exported file name by default "demo.docx"
+        :param max_workers: the number of feature files parsing processes, by default the
+         number of processors
+        :param cache_folder: the folder where the parsed feature files are kept between two
+         documents, only the new or modified files are parsed. None to parse all the files
         :return: None
         """
 
         self.__document = Document()
         self.document.add_heading("{}".format(self.__report_title), 0)  # Document title
         self.document.add_page_break()
-        for file in glob.iglob("{}/**/*.feature".format(self.__feature_repository),
-                               recursive=True):  # Use the iterator as it's cleaner
-            # log.debug()
-            test = parse_file(file)  # Use the Behave parser in order to read the feature file
+        files = glob.glob("{}/**/*.feature".format(self.__feature_repository), recursive=True)
+        # Parse all the feature files at once in a process pool, then write them in order
+        cache = FeatureCache(cache_folder) if cache_folder is not None else None
+        for file, test in zip(files, parse_features(files, max_workers=max_workers, cache=cache)):
+            if test is None:
+                log.warning("No feature in file: {}".format(file))
+                continue
             self.add_heading(feature=test)
             self.add_description(feature=test)
             self.add_background(feature=test)
@@ -486,6 +495,8 @@ def main():
     parser.add_argument("--output", help="")
     parser.add_argument("--execution",
                         help="Behave plain test output in order to also print the last execution result")
+    parser.add_argument("--cache",
+                        help="The folder where the parsed feature files are kept between runs")
     parser.add_argument("--license",
                         help="Display the license.",
                         action="store_true")
@@ -513,6 +524,8 @@ def main():
             parameters["report_file"] = args.execution
         if args.output is not None and args.output:
             parameters["output_file_name"] = args.output
+        if args.cache is not None and args.cache:
+            parameters["cache_folder"] = args.cache
         print(f"""{LICENCE}
     Run with --license option to display the full licence""")
         report.create_application_documentation(**parameters)
@@ -3,10 +3,12 @@ import logging
 import os
 import re
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import dpath.util
-from behave.parser import parse_file
+from eaireporter.FeatureModel import FeatureCache, parse_feature, parse_features
 from eaijiraapiabstraction.JiraConnection import JiraConnection
 from eaijiraapiabstraction.JiraIssues import JiraIssue
+from eaijiraapiabstraction.JiraSession import JiraSession
 
 my_format = "%(asctime)s -- %(filename)s.%(funcName)s-- %(levelname)s -- %(message)s"
 # my_format = "%(levelname)s -- %(message)s"  # use for debug
@@ -25,6 +27,9 @@ mapping_feature_jira = {
     "title": "/fields/summary",
     "scenario": "/fields/customfield_10204"
 }
+# jira's fields read to compare a test with its scenario
+jira_fields = ["issuetype"] + [path.split("/")[2] for path in mapping_feature_jira.values()
+                               if path.startswith("/fields/")]
 
 
 class UpdateFeatureOnJira:
@@ -35,40 +40,46 @@ class UpdateFeatureOnJira:
         :param url: jira's URL
         """
         self.__connection = JiraConnection(url=url, username=username, password=password)
-        self.feature = None  # feature file parsed via behave.parser
+        self.feature = None  # feature file parsed via featuremodel
 
-    def update_feature_on_jira(self, feature_repository: str = None, check=False):
+    def update_feature_on_jira(self, feature_repository: str = None, check=False,
+                               max_workers=JiraSession.DEFAULT_POOL_SIZE, cache_folder=None):
         """
         get all features from a directory
         https://jira.neopost-id.com/confluence/display/PFWES/Synchronise+feature+files+with+Jira+tests  # noqa
         :param check: check option to not change on JIRA
         :param feature_repository: folder with features in it
+        :param max_workers: the number of test cases updated at the same time
+        :param cache_folder: the folder where the parsed feature files are kept between two
+         runs, only the new or modified files are parsed. None to parse all the files
         :return:
         """
         assert feature_repository is not None, "Missing 'feature_repository' argument"
         feature_files_list = UpdateFeatureOnJira.check_repository(feature_repository)
-        error_files_list = list()
-        for feature_file in feature_files_list:
-            # get all project's features files and manage each individually
-            # only if get_feature get correct value do something
+        # 1. parse all the feature files
+        cache = FeatureCache(cache_folder) if cache_folder is not None else None
+        features, error_files_list = self.get_features(feature_files_list, cache=cache)
+        # 2. get all the jira tests with a few searches
+        jira_tests = self.get_jira_tests([scenario["scenario_id"]
+                                          for feature_file, feature in features
+                                          for scenario in feature["scenarios"]])
+        # 3. compare each scenario with its jira test
+        jira_changes = {}
+        for feature_file, feature in features:
             log.info('\n\t## Feature file: {}'.format(feature_file))
-            error_file = self.get_feature(feature_file=feature_file)
-            if error_file == 0:
-                for i in range(0, len(self.feature["scenarios"])):  # for each scenario
-                    jira_id = self.feature["scenarios"][i]["scenario_id"]
-                    jira_test = UpdateFeatureOnJira.get_jira_test(self, jira_id)  # get jira data
-                    jira_change = dict(UpdateFeatureOnJira.compare_feature_vs_jira(self, i,
-                                                                                   jira_test))
-                    if len(jira_change):  # if there are no change, send message
-                        log.debug("{} changes to do: {}".format(jira_id, jira_change.keys()))
-                        if check is False:  # if check option, do not change on JIRA
-                            # todo add gitlab ci on dev --check
-                            results = UpdateFeatureOnJira.update_jira_test(self, jira_id,
-                                                                           jira_change)
-                            log.debug("Results: \n\t{}".format(results))
-            else:  # if get_feature can't get feature
-                log.warning("No feature in file: {}".format(feature_file))
-                error_files_list.append(feature_file)
+            self.feature = feature
+            for i in range(0, len(self.feature["scenarios"])):  # for each scenario
+                jira_id = self.feature["scenarios"][i]["scenario_id"]
+                jira_change = dict(UpdateFeatureOnJira.compare_feature_vs_jira(
+                    self, i, jira_tests[jira_id]))
+                if len(jira_change):  # if there are no change, send message
+                    log.debug("{} changes to do: {}".format(jira_id, jira_change.keys()))
+                    jira_changes[jira_id] = jira_change
+        # 4. update the changed jira tests
+        if check is False and jira_changes:  # if check option, do not change on JIRA
+            # todo add gitlab ci on dev --check
+            results = self.update_jira_tests(jira_changes, max_workers=max_workers)
+            log.debug("Results: \n\t{}".format(results))
         # if there are some files in error, write it in the logs
         if len(error_files_list) != 0:
             error_files = "\n\t".join(error_files_list)
@@ -80,7 +91,7 @@ class UpdateFeatureOnJira:
         # get the test case from JIRA from a jira_id (ex: PFWES-5336)
         assert jira_id is not None, "Impossible to get jira issue: {}".format(jira_id)
         log.debug("## Get jira: {}".format(jira_id))
-        jira_test_json = self.__connection.get_issue(jira_id)
+        jira_test_json = self.__connection.get_issue(jira_id, fields=jira_fields)
         jira_test = 0
         if jira_test_json.status_code != 200:  # if we can't get the test
             log.error("Connection to JIRA impossible. Check url, login/password - HTTP: {}".format(
@@ -96,10 +107,56 @@ class UpdateFeatureOnJira:
                 quit(2)
         return jira_test
 
-    def get_feature(self, feature_file=None):
-        # Parse a feature file and convert it in a dictionary (self.feature)
+    def get_jira_tests(self, jira_ids=None):
+        """
+        Get the jira tests of many scenarios with a few searches restricted to the compared
+        fields.
+        :param jira_ids: the scenarios jira ids
+        :return: a dictionary of jira tests by jira id
+        """
+        assert jira_ids is not None, "Impossible to get jira issues: {}".format(jira_ids)
+        log.info("## Get {} jira tests".format(len(set(jira_ids))))
+        jira_tests = self.__connection.get_issues(issue_keys=jira_ids, fields=jira_fields)
+        for jira_id in dict.fromkeys(jira_ids):
+            if jira_id not in jira_tests:  # if we can't get the test
+                log.error("{} not found in JIRA. Check url, login/password".format(jira_id))
+                quit(1)
+            # check if jira's ID is a test case
+            if jira_tests[jira_id]["fields"]["issuetype"]['name'] != 'Test':
+                log.error("{} is not a test case!".format(jira_id))
+                quit(2)
+        return jira_tests
+
+    def get_features(self, feature_files_list=None, max_workers=None, cache=None):
+        """
+        Parse feature files in a process pool.
+        :param feature_files_list: the feature files paths
+        :param max_workers: the number of parsing processes, by default the number of processors
+        :param cache: the FeatureCache of the parsed files, None to parse all the files
+        :return: the list of (feature file, feature dictionary) and the list of files in error
+        """
+        assert feature_files_list is not None, "Get features - Missing files"
+        features = []
+        error_files_list = []
+        for feature_file, feature in zip(feature_files_list,
+                                         parse_features(feature_files_list,
+                                                        max_workers=max_workers,
+                                                        cache=cache)):
+            # only if the file is parsed and get_feature get correct value do something
+            if feature is not None and \
+                    self.get_feature(feature_file=feature_file, feature=feature) == 0:
+                features.append((feature_file, self.feature))
+            else:  # if get_feature can't get feature
+                log.warning("No feature in file: {}".format(feature_file))
+                error_files_list.append(feature_file)
+        return features, error_files_list
+
+    def get_feature(self, feature_file=None, feature=None):
+        # Convert a parsed feature file in a dictionary (self.feature)
+        # feature = the feature model of the file, parsed here when not given
         assert feature_file is not None, "Get feature - Missing file {}".format(feature_file)
-        feature = parse_file(feature_file)  # parse feature file into a feature object
+        if feature is None:
+            feature = parse_feature(feature_file)  # parse feature file into a feature model
         # get all feature's story / improvement
         try:
             story_tags = UpdateFeatureOnJira.return_jira_id_from_list(feature.tags)
@@ -119,7 +176,7 @@ class UpdateFeatureOnJira:
             # get the scenario jira id
             scenario_id = UpdateFeatureOnJira.return_jira_id_from_list(scenario.tags)
             # get all labels without jira ids
-            tags = scenario.effective_tags
+            tags = list(scenario.effective_tags)
             jira_ids = UpdateFeatureOnJira.return_jira_id_from_list(scenario.effective_tags)
             if len(jira_ids) < 2:
                 log.debug("There is no jira's id in feature in file: {}".format(feature_file))
@@ -365,61 +422,103 @@ class UpdateFeatureOnJira:
             log.info("No change for {}".format(scenario['scenario_id']))
         return change
 
+    @staticmethod
+    def build_update(jira_changes=None):
+        # Build the update payload of a test case, links included
+        # jira_changes = list of all changes
+        assert jira_changes is not None, "There is no change"
+        json_data = {"update": {}}
+        for field in jira_changes:
+            log.debug("{} - jira_change[field]: {}".format(type(jira_changes[field]),
+                                                           jira_changes[field]))
+            value = str(jira_changes[field])
+            if field == mapping_feature_jira['story_tags']:
+                # manage linked issue field, the feature could get multiple jira ids
+                value = [{"add": {"type": {"name": "Tests"},
+                                  "outwardIssue": {"key": story_key.strip()}}}
+                         for story_key in value.split(",") if story_key.strip()]
+            elif field == mapping_feature_jira['labels']:
+                # Manage labels field
+                # update labels and remove unexpected labels
+                value = [{action: tag} for action, data in jira_changes[field].items()
+                         for tag in data]
+            elif field == mapping_feature_jira['type']:
+                # manage case for field = type (scenario type)
+                value = [{"set": {"value": value}}]
+            else:
+                # manage other fields than "label" "type" & "story tags"
+                value = [{"set": value}]
+            log.debug('field: {} - value: \n\t{}\n'.format(field, value))
+            dpath.util.new(json_data, field.replace('fields/', 'update/'), value)
+        log.debug("json_data: {}".format(json_data))
+        return json_data
+
+    @staticmethod
+    def is_updated(result=None):
+        return result.status_code == 204 or result.status_code == 201
+
+    @staticmethod
+    def log_update(jira_id=None, fields=None, result=None):
+        # Manage return message of the issue's update
+        if not UpdateFeatureOnJira.is_updated(result):
+            # when error return ERROR messages
+            log.warning("HTTP:{} - Error to update {} fields: {}\n\t{}".format(result.status_code, jira_id, ", ".join(fields),  # noqa
+                                                                                JiraIssue.sanitize(result.content)))  # noqa
+        else:
+            # when not error return INFO messages
+            log.info("HTTP:{} - {} fields: {} updated successfully".format(
+                result.status_code, jira_id, ", ".join(fields)))
+
     def update_jira_test(self, jira_id=None, jira_changes=None):
         # Update the test case from Jira with feature file data
         # jira_id = jira's id who will be updated
         # jira_changes = list of all changes
+        # All the changes, links included, are sent in a single update request
         assert jira_id is not None, "There is no jira_id to change"
         assert jira_changes is not None, "There is no change for jira_id{}".format(jira_id)
 
-        results = {jira_id: {}}  # build a json for results = { jira_id: {"field1": "204 OK"}}
+        json_data = UpdateFeatureOnJira.build_update(jira_changes)
+        my_result = self.__connection.update_issue(jira_id, json_data)
+        # build a json for results = { jira_id: {"field1": "204 OK"}}
+        results = {jira_id: {field: my_result for field in jira_changes}}
+        links = json_data["update"].pop("issuelinks", None)
+        if UpdateFeatureOnJira.is_updated(my_result) or not links:
+            self.log_update(jira_id, jira_changes, my_result)
+            return results
 
-        # Split jira_changes to manage each field individually
-        for field in jira_changes:
-            log.debug("{} - jira_change[field]: {}".format(type(jira_changes[field]),
-                                                           jira_changes[field]))
-            value = str(jira_changes[field])
-            if field == mapping_feature_jira['story_tags']:
-                # manage linked issue field
-                my_result = self.__connection.create_link(from_key=jira_id, to_key=value,
-                                                          link_type='Tests')
-            else:
-                log.debug("field ---> {}".format(field))
-                if field == mapping_feature_jira['labels']:
-                    # Manage labels field
-                    change = []
-                    # update labels and remove unexpected labels
-                    for action, data in jira_changes[field].items():
-                        for tag in data:
-                            change.append({action: tag})
-                        value = change
-                elif field == mapping_feature_jira['type']:
-                    # manage case for field = type (scenario type)
-                    value = [{"set": {"value": value}}]
-                else:
-                    # manage other fields than "label" "type" & "story tags"
-                    value = [{"set": value}]
-
-                field = field.replace('fields/', 'update/')
-                log.debug('field: {} - value: \n\t{}\n'.format(field, value))
-                json_data = {}
-                dpath.util.new(json_data, field, value)
-                log.debug("json_data: {}".format(json_data))
-                # Update jira issue change by change
-                my_result = self.__connection.update_issue(jira_id, json_data)
-
-            # Manage return message of the issue's update
-            if not (my_result.status_code == 204 or my_result.status_code == 201):
-                # when error return ERROR messages
-                log.warning("HTTP:{} - Error to update field: {}\n\t{}".format(my_result.status_code, field,  # noqa
-                                                                               JiraIssue.sanitize(my_result.content)))  # noqa
-            else:
-                # when not error return INFO messages
-                log.info("HTTP:{} - Field: {} updated successfully".format(my_result.status_code,
-                                                                           field))
+        # Jira rejects the whole update when a link can't be added ("Linked Issues" not on the
+        # edit screen, unknown story): the fields are sent alone then the links one by one
+        log.warning("HTTP:{} - Error to update {} with its links, the fields and the links are "
+                    "sent separately".format(my_result.status_code, jira_id))
+        fields = [field for field in jira_changes if field != mapping_feature_jira['story_tags']]
+        if fields:
+            my_result = self.__connection.update_issue(jira_id, json_data)
+            self.log_update(jira_id, fields, my_result)
+            results[jira_id].update({field: my_result for field in fields})
+        link_result = None
+        for link in links:
+            my_result = self.__connection.create_link(from_key=jira_id,
+                                                      to_key=link["add"]["outwardIssue"]["key"],
+                                                      link_type='Tests')
+            self.log_update(jira_id, [mapping_feature_jira['story_tags']], my_result)
+            if link_result is None or UpdateFeatureOnJira.is_updated(link_result):
+                link_result = my_result  # keep the first failed link result
+        results[jira_id][mapping_feature_jira['story_tags']] = link_result
+        return results
 
-            results[jira_id][field] = my_result  # save result for this field
-        # loop end
+    def update_jira_tests(self, jira_changes=None, max_workers=JiraSession.DEFAULT_POOL_SIZE):
+        """
+        Update many test cases concurrently, one request per test case.
+        :param jira_changes: a dictionary of changes by jira id
+        :param max_workers: the number of test cases updated at the same time
+        :return: the update_jira_test results merged in one dictionary
+        """
+        assert jira_changes is not None, "There is no change"
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(lambda jira_id: self.update_jira_test(
+                    jira_id, jira_changes[jira_id]), jira_changes):
+                results.update(result)
         return results
 
 
@@ -434,6 +533,8 @@ if __name__ == "__main__":
     parser.add_argument('-dir', '--feature_repository', help="Repository with the feature files",
                         required=True)
     parser.add_argument('--check', help="Only check issues, no update", action="store_true")
+    parser.add_argument('--cache', help="Folder where the parsed feature files are kept between "
+                                        "runs")
     parser.add_argument('--verbose', '-v', help="increase output verbosity", action="store_true")
     args = parser.parse_args()
     # run
@@ -441,4 +542,5 @@ if __name__ == "__main__":
         log.setLevel(logging.DEBUG)
         log.debug("Verbose enabled")
     my_test = UpdateFeatureOnJira(url=args.url, username=args.username, password=args.password)
-    my_test.update_feature_on_jira(feature_repository=args.feature_repository, check=args.check)
+    my_test.update_feature_on_jira(feature_repository=args.feature_repository, check=args.check,
+                                   cache_folder=args.cache)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import pytest
+from dataclasses import asdict
+from unittest.mock import patch
+from behave.parser import parse_file
+from eaireporter.FeatureModel import FeatureCache, from_dict, parse_features
+
+FEATURE = '''@STORY-1
+Feature: Login {0}
+  Business rules: users log in
+
+  Background: @TEST-0
+    Given a server
+
+  @TEST-1 @smoke
+  Scenario: Valid login
+    Given a user
+      """
+      name: bob
+      """
+    When he logs in
+      | field    | value |
+      | password | 1234  |
+    Then he is logged
+
+  @TEST-2
+  Scenario Outline: Bad login
+    Given a user <name>
+    Then he is rejected
+
+    Examples: names
+      | name  |
+      | alice |
+      | bob   |
+'''
+
+
+class TestFeatureModel:
+    @pytest.fixture
+    def feature_files(self, tmp_path):
+        files = []
+        for index in range(6):
+            feature_file = tmp_path / "login{}.feature".format(index)
+            feature_file.write_text(FEATURE.format(index))
+            files.append(str(feature_file))
+        return files
+
+    #######################################################
+    # Test parse_features
+    #######################################################
+    @pytest.mark.parametrize("max_workers", [1, 3])
+    def test_parse_features_order(self, feature_files, max_workers):
+        features = parse_features(feature_files, max_workers=max_workers)
+        assert [feature.name for feature in features] == ["Login {}".format(index)
+                                                           for index in range(6)]
+
+    def test_parse_features_error(self, feature_files, tmp_path, caplog):
+        invalid = tmp_path / "invalid.feature"
+        invalid.write_text("Feature: x\n  Scenario: y\n    Given a\n  Examples:\n    | a |\n")
+        with caplog.at_level(logging.WARNING):
+            features = parse_features([feature_files[0], str(invalid), feature_files[1]],
+                                      max_workers=2)
+        assert features[1] is None
+        assert [feature.name for feature in features if feature is not None] == ["Login 0",
+                                                                                 "Login 1"]
+        assert "invalid.feature" in caplog.text
+
+    def test_parse_features_model(self, feature_files):
+        feature = parse_features(feature_files[:1])[0]
+        behave_feature = parse_file(feature_files[0])
+        assert feature.name == behave_feature.name
+        assert feature.tags == ["STORY-1"]
+        assert feature.description == list(behave_feature.description)
+        assert feature.background.name == "@TEST-0"
+        assert [step.name for step in feature.background.steps] == ["a server"]
+        valid, outline = feature.scenarios
+        # The feature tags then the scenario tags, in the file order
+        assert valid.effective_tags == ["STORY-1", "TEST-1", "smoke"]
+        assert set(valid.effective_tags) == set(behave_feature.scenarios[0].effective_tags)
+        assert valid.steps[0].text == "name: bob"
+        assert valid.steps[1].table.headings == ["field", "value"]
+        assert [row.cells for row in valid.steps[1].table.rows] == [["password", "1234"]]
+        assert outline.type == "scenario_outline"
+        assert [step.name for step in outline.steps] == ["a user <name>", "he is rejected"]
+        assert outline.examples[0].name == "names"
+        assert outline.examples[0].table.headings == ["name"]
+        assert [row.cells for row in outline.examples[0].table.rows] == [["alice"], ["bob"]]
+
+    #######################################################
+    # Test FeatureCache
+    #######################################################
+    @staticmethod
+    def parse_cached(files, cache):
+        with patch("eaireporter.FeatureModel._parse_feature",
+                   side_effect=lambda file_name: (None, "not expected")) as mock_parse:
+            features = parse_features(files, max_workers=1, cache=cache)
+        return features, mock_parse.call_count
+
+    def test_from_dict(self, feature_files):
+        feature = parse_features(feature_files[:1])[0]
+        assert from_dict(asdict(feature)) == feature
+        assert from_dict(json.loads(json.dumps(asdict(feature)))) == feature
+
+    def test_cache_hit(self, feature_files, tmp_path):
+        cache = FeatureCache(str(tmp_path / "cache"))
+        features = parse_features(feature_files, max_workers=2, cache=cache)
+        assert self.parse_cached(feature_files, cache) == (features, 0)
+
+    def test_cache_content_changed(self, feature_files, tmp_path):
+        cache = FeatureCache(str(tmp_path / "cache"))
+        parse_features(feature_files[:1], cache=cache)
+        with open(feature_files[0], "a") as feature_file:
+            feature_file.write("\n  Scenario: new\n    Given a step\n")
+        features = parse_features(feature_files[:1], cache=cache)
+        assert features[0].scenarios[-1].name == "new"
+        assert self.parse_cached(feature_files[:1], cache) == (features, 0)
+
+    def test_cache_behave_version_changed(self, feature_files, tmp_path):
+        cache = FeatureCache(str(tmp_path / "cache"))
+        parse_features(feature_files[:1], cache=cache)
+        with patch("eaireporter.FeatureModel.behave_version", "0.0.1"):
+            assert self.parse_cached(feature_files[:1], cache)[1] == 1
+
+    @pytest.mark.parametrize("entry", ["{not json", json.dumps({"feature": {"name": "old"}})])
+    def test_cache_invalid_entry(self, feature_files, tmp_path, entry):
+        cache = FeatureCache(str(tmp_path / "cache"))
+        features = parse_features(feature_files[:1], cache=cache)
+        for entry_file in (tmp_path / "cache").iterdir():
+            content = json.loads(entry_file.read_text())
+            if entry.startswith("{not"):
+                entry_file.write_text(entry)
+            else:
+                content.update(json.loads(entry))
+                entry_file.write_text(json.dumps(content))
+        # The invalid entry is parsed again then replaced
+        assert self.parse_cached(feature_files[:1], cache)[1] == 1
+        assert parse_features(feature_files[:1], cache=cache) == features
+        assert self.parse_cached(feature_files[:1], cache) == (features, 0)
+
+    def test_cache_no_feature(self, tmp_path):
+        empty = tmp_path / "empty.feature"
+        empty.write_text("# No feature yet\n")
+        cache = FeatureCache(str(tmp_path / "cache"))
+        assert parse_features([str(empty)], cache=cache) == [None]
+        assert self.parse_cached([str(empty)], cache) == ([None], 0)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import pytest
+from unittest.mock import MagicMock, patch
+from eaireporter.UpdateFeaturesOnJira import UpdateFeatureOnJira, jira_fields
+
+
+class TestUpdateFeatureOnJira:
+    @pytest.fixture
+    def update_feature(self):
+        return UpdateFeatureOnJira(url="http://my.domain.com", username="toto", password="titi")
+
+    @staticmethod
+    def connection(update_feature):
+        return update_feature._UpdateFeatureOnJira__connection
+
+    @staticmethod
+    def search(issue_types=None):
+        # Jira search returning the requested keys, except the unknown ones
+        def post(url=None, headers=None, data=None):
+            keys = re.findall(r"[A-Z]+-\d+", json.loads(data)["jql"])
+            response = MagicMock()
+            response.json.return_value = {"maxResults": 1000, "issues": [
+                {"key": key, "fields": {"issuetype": {"name": issue_types.get(key, "Test")}}}
+                for key in keys if issue_types.get(key) != "missing"]}
+            return response
+        return post
+
+    #######################################################
+    # Test get_jira_tests
+    #######################################################
+    def test_get_jira_tests(self, update_feature):
+        keys = ["TST-{}".format(index) for index in range(150)] + ["TST-1"]
+        with patch.object(self.connection(update_feature).session, "post",
+                          side_effect=self.search({})) as mock_post:
+            jira_tests = update_feature.get_jira_tests(keys)
+        assert sorted(jira_tests) == sorted(set(keys))
+        # 100 keys per search, restricted to the compared fields
+        assert mock_post.call_count == 2
+        for call in mock_post.call_args_list:
+            assert json.loads(call.kwargs["data"])["fields"] == jira_fields
+
+    def test_get_jira_tests_missing(self, update_feature):
+        with patch.object(self.connection(update_feature).session, "post",
+                          side_effect=self.search({"TST-2": "missing"})):
+            with pytest.raises(SystemExit) as exit_info:
+                update_feature.get_jira_tests(["TST-1", "TST-2"])
+        assert exit_info.value.code == 1
+
+    def test_get_jira_tests_not_a_test(self, update_feature):
+        with patch.object(self.connection(update_feature).session, "post",
+                          side_effect=self.search({"TST-2": "Story"})):
+            with pytest.raises(SystemExit) as exit_info:
+                update_feature.get_jira_tests(["TST-1", "TST-2"])
+        assert exit_info.value.code == 2
+
+    #######################################################
+    # Test update_jira_test
+    #######################################################
+    @staticmethod
+    def response(status_code=204):
+        response = MagicMock()
+        response.status_code = status_code
+        response.content = b'{"errors": {}}'
+        return response
+
+    def test_build_update(self):
+        jira_changes = {"/fields/labels": {"add": ["smoke"], "remove": ["old"]},
+                        "/fields/customfield_10203": "Scenario Outline",
+                        "/fields/summary": "Login - Bad login",
+                        "/fields/issuelinks": "US-1, US-2"}
+        assert UpdateFeatureOnJira.build_update(jira_changes) == {"update": {
+            "labels": [{"add": "smoke"}, {"remove": "old"}],
+            "customfield_10203": [{"set": {"value": "Scenario Outline"}}],
+            "summary": [{"set": "Login - Bad login"}],
+            "issuelinks": [{"add": {"type": {"name": "Tests"}, "outwardIssue": {"key": "US-1"}}},
+                           {"add": {"type": {"name": "Tests"}, "outwardIssue": {"key": "US-2"}}}]}}
+
+    def test_update_jira_test_rejected_link(self, update_feature):
+        jira_changes = {"/fields/summary": "Login", "/fields/issuelinks": "US-1, US-2"}
+        connection = self.connection(update_feature)
+        with patch.object(connection.session, "put",
+                          side_effect=[self.response(400), self.response(204)]) as mock_put, \
+                patch.object(connection.session, "post",
+                             side_effect=[self.response(201), self.response(404)]) as mock_post:
+            results = update_feature.update_jira_test("TST-1", jira_changes)
+        # The fields are sent again without the links, then each link alone
+        assert json.loads(mock_put.call_args.kwargs["data"]) == {
+            "update": {"summary": [{"set": "Login"}]}}
+        assert [json.loads(call.kwargs["data"])["outwardIssue"]["key"]
+                for call in mock_post.call_args_list] == ["US-1", "US-2"]
+        assert results["TST-1"]["/fields/summary"].status_code == 204
+        assert results["TST-1"]["/fields/issuelinks"].status_code == 404
+
+    def test_update_jira_tests(self, update_feature):
+        jira_changes = {"TST-{}".format(index): {"/fields/summary": "test {}".format(index),
+                                                 "/fields/labels": {"add": ["a"], "remove": []}}
+                        for index in range(5)}
+        with patch.object(self.connection(update_feature).session, "put",
+                          return_value=self.response(204)) as mock_put:
+            results = update_feature.update_jira_tests(jira_changes, max_workers=3)
+        # A single request per test case
+        assert mock_put.call_count == 5
+        assert sorted(results) == sorted(jira_changes)
+        for jira_id in jira_changes:
+            assert sorted(results[jira_id]) == ["/fields/labels", "/fields/summary"]
+            assert results[jira_id]["/fields/summary"].status_code == 204